@@ -3,7 +3,7 @@ from django.urls import path
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework.routers import DefaultRouter, SimpleRouter
 
-from rss_scraper.feeds.api.views import FeedViewSet, ItemViewSet
+from rss_scraper.feeds.api.views import FeedViewSet, ItemViewSet, WebSubCallbackViewSet
 from rss_scraper.users.api.views import UserViewSet
 
 if settings.DEBUG:
@@ -14,6 +14,7 @@ else:
 router.register("users", UserViewSet)
 router.register("feeds", FeedViewSet)
 router.register("items", ItemViewSet)
+router.register("websub", WebSubCallbackViewSet, basename="websub")
 
 
 app_name = "api"
@@ -255,6 +255,10 @@ LOGGING = {
         }
     },
     "root": {"level": "INFO", "handlers": ["console"]},
+    "loggers": {
+        # Feeds metrics, one `name=value` line per measurement to be picked up by the logs collector.
+        "rss_scraper.feeds.metrics": {"level": "INFO", "propagate": True},
+    },
 }
 
 # Celery
@@ -278,6 +282,8 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# http://docs.celeryproject.org/en/latest/userguide/configuration.html#task-default-queue
+CELERY_TASK_DEFAULT_QUEUE = "celery"
 
 # django-allauth
 # ------------------------------------------------------------------------------
@@ -311,6 +317,8 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "DEFAULT_FILTER_BACKENDS": ("django_filters.rest_framework.DjangoFilterBackend",),
 }
+# How long the feeds API responses are cached per user, they are invalidated at every write to the user data anyway.
+FEED_API_CACHE_TIMEOUT_IN_SECONDS = env.int("FEED_API_CACHE_TIMEOUT_IN_SECONDS", 5 * 60)
 
 # django-cors-headers - https://github.com/adamchainz/django-cors-headers#setup
 CORS_URLS_REGEX = r"^/api/.*$"
@@ -337,6 +345,103 @@ SILENCED_SYSTEM_CHECKS = ["security.W019"]
 # feed app background tasks configs
 # -------------------------------------------------------------------------------
 FEED_UPDATE_TASK_MAX_RETRIES = env.int("FEED_UPDATE_TASK_MAX_RETRIES", 3)
+# Base delay of the exponential backoff of the failed feeds retrials.
 FEED_UPDATE_TASK_RETRY_DELAY_IN_SECONDS = env.int(
     "FEED_UPDATE_TASK_RETRY_DELAY_IN_SECONDS", 10
 )
+FEED_UPDATE_TASK_MAX_RETRY_DELAY_IN_SECONDS = env.int(
+    "FEED_UPDATE_TASK_MAX_RETRY_DELAY_IN_SECONDS", 60 * 60
+)
+# Queue of the feed updates requested by the users, consumed by reserved workers so the users don't wait
+# behind the background refresh of all the followed feeds at the default queue.
+FEED_INTERACTIVE_UPDATE_QUEUE = env(
+    "FEED_INTERACTIVE_UPDATE_QUEUE", default="feeds-interactive"
+)
+FEED_UPDATE_BATCH_SIZE = env.int("FEED_UPDATE_BATCH_SIZE", 200)
+# How long a queued or running feed update holds the feed, duplicate updates of the feed are dropped meanwhile.
+# Must outlast the queue wait plus the update run, an expired lease only lets a duplicate update through.
+FEED_FETCH_LEASE_TIMEOUT_IN_SECONDS = env.int(
+    "FEED_FETCH_LEASE_TIMEOUT_IN_SECONDS", 15 * 60
+)
+# A batch of feeds is fetched concurrently but saved one by one, it gets more time than the default task limits.
+# Both limits must stay under the lease timeout, so a batch isn't duplicated while it is still running.
+FEED_UPDATE_BATCH_TASK_SOFT_TIME_LIMIT_IN_SECONDS = env.int(
+    "FEED_UPDATE_BATCH_TASK_SOFT_TIME_LIMIT_IN_SECONDS", 10 * 60
+)
+FEED_UPDATE_BATCH_TASK_TIME_LIMIT_IN_SECONDS = env.int(
+    "FEED_UPDATE_BATCH_TASK_TIME_LIMIT_IN_SECONDS", 12 * 60
+)
+FEED_SCHEDULER_CHUNK_SIZE = env.int("FEED_SCHEDULER_CHUNK_SIZE", 5000)
+# Max number of the feed update tasks waiting at the default queue, the scheduler doesn't queue more
+# while the workers are behind. 0 for no limit.
+FEED_UPDATE_QUEUE_MAX_DEPTH = env.int("FEED_UPDATE_QUEUE_MAX_DEPTH", 500)
+# The scheduler lag metric is emitted once the most overdue feed has been due for longer than this.
+FEED_SCHEDULER_LAG_THRESHOLD_IN_SECONDS = env.int(
+    "FEED_SCHEDULER_LAG_THRESHOLD_IN_SECONDS", 15 * 60
+)
+# Max number of due feeds of one user scheduled per refresh cycle, the rest wait for the next cycles
+# so the users with many feeds don't delay the refresh of the other users feeds. 0 for no limit.
+FEED_UPDATE_USER_BUDGET_PER_CYCLE = env.int("FEED_UPDATE_USER_BUDGET_PER_CYCLE", 1000)
+FEED_FETCH_CONCURRENCY = env.int("FEED_FETCH_CONCURRENCY", 100)
+FEED_FETCH_CONNECT_TIMEOUT_IN_SECONDS = env.float(
+    "FEED_FETCH_CONNECT_TIMEOUT_IN_SECONDS", 5
+)
+FEED_FETCH_FIRST_BYTE_TIMEOUT_IN_SECONDS = env.float(
+    "FEED_FETCH_FIRST_BYTE_TIMEOUT_IN_SECONDS", 10
+)
+FEED_FETCH_TOTAL_TIMEOUT_IN_SECONDS = env.float(
+    "FEED_FETCH_TOTAL_TIMEOUT_IN_SECONDS", 30
+)
+# Applies to the decompressed content, so a small gzip body can't expand beyond it.
+FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES = env.int(
+    "FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES", 5 * 1024 * 1024
+)
+FEED_FETCH_MAX_CONCURRENCY_PER_HOST = env.int("FEED_FETCH_MAX_CONCURRENCY_PER_HOST", 4)
+FEED_FETCH_MAX_REQUESTS_PER_SECOND_PER_HOST = env.float(
+    "FEED_FETCH_MAX_REQUESTS_PER_SECOND_PER_HOST", 5
+)
+FEED_FETCH_MAX_KEEPALIVE_CONNECTIONS = env.int(
+    "FEED_FETCH_MAX_KEEPALIVE_CONNECTIONS", 20
+)
+FEED_FETCH_MIN_INTERVAL_IN_MINUTES = env.int("FEED_FETCH_MIN_INTERVAL_IN_MINUTES", 5)
+FEED_FETCH_MAX_INTERVAL_IN_MINUTES = env.int(
+    "FEED_FETCH_MAX_INTERVAL_IN_MINUTES", 24 * 60
+)
+# Caps how long the feed TTL, skip hours and days or cache headers of a source can hold off its next fetch.
+FEED_FETCH_MAX_SOURCE_DELAY_IN_MINUTES = env.int(
+    "FEED_FETCH_MAX_SOURCE_DELAY_IN_MINUTES", 7 * 24 * 60
+)
+# Should match the `schedule-update-for-followed-feeds` beat interval, set to 0 to queue all the due feeds at once.
+FEED_UPDATE_SPREAD_WINDOW_IN_SECONDS = env.int(
+    "FEED_UPDATE_SPREAD_WINDOW_IN_SECONDS", 5 * 60
+)
+FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD = env.int(
+    "FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5
+)
+FEED_HOST_CIRCUIT_BREAKER_RESET_TIMEOUT_IN_SECONDS = env.int(
+    "FEED_HOST_CIRCUIT_BREAKER_RESET_TIMEOUT_IN_SECONDS", 5 * 60
+)
+# Pipeline mode, the due feeds are updated by the `run_feed_update_pipeline` command instead of the batch tasks.
+FEED_UPDATE_PIPELINE_MODE = env.bool("FEED_UPDATE_PIPELINE_MODE", False)
+FEED_PIPELINE_FETCH_CONCURRENCY = env.int("FEED_PIPELINE_FETCH_CONCURRENCY", 100)
+# 0 means a parser process per CPU core.
+FEED_PIPELINE_PARSE_PROCESSES = env.int("FEED_PIPELINE_PARSE_PROCESSES", 0)
+FEED_PIPELINE_PERSIST_BATCH_SIZE = env.int("FEED_PIPELINE_PERSIST_BATCH_SIZE", 50)
+FEED_PIPELINE_QUEUE_SIZE = env.int("FEED_PIPELINE_QUEUE_SIZE", 200)
+# Work queue mode, the due feeds are claimed from the DB by the `run_feed_work_queue_worker` command workers
+# instead of being scheduled as batch tasks.
+FEED_UPDATE_WORK_QUEUE_MODE = env.bool("FEED_UPDATE_WORK_QUEUE_MODE", False)
+FEED_WORK_QUEUE_BATCH_SIZE = env.int("FEED_WORK_QUEUE_BATCH_SIZE", 200)
+FEED_WORK_QUEUE_IDLE_INTERVAL_IN_SECONDS = env.int(
+    "FEED_WORK_QUEUE_IDLE_INTERVAL_IN_SECONDS", 30
+)
+# Public base url of the API, like `https://rss.example.com`, WebSub hubs push the feeds updates to it.
+# Empty disables the WebSub subscriptions, all the feeds are polled.
+FEED_WEBSUB_CALLBACK_BASE_URL = env("FEED_WEBSUB_CALLBACK_BASE_URL", default="")
+FEED_WEBSUB_LEASE_IN_SECONDS = env.int(
+    "FEED_WEBSUB_LEASE_IN_SECONDS", 10 * 24 * 60 * 60
+)
+# Pushed feeds are polled again once their lease is about to expire, the poll renews their subscription.
+FEED_WEBSUB_RENEW_BEFORE_IN_SECONDS = env.int(
+    "FEED_WEBSUB_RENEW_BEFORE_IN_SECONDS", 24 * 60 * 60
+)
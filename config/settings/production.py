@@ -179,6 +179,8 @@ LOGGING = {
         },
         # Errors logged by the SDK itself
         "sentry_sdk": {"level": "ERROR", "handlers": ["console"], "propagate": False},
+        # Feeds metrics, one `name=value` line per measurement to be picked up by the logs collector.
+        "rss_scraper.feeds.metrics": {"level": "INFO", "propagate": True},
     },
 }
 
@@ -69,7 +69,25 @@ class FeedModelAdmin(admin.ModelAdmin):
     readonly_fields = (
         "id",
         "e_tag",
+        "last_modified_header",
+        "content_hash",
         "last_update_by_source_at",
+        "next_fetch_at",
+        "fetch_interval",
+        "not_modified_ratio",
+        "consecutive_fetch_failures",
+        "fetch_lease_expires_at",
+        "fetch_lease_is_preemptible",
+        "ttl",
+        "skip_hours",
+        "skip_days",
+        "cache_expires_at",
+        "websub_hub_url",
+        "websub_topic_url",
+        "websub_lease_expires_at",
+        "conditional_fetch_count",
+        "not_modified_fetch_count",
+        "not_modified_hit_rate",
         "updated_at",
         "created_at",
     )
@@ -87,6 +105,38 @@ class FeedModelAdmin(admin.ModelAdmin):
                     "is_followed",
                     "auto_update_is_active",
                     "e_tag",
+                    "last_modified_header",
+                    "content_hash",
+                )
+            },
+        ),
+        (
+            _("Polling Schedule"),
+            {
+                "fields": (
+                    "next_fetch_at",
+                    "fetch_interval",
+                    "not_modified_ratio",
+                    "consecutive_fetch_failures",
+                    "fetch_lease_expires_at",
+                    "fetch_lease_is_preemptible",
+                    "ttl",
+                    "skip_hours",
+                    "skip_days",
+                    "cache_expires_at",
+                    "conditional_fetch_count",
+                    "not_modified_fetch_count",
+                    "not_modified_hit_rate",
+                )
+            },
+        ),
+        (
+            _("WebSub Subscription"),
+            {
+                "fields": (
+                    "websub_hub_url",
+                    "websub_topic_url",
+                    "websub_lease_expires_at",
                 )
             },
         ),
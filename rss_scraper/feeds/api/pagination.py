@@ -0,0 +1,187 @@
+import base64
+import binascii
+import json
+from typing import Any, Optional
+
+from django.db.models import F, Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from rss_scraper.feeds.models import Item
+
+
+class ItemKeysetPagination(LimitOffsetPagination):
+    """
+    Keyset pagination of the feed items, newest first, on `(published_at, id)` the same as
+        the items published at index. Every page is an index range scan starting after the cursor item,
+        so a deep page costs the same as the first one and the items count isn't computed.
+
+    The items without a publishing date come before all the dated ones, as a descending index orders them.
+
+    The keyset mode is enabled by the `cursor` query param, an empty cursor for the first page then the cursors of
+        the next and previous links. Without it the limit offset pagination is used as for the other endpoints.
+
+    Response:
+        {"next": <url or null>, "previous": <url or null>, "results": [...]}
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor."
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view=None
+    ) -> Optional[list]:
+        self.is_offset_mode = self.cursor_query_param not in request.query_params
+
+        if self.is_offset_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+
+        if self.limit is None:
+            return None
+
+        self.request = request
+        position, is_reversed = self.decode_cursor(request)
+        ordering = (
+            (F("published_at").asc(nulls_last=True), "id")
+            if is_reversed
+            else (F("published_at").desc(nulls_first=True), "-id")
+        )
+
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(*position, is_reversed))
+
+        results = list(queryset.order_by(*ordering)[: self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[: self.limit]
+
+        if is_reversed:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    @staticmethod
+    def get_keyset_filter(published_at, item_id: int, is_reversed: bool) -> Q:
+        """
+        The items after the cursor item at the newest first order, or before it if reversed.
+        """
+        if is_reversed:
+            if published_at is None:
+                return Q(published_at__isnull=True, id__gt=item_id)
+
+            return (
+                Q(published_at__gt=published_at)
+                | Q(published_at=published_at, id__gt=item_id)
+                | Q(published_at__isnull=True)
+            )
+
+        if published_at is None:
+            return Q(published_at__isnull=False) | Q(
+                published_at__isnull=True, id__lt=item_id
+            )
+
+        return Q(published_at__lt=published_at) | Q(
+            published_at=published_at, id__lt=item_id
+        )
+
+    def decode_cursor(self, request: Request) -> tuple[Optional[tuple], bool]:
+        """
+        :return: ((published_at, id) of the cursor item, whether to page backwards), no position at the first page.
+        :raise NotFound: if the cursor is malformed.
+        """
+        encoded_cursor = request.query_params.get(self.cursor_query_param)
+
+        if not encoded_cursor:
+            return None, False
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded_cursor.encode()))
+            published_at = (
+                parse_datetime(cursor["p"]) if cursor["p"] is not None else None
+            )
+            item_id = int(cursor["i"])
+            is_reversed = bool(cursor.get("r", False))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if cursor["p"] is not None and published_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return (published_at, item_id), is_reversed
+
+    def encode_cursor(self, item: Item, is_reversed: bool) -> str:
+        cursor = {
+            "p": item.published_at.isoformat() if item.published_at else None,
+            "i": item.id,
+        }
+
+        if is_reversed:
+            cursor["r"] = True
+
+        encoded_cursor = base64.urlsafe_b64encode(
+            json.dumps(cursor, separators=(",", ":")).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded_cursor
+        )
+
+    def get_next_link(self) -> Optional[str]:
+        if self.is_offset_mode:
+            return super().get_next_link()
+
+        if not (self.has_next and self.page):
+            return None
+
+        return self.encode_cursor(self.page[-1], is_reversed=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if self.is_offset_mode:
+            return super().get_previous_link()
+
+        if not self.has_previous:
+            return None
+
+        if not self.page:
+            return replace_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param, ""
+            )
+
+        return self.encode_cursor(self.page[0], is_reversed=True)
+
+    def get_paginated_response(self, data: list) -> Response:
+        if self.is_offset_mode:
+            return super().get_paginated_response(data)
+
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema: dict[str, Any]) -> dict[str, Any]:
+        paginated_response_schema = super().get_paginated_response_schema(schema)
+        paginated_response_schema["required"] = ["results"]
+        return paginated_response_schema
+
+    def get_schema_operation_parameters(self, view) -> list[dict[str, Any]]:
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value, empty for the first page of the keyset pagination.",
+                "schema": {"type": "string"},
+            },
+            *super().get_schema_operation_parameters(view),
+        ]
@@ -59,3 +59,20 @@ class ItemDynamicFieldsModelSerializer(DynamicFieldsModelSerializer):
             "feed",
         )
         read_only_fields = fields
+
+
+class CompactItemDynamicFieldsModelSerializer(ItemDynamicFieldsModelSerializer):
+    """
+    Compact item serializer which references the item feed by its `feed_id` instead of nesting it,
+        the feeds are sideloaded once per response.
+    """
+
+    feed = None
+
+    class Meta(ItemDynamicFieldsModelSerializer.Meta):
+        fields = tuple(
+            field
+            for field in ItemDynamicFieldsModelSerializer.Meta.fields
+            if field != "feed"
+        ) + ("feed_id",)
+        read_only_fields = fields
@@ -1,24 +1,42 @@
-from typing import Any
+from typing import Any, Iterable
 
+from django.conf import settings
 from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.permissions import AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from rss_scraper.feeds.api.pagination import ItemKeysetPagination
 from rss_scraper.feeds.api.serializers import (
+    CompactItemDynamicFieldsModelSerializer,
     FeedModelSerializer,
     ItemDynamicFieldsModelSerializer,
 )
 from rss_scraper.feeds.enums import ItemStatus
+from rss_scraper.feeds.errors import FeedParsingError
+from rss_scraper.feeds.fetchers import FeedFetchResponse
+from rss_scraper.feeds.mixins import (
+    ItemsConditionalResponseMixin,
+    SparseFieldsetsMixin,
+    UserCachedResponseMixin,
+)
 from rss_scraper.feeds.models import Feed, Item
-from rss_scraper.feeds.tasks import update_feed_data_from_source_task
+from rss_scraper.feeds.services import FeedReaderService
+from rss_scraper.feeds.tasks import queue_feed_update
+from rss_scraper.feeds.websub import is_valid_websub_signature, verify_websub_intent
 
 
 class FeedViewSet(
+    UserCachedResponseMixin,
+    ItemsConditionalResponseMixin,
+    SparseFieldsetsMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
@@ -36,11 +54,13 @@ class FeedViewSet(
     List action:
         - Returns paginated list of feeds created by the authenticated user.
 
-    TODO: Use caching at list and retrieve API endpoints, also invalidate it at every DB write.
+    The list and retrieve responses are cached per user, every write to the user feeds and items invalidates them.
     """
 
     serializer_class = FeedModelSerializer
     queryset = Feed.objects.all()
+    # The items pagination keys and feed foreign key are always read, so no item loads them one by one.
+    sparse_fieldsets_required_fields = ("id", "feed", "published_at")
 
     def get_queryset(self) -> QuerySet:
         """
@@ -54,7 +74,7 @@ class FeedViewSet(
             to a background task for further processing.
         """
         new_feed_instance = serializer.save()
-        update_feed_data_from_source_task.delay(new_feed_instance.id)
+        queue_feed_update(new_feed_instance.id, interactive=True)
 
     @action(detail=True, methods=["POST"])
     def follow(self, request: Request, *args: Any, **kwargs: Any) -> Response:
@@ -114,7 +134,8 @@ class FeedViewSet(
             - pk (int) which used to get the feed instance from DB.
 
         :return:
-            - `200 OK` after running a background task to force update a feed instance.
+            - `200 OK` after queuing a background task to force update a feed instance,
+                unless an update of the feed is already queued or running.
             - `403 Forbidden` if the user is anonymous.
             - `404 Not Found` if provided feed doesn't exist or not created by the authenticated user.
         """
@@ -123,41 +144,62 @@ class FeedViewSet(
         if not instance.auto_update_is_active:
             instance.activate_auto_update()
 
-        update_feed_data_from_source_task.delay(instance.id)
+        # Repeated force updates coalesce into the update which is already queued or running.
+        queue_feed_update(instance.id, interactive=True)
         return Response(self.get_serializer(instance).data, status=status.HTTP_200_OK)
 
-    @action(detail=True, methods=["GET"])
+    @action(detail=True, methods=["GET"], pagination_class=ItemKeysetPagination)
     def items(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
         Enables authenticated users to retrieve a paginated list of items related to the passed feed ID.
         Also, if the automatic update is not active for the feed it'll be activated.
+        The items are paginated with a cursor, newest first, see `ItemKeysetPagination`.
+        The item fields can be picked by the `fields` or `exclude` query params, e.g. `?fields=id,title`,
+            the columns of the left out fields are not read from the DB.
 
         :param kwargs:
             - pk (int) which used to get the feed instance from DB, and then its related items.
 
         :return:
             - `200 OK`
+            - `304 Not Modified` if the feed items didn't change since the `If-None-Match` or `If-Modified-Since`
+                request validators.
+            - `400 Bad Request` if an unknown item field is passed at the `fields` or `exclude` query params.
             - `403 Forbidden` if the user is anonymous.
             - `404 Not Found` if provided feed doesn't exist or not created by the authenticated user.
         """
         instance = self.get_object()
-        items_queryset = instance.items.all()
+        items_queryset = self.get_sparse_queryset(
+            instance.items.all(), ItemDynamicFieldsModelSerializer, exclude=("feed",)
+        )
+        serializer_kwargs = self.get_sparse_serializer_kwargs(
+            ItemDynamicFieldsModelSerializer, exclude=("feed",)
+        )
+
+        def get_response() -> Response:
+            page = self.paginate_queryset(items_queryset)
+            if page is not None:
+                serializer = ItemDynamicFieldsModelSerializer(
+                    page, many=True, **serializer_kwargs
+                )
+                return self.get_paginated_response(serializer.data)
 
-        page = self.paginate_queryset(items_queryset)
-        if page is not None:
             serializer = ItemDynamicFieldsModelSerializer(
-                page, many=True, exclude=("feed",)
+                items_queryset, many=True, **serializer_kwargs
             )
-            return self.get_paginated_response(serializer.data)
 
-        serializer = ItemDynamicFieldsModelSerializer(
-            items_queryset, many=True, exclude=("feed",)
-        )
+            return Response(serializer.data, status=status.HTTP_200_OK)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.get_conditional_items_response(request, get_response)
 
 
-class ItemViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericViewSet):
+class ItemViewSet(
+    ItemsConditionalResponseMixin,
+    SparseFieldsetsMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    GenericViewSet,
+):
     """
     Generic viewset to handle feed items API endpoints.
 
@@ -166,18 +208,94 @@ class ItemViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericViewS
 
     List action:
         - Returns paginated list of all the items (globally) of all the feeds registered by the authenticated user.
+            The items are paginated with a cursor, newest first, see `ItemKeysetPagination`.
+            Answers with `304 Not Modified` if the listed items didn't change since the request validators.
+        - Compact mode, `?compact=true`: every item references its feed by `feed_id` instead of nesting it,
+            the page feeds are sideloaded once at the `feeds` map by their ids. The feeds are not joined
+            to every item row, they are read by one query, and not at all if `feed_id` is left out.
+
+    The retrieved and listed item fields can be picked by the `fields` or `exclude` query params,
+        e.g. `?fields=id,title`, the columns of the left out fields are not read from the DB.
+        An unknown field is answered with `400 Bad Request`.
     """
 
     serializer_class = ItemDynamicFieldsModelSerializer
+    pagination_class = ItemKeysetPagination
     queryset = Item.objects.select_related("feed").all()
     filter_backends = (DjangoFilterBackend,)
     filterset_fields = ("status", "feed")
+    # The pagination keys and the joined feed are always read.
+    sparse_fieldsets_required_fields = ("id", "feed", "published_at")
+    sparse_fieldsets_actions = ("list", "retrieve")
 
     def get_queryset(self) -> QuerySet:
         """
         :return: Items qs of all the feeds registered by the authenticated user.
         """
-        return self.queryset.filter(feed__user=self.request.user)
+        queryset = self.queryset.filter(feed__user=self.request.user)
+
+        if self.action == "list" and self.is_compact:
+            queryset = queryset.select_related(None)
+
+        if self.action in self.sparse_fieldsets_actions:
+            queryset = self.get_sparse_queryset(queryset, self.get_serializer_class())
+
+        return queryset
+
+    @property
+    def is_compact(self) -> bool:
+        """
+        Whether the compact response mode is requested by the `compact` query param.
+        """
+        return self.request.query_params.get("compact", "").lower() in ("1", "true")
+
+    def get_serializer_class(self):
+        if self.action == "list" and self.is_compact:
+            return CompactItemDynamicFieldsModelSerializer
+
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args: Any, **kwargs: Any):
+        if self.action in self.sparse_fieldsets_actions:
+            kwargs.update(
+                self.get_sparse_serializer_kwargs(self.get_serializer_class())
+            )
+
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        items_queryset = self.filter_queryset(self.get_queryset())
+
+        def get_response() -> Response:
+            if not self.is_compact:
+                return super(ItemViewSet, self).list(request, *args, **kwargs)
+
+            page = self.paginate_queryset(items_queryset)
+            items = page if page is not None else list(items_queryset)
+            serializer = self.get_serializer(items, many=True)
+            response = (
+                self.get_paginated_response(serializer.data)
+                if page is not None
+                else Response({"results": serializer.data})
+            )
+
+            if "feed_id" in serializer.child.fields:
+                response.data["feeds"] = self.get_sideloaded_feeds(items)
+
+            return response
+
+        return self.get_conditional_items_response(request, get_response)
+
+    @staticmethod
+    def get_sideloaded_feeds(items: Iterable[Item]) -> dict[int, dict[str, Any]]:
+        """
+        :return: the serialized feeds of the items by their ids, every feed is read and serialized once.
+        """
+        feed_instances = Feed.objects.filter(id__in={item.feed_id for item in items})
+        return {
+            feed_data["id"]: feed_data
+            for feed_data in FeedModelSerializer(feed_instances, many=True).data
+        }
 
     @action(detail=True, methods=["POST"], url_path="mark-as-read")
     def mark_as_read(self, request: Request, *args: Any, **kwargs: Any) -> Response:
@@ -202,3 +320,67 @@ class ItemViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericViewS
 
         instance.mark_as_read()
         return Response(self.get_serializer(instance).data, status=status.HTTP_200_OK)
+
+
+class WebSubCallbackViewSet(GenericViewSet):
+    """
+    Generic viewset to handle the WebSub hubs callbacks of the feeds.
+
+    Callback action:
+        - GET: verifies a subscription intent of the feed hub.
+        - POST: saves the feed content pushed by its hub.
+
+    Hubs are not API users, the pushed content is authenticated by its signature using the subscription secret
+        and the intents by the unguessable token of the subscription callback url.
+    """
+
+    queryset = Feed.objects.all()
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    @action(detail=True, methods=["GET", "POST"])
+    def callback(self, request: Request, *args: Any, **kwargs: Any) -> HttpResponse:
+        """
+        :param kwargs:
+            - pk (int) which used to get the feed instance from DB.
+
+        :return:
+            - `200 OK` with the hub challenge if the (un)subscription intent is verified.
+            - `204 No Content` if the pushed content is saved.
+            - `400 Bad Request` if the pushed content is not a valid feed.
+            - `403 Forbidden` if the pushed content signature is not valid.
+            - `404 Not Found` if provided feed doesn't exist or the intent is not verified.
+            - `413 Request Entity Too Large` if the pushed content is over the max feed content size.
+        """
+        instance = self.get_object()
+
+        if request.method == "GET":
+            challenge = verify_websub_intent(instance, request.query_params)
+
+            if challenge is None:
+                raise NotFound()
+
+            return HttpResponse(challenge, content_type="text/plain")
+
+        if len(request.body) > settings.FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES:
+            return Response(status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        if not instance.is_pushed or not is_valid_websub_signature(
+            instance, request.body, request.headers.get("X-Hub-Signature", "")
+        ):
+            raise PermissionDenied()
+
+        try:
+            FeedReaderService(instance).process_feed_data_from_source(
+                FeedFetchResponse(
+                    status_code=status.HTTP_200_OK,
+                    href=instance.url,
+                    headers={"content-type": request.headers.get("Content-Type", "")},
+                    content=request.body,
+                ),
+                share_with_subscribers=True,
+            )
+        except FeedParsingError as err:
+            raise ValidationError({"non_field_errors": [str(err.message)]})
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,80 @@
+import hashlib
+import time
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_user_cache_generation_key(user_id: int) -> str:
+    return f"feeds:user:{user_id}:cache-generation"
+
+
+def get_user_cache_generation(user_id: int) -> int:
+    """
+    The generation of the user cached responses, every write to the user feeds or items moves it forward
+        so the responses cached at the older generations are not read anymore and expire on their own.
+
+    A missing generation starts from the current time, so a generation evicted from the cache never
+        comes back to a value its stale responses were cached with.
+    """
+    return cache.get_or_set(
+        get_user_cache_generation_key(user_id), time.time_ns, timeout=None
+    )
+
+
+def get_user_cache_generation_at_key(user_id: int) -> str:
+    return f"feeds:user:{user_id}:cache-generation-at"
+
+
+def get_user_cache_generation_at(user_id: int) -> int:
+    """
+    The timestamp the user cache generation moved forward at, the last time any of the user feeds or items changed.
+
+    A missing timestamp starts from the current time, so it's never older than a change it has missed.
+    """
+    return cache.get_or_set(
+        get_user_cache_generation_at_key(user_id),
+        lambda: int(time.time()),
+        timeout=None,
+    )
+
+
+def bump_user_cache_generation(user_id: Optional[int]):
+    """
+    Invalidate the cached responses of a user once the current transaction is committed,
+        so a response read before the commit isn't cached at the new generation.
+    """
+    if user_id is None:
+        return
+
+    def bump():
+        # The timestamp moves first, a response of the new generation is never sent with the older timestamp.
+        cache.set(
+            get_user_cache_generation_at_key(user_id), int(time.time()), timeout=None
+        )
+
+        try:
+            cache.incr(get_user_cache_generation_key(user_id))
+        except ValueError:
+            cache.set(
+                get_user_cache_generation_key(user_id), time.time_ns(), timeout=None
+            )
+
+    transaction.on_commit(bump)
+
+
+def get_user_response_cache_key(user_id: int, *parts: Any) -> str:
+    digest = hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+    return (
+        f"feeds:user:{user_id}:{get_user_cache_generation(user_id)}:response:{digest}"
+    )
+
+
+def get_cached_response_data(key: str) -> Optional[Any]:
+    return cache.get(key)
+
+
+def set_cached_response_data(key: str, data: Any):
+    cache.set(key, data, timeout=settings.FEED_API_CACHE_TIMEOUT_IN_SECONDS)
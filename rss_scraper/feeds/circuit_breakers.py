@@ -0,0 +1,82 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+
+logger = logging.getLogger(__name__)
+
+# A host which didn't fail for a day starts counting its failures from scratch.
+FAILURES_COUNTER_TIMEOUT_IN_SECONDS = 24 * 60 * 60
+
+
+class HostCircuitBreaker:
+    """
+    Circuit breaker of a feeds source host, shared by all the workers through the cache.
+
+    - Closed: fetches to the host go through and its consecutive failures are counted.
+    - Open: after `FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD` consecutive failures, fetches to the host
+        are short-circuited for `FEED_HOST_CIRCUIT_BREAKER_RESET_TIMEOUT_IN_SECONDS`.
+    - Half open: once the reset timeout passes a single probe is let through, its success closes the breaker
+        and its failure opens it again.
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.failures_key = f"feeds:host-circuit-breaker:{host}:failures"
+        self.open_key = f"feeds:host-circuit-breaker:{host}:open"
+        self.probe_key = f"feeds:host-circuit-breaker:{host}:probe"
+
+    @staticmethod
+    def is_failure_status_code(status_code: int) -> bool:
+        """
+        Server errors and rate limiting mean the host is struggling, any other status code means it is healthy.
+        """
+        return (
+            status.is_server_error(status_code)
+            or status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    def allow_request(self) -> bool:
+        if cache.get(self.open_key):
+            return False
+
+        if (
+            cache.get(self.failures_key, 0)
+            < settings.FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD
+        ):
+            return True
+
+        return cache.add(
+            self.probe_key,
+            True,
+            timeout=settings.FEED_HOST_CIRCUIT_BREAKER_RESET_TIMEOUT_IN_SECONDS,
+        )
+
+    def record_success(self):
+        cache.delete_many([self.failures_key, self.open_key, self.probe_key])
+
+    def record_failure(self):
+        cache.add(self.failures_key, 0, timeout=FAILURES_COUNTER_TIMEOUT_IN_SECONDS)
+
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            # The counter has expired right after being added.
+            failures = 1
+            cache.set(
+                self.failures_key,
+                failures,
+                timeout=FAILURES_COUNTER_TIMEOUT_IN_SECONDS,
+            )
+
+        if failures >= settings.FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD:
+            cache.set(
+                self.open_key,
+                True,
+                timeout=settings.FEED_HOST_CIRCUIT_BREAKER_RESET_TIMEOUT_IN_SECONDS,
+            )
+            cache.delete(self.probe_key)
+            logger.warning(
+                f"Circuit breaker of host: {self.host} is open after {failures} consecutive failures."
+            )
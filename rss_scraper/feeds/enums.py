@@ -11,3 +11,9 @@ class FeedParsingErrorCodes(Enum):
     IS_GONE = 410
     URL_CHANGED = 301
     CONTENT_NOT_CHANGED = 304
+
+
+class FeedFetchResult(Enum):
+    UPDATED = "updated"
+    NOT_MODIFIED = "not_modified"
+    FAILED = "failed"
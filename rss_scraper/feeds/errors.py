@@ -1,9 +1,12 @@
+from typing import Optional
+
+
 class Error(Exception):
     pass
 
 
 class FeedParsingError(Error):
-    def __init__(self, code: int, message: str):
+    def __init__(self, code: Optional[int], message: str):
         self.code = code
         self.message = message
 
@@ -27,7 +30,9 @@ class FeedUrlChangedError(FeedParsingError):
     Source: https://feedparser.readthedocs.io/en/latest/reference-status.html
     """
 
-    pass
+    def __init__(self, code: Optional[int], message: str, href: Optional[str] = None):
+        super().__init__(code, message)
+        self.href = href
 
 
 class FeedContentNotChangedError(FeedParsingError):
@@ -55,3 +60,35 @@ class FeedNotAvailableError(FeedParsingError):
     """
 
     pass
+
+
+class FeedDownloadLimitExceededError(FeedParsingError):
+    """
+    The feed download overran one of its hard limits, the connect, first byte or total deadline
+        or the max content size.
+
+    Retrying right away would most likely overrun the same limit again, so the feed is only backed off
+        till its next scheduled fetch instead of being retried.
+    """
+
+    pass
+
+
+class FeedDownloadTimeoutError(FeedDownloadLimitExceededError):
+    """
+    The feed download overran its connect, first byte or total deadline, the feed host is slow or unreachable.
+
+    Unlike the max content size overruns, it's counted as a failure of the host by its circuit breaker.
+    """
+
+    pass
+
+
+class FeedHostCircuitOpenError(FeedParsingError):
+    """
+    The feed was not fetched as the circuit breaker of its host is open, the host kept failing lately.
+
+    Like `FeedDownloadLimitExceededError` the feed is only backed off till its next scheduled fetch.
+    """
+
+    pass
@@ -0,0 +1,617 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional, Union
+
+import feedparser
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+
+from rss_scraper.feeds.circuit_breakers import HostCircuitBreaker
+from rss_scraper.feeds.enums import FeedParsingErrorCodes
+from rss_scraper.feeds.errors import (
+    FeedDownloadLimitExceededError,
+    FeedDownloadTimeoutError,
+    FeedHostCircuitOpenError,
+)
+from rss_scraper.feeds.models import Feed
+
+logger = logging.getLogger(__name__)
+
+FeedFetchResponse = namedtuple(
+    "FeedFetchResponse",
+    [
+        "status_code",
+        "href",
+        "headers",
+        "content",
+    ],
+)
+
+PERMANENT_REDIRECT_STATUS_CODES = (
+    status.HTTP_301_MOVED_PERMANENTLY,
+    status.HTTP_308_PERMANENT_REDIRECT,
+)
+
+# How often a request waits for a free request slot of its host, while all of them are taken.
+HOST_REQUEST_SLOT_POLL_INTERVAL_IN_SECONDS = 0.05
+
+# Download errors which mean the feed host is down or struggling, they are counted by its circuit breaker.
+HOST_FAILURE_ERRORS = (httpx.TransportError, FeedDownloadTimeoutError)
+
+
+def get_conditional_request_headers(feed_instance: Feed) -> dict[str, str]:
+    """
+    Build the conditional GET headers of a feed, so the source can reply with `304 Not Modified`
+        instead of sending the whole feed content again.
+
+    The validators are sent back byte for byte as the source sent them, many sources compare them as plain strings
+        so a re-formatted date never matches.
+    """
+    headers = {}
+
+    if feed_instance.e_tag:
+        headers["If-None-Match"] = feed_instance.e_tag
+
+    if feed_instance.last_modified_header:
+        headers["If-Modified-Since"] = feed_instance.last_modified_header
+
+    return headers
+
+
+def build_feed_fetch_response(
+    feed_instance: Feed, response: httpx.Response, content: bytes
+) -> FeedFetchResponse:
+    """
+    Refine the http response of a feed in the same way the feedparser package does,
+        a permanent redirect at any point of the redirects chain is reported as `301` with the new `href`.
+
+    :param content: the response content, read within the download limits.
+    """
+    status_code = response.status_code
+    href = feed_instance.url
+
+    if any(
+        redirect_response.status_code in PERMANENT_REDIRECT_STATUS_CODES
+        for redirect_response in response.history
+    ):
+        status_code = FeedParsingErrorCodes.URL_CHANGED.value
+        href = str(response.url)
+
+    return FeedFetchResponse(
+        status_code=status_code,
+        href=href,
+        headers={key.lower(): value for key, value in response.headers.items()},
+        content=content,
+    )
+
+
+def check_declared_content_size(feed_instance: Feed, response: httpx.Response):
+    """
+    Reject a too large feed early using its `Content-Length` header, before downloading any of its content.
+    """
+    content_length = response.headers.get("content-length", "")
+
+    if (
+        content_length.isdigit()
+        and int(content_length) > settings.FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES
+    ):
+        raise FeedDownloadLimitExceededError(
+            response.status_code,
+            f"Feed with id: {feed_instance.id} declared content length: {content_length} exceeds "
+            f"the max content size: {settings.FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES} bytes.",
+        )
+
+
+def check_download_limits(
+    feed_instance: Feed, content_size: int, deadline: Optional[float] = None
+):
+    """
+    :param content_size: the size of the decompressed content downloaded so far.
+    :param deadline: the `time.monotonic()` value the download should be finished by.
+    """
+    if content_size > settings.FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES:
+        raise FeedDownloadLimitExceededError(
+            None,
+            f"Feed with id: {feed_instance.id} content exceeds "
+            f"the max content size: {settings.FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES} bytes.",
+        )
+
+    if deadline is not None and time.monotonic() > deadline:
+        raise FeedDownloadTimeoutError(
+            None,
+            f"Feed with id: {feed_instance.id} download exceeds "
+            f"the total timeout: {settings.FEED_FETCH_TOTAL_TIMEOUT_IN_SECONDS} seconds.",
+        )
+
+
+def read_response_content(
+    feed_instance: Feed, response: httpx.Response, deadline: float
+) -> bytes:
+    """
+    Read a streamed response content chunk by chunk, stopping as soon as the max content size
+        or the total deadline is exceeded. Gzip and deflate contents are decompressed while being read.
+    """
+    check_declared_content_size(feed_instance, response)
+    content = bytearray()
+
+    for chunk in response.iter_bytes():
+        content += chunk
+        check_download_limits(feed_instance, len(content), deadline)
+
+    return bytes(content)
+
+
+async def read_response_content_async(
+    feed_instance: Feed, response: httpx.Response
+) -> bytes:
+    """
+    Async version of `read_response_content`, the total deadline is enforced by the caller.
+    """
+    check_declared_content_size(feed_instance, response)
+    content = bytearray()
+
+    async for chunk in response.aiter_bytes():
+        content += chunk
+        check_download_limits(feed_instance, len(content))
+
+    return bytes(content)
+
+
+@contextmanager
+def download_timeouts_as_limit_errors(feed_instance: Feed) -> Iterator[None]:
+    """
+    Surface the connect, first byte and total deadlines overruns as `FeedDownloadTimeoutError`.
+    """
+    try:
+        yield
+    except (httpx.TimeoutException, asyncio.TimeoutError) as err:
+        raise FeedDownloadTimeoutError(
+            None, f"Feed with id: {feed_instance.id} download timed out: {err!r}."
+        ) from err
+
+
+class SharedHostLimits:
+    """
+    Politeness limits per source host, shared by all the worker processes through the cache like the host
+        circuit breaker, so they hold across the prefork workers and their fetches batches.
+
+    A request to the host takes one of its `max_concurrency` request slots, then reserves the earliest free send
+        time, the send times of the host are at least `1 / max_requests_per_second` seconds apart.
+    """
+
+    def __init__(self, host: str, max_concurrency: int, max_requests_per_second: float):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.min_interval = (
+            1 / max_requests_per_second if max_requests_per_second else 0
+        )
+        self.request_slot_keys = [
+            f"feeds:host-limiter:{host}:request-slot:{slot}"
+            for slot in range(max_concurrency)
+        ]
+
+    def acquire_request_slot(self) -> Optional[str]:
+        """
+        The slot expires on its own after the longest request could take, so a killed worker doesn't hold it.
+
+        :return: the cache key of the taken request slot, empty if all of them are taken.
+        """
+        timeout = math.ceil(
+            settings.FEED_FETCH_TOTAL_TIMEOUT_IN_SECONDS
+            + self.max_concurrency * self.min_interval
+            + 1
+        )
+        return next(
+            (key for key in self.request_slot_keys if cache.add(key, True, timeout)),
+            None,
+        )
+
+    def release_request_slot(self, key: str):
+        cache.delete(key)
+
+    def reserve_send_delay(self) -> float:
+        """
+        Reserve the earliest free send time of the host, send times are on a grid `min_interval` seconds apart.
+            Only the request slots holders wait for their send times, a free one is among the next
+            `max_concurrency` send times.
+
+        :return: the seconds to wait till the reserved send time.
+        """
+        if not self.min_interval:
+            return 0
+
+        now = time.time()
+        first_send_slot = math.ceil(now / self.min_interval)
+        timeout = math.ceil((self.max_concurrency + 1) * self.min_interval) + 1
+
+        for send_slot in range(
+            first_send_slot, first_send_slot + self.max_concurrency + 1
+        ):
+            if cache.add(
+                f"feeds:host-limiter:{self.host}:send-slot:{send_slot}", True, timeout
+            ):
+                return send_slot * self.min_interval - now
+
+        return (first_send_slot + self.max_concurrency + 1) * self.min_interval - now
+
+
+class AsyncHostLimiter:
+    """
+    Async version of `HostLimiter`, the concurrent fetches of an event loop wait for their host limits without
+        blocking each other.
+    """
+
+    def __init__(self, max_concurrency: int, max_requests_per_second: float):
+        self.max_concurrency = max_concurrency
+        self.max_requests_per_second = max_requests_per_second
+
+    @asynccontextmanager
+    async def limit(self, host: str) -> AsyncIterator[None]:
+        host_limits = SharedHostLimits(
+            host, self.max_concurrency, self.max_requests_per_second
+        )
+
+        while (request_slot_key := host_limits.acquire_request_slot()) is None:
+            await asyncio.sleep(HOST_REQUEST_SLOT_POLL_INTERVAL_IN_SECONDS)
+
+        try:
+            send_delay = host_limits.reserve_send_delay()
+
+            if send_delay > 0:
+                await asyncio.sleep(send_delay)
+
+            yield
+        finally:
+            host_limits.release_request_slot(request_slot_key)
+
+
+class HostLimiter:
+    """
+    Politeness limits per source host for the sync fetches, backed by `SharedHostLimits`.
+    """
+
+    def __init__(self, max_concurrency: int, max_requests_per_second: float):
+        self.max_concurrency = max_concurrency
+        self.max_requests_per_second = max_requests_per_second
+
+    @contextmanager
+    def limit(self, host: str) -> Iterator[None]:
+        host_limits = SharedHostLimits(
+            host, self.max_concurrency, self.max_requests_per_second
+        )
+
+        while (request_slot_key := host_limits.acquire_request_slot()) is None:
+            time.sleep(HOST_REQUEST_SLOT_POLL_INTERVAL_IN_SECONDS)
+
+        try:
+            send_delay = host_limits.reserve_send_delay()
+
+            if send_delay > 0:
+                time.sleep(send_delay)
+
+            yield
+        finally:
+            host_limits.release_request_slot(request_slot_key)
+
+
+def get_http_client_options() -> dict:
+    """
+    The read timeout is the first byte deadline, it also bounds the silence between two chunks of the content.
+    """
+    return {
+        "follow_redirects": True,
+        "headers": {
+            "User-Agent": feedparser.USER_AGENT,
+            "Accept-Encoding": "gzip, deflate",
+        },
+        "timeout": httpx.Timeout(
+            settings.FEED_FETCH_FIRST_BYTE_TIMEOUT_IN_SECONDS,
+            connect=settings.FEED_FETCH_CONNECT_TIMEOUT_IN_SECONDS,
+        ),
+    }
+
+
+_http_client: Optional[httpx.Client] = None
+_host_limiter: Optional[HostLimiter] = None
+_async_host_limiter: Optional[AsyncHostLimiter] = None
+# The event loop and the async http client of the async fetches are per thread, a loop runs on a single thread.
+_async_fetch_context = threading.local()
+
+
+def build_http_client(**kwargs) -> httpx.Client:
+    return httpx.Client(**get_http_client_options(), **kwargs)
+
+
+def get_http_client() -> httpx.Client:
+    """
+    The http client shared by the sync fetches of the worker process, its pool keeps the connections
+        to the feeds hosts alive between the tasks to save the TCP and TLS handshakes.
+    """
+    global _http_client
+
+    if _http_client is None:
+        _http_client = build_http_client(
+            limits=httpx.Limits(
+                max_keepalive_connections=settings.FEED_FETCH_MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+
+    return _http_client
+
+
+def get_host_limiter() -> HostLimiter:
+    global _host_limiter
+
+    if _host_limiter is None:
+        _host_limiter = HostLimiter(
+            settings.FEED_FETCH_MAX_CONCURRENCY_PER_HOST,
+            settings.FEED_FETCH_MAX_REQUESTS_PER_SECOND_PER_HOST,
+        )
+
+    return _host_limiter
+
+
+def get_host_circuit_open_error(feed_instance: Feed) -> FeedHostCircuitOpenError:
+    return FeedHostCircuitOpenError(
+        None,
+        f"Feed with id: {feed_instance.id} fetch is short-circuited as its host keeps failing.",
+    )
+
+
+def record_hosts_fetch_results(
+    feed_instances: list[Feed],
+    fetched_responses: list[Union[FeedFetchResponse, Exception]],
+):
+    """
+    Report the fetch results of the feeds to the circuit breakers of their hosts, once per host.
+        A host is healthy if any of its feeds got a healthy response.
+    """
+    hosts_health = {}
+
+    for feed_instance, fetched_response in zip(feed_instances, fetched_responses):
+        if isinstance(fetched_response, FeedFetchResponse):
+            is_healthy = not HostCircuitBreaker.is_failure_status_code(
+                fetched_response.status_code
+            )
+        elif isinstance(fetched_response, HOST_FAILURE_ERRORS):
+            is_healthy = False
+        else:
+            continue
+
+        host = httpx.URL(feed_instance.url).host
+        hosts_health[host] = hosts_health.get(host, False) or is_healthy
+
+    for host, is_healthy in hosts_health.items():
+        if is_healthy:
+            HostCircuitBreaker(host).record_success()
+        else:
+            HostCircuitBreaker(host).record_failure()
+
+
+def split_feeds_by_host_circuit_breakers(
+    feed_instances: list[Feed],
+) -> tuple[list[Feed], list[Feed]]:
+    """
+    :return: the feeds whose hosts circuit breakers allow fetching them, and the short-circuited feeds.
+    """
+    allowed_hosts = {
+        host
+        for host in {
+            httpx.URL(feed_instance.url).host for feed_instance in feed_instances
+        }
+        if HostCircuitBreaker(host).allow_request()
+    }
+    allowed_feed_instances, short_circuited_feed_instances = [], []
+
+    for feed_instance in feed_instances:
+        if httpx.URL(feed_instance.url).host in allowed_hosts:
+            allowed_feed_instances.append(feed_instance)
+        else:
+            short_circuited_feed_instances.append(feed_instance)
+
+    return allowed_feed_instances, short_circuited_feed_instances
+
+
+def fetch_feed(feed_instance: Feed) -> FeedFetchResponse:
+    """
+    Download a feed content from its source using the feed ETag and Last-Modified values,
+        respecting the politeness limits, the circuit breaker of the feed host and the download limits.
+
+    :raises FeedHostCircuitOpenError: if the feed host keeps failing, without sending any request.
+    :raises FeedDownloadLimitExceededError: if the download overran one of its deadlines or the max content size.
+    """
+    if not HostCircuitBreaker(httpx.URL(feed_instance.url).host).allow_request():
+        raise get_host_circuit_open_error(feed_instance)
+
+    try:
+        fetched_response = download_feed(feed_instance)
+    except HOST_FAILURE_ERRORS as err:
+        record_hosts_fetch_results([feed_instance], [err])
+        raise
+
+    record_hosts_fetch_results([feed_instance], [fetched_response])
+    return fetched_response
+
+
+def download_feed(feed_instance: Feed) -> FeedFetchResponse:
+    with get_host_limiter().limit(httpx.URL(feed_instance.url).host):
+        deadline = time.monotonic() + settings.FEED_FETCH_TOTAL_TIMEOUT_IN_SECONDS
+
+        with download_timeouts_as_limit_errors(feed_instance):
+            with get_http_client().stream(
+                "GET",
+                feed_instance.url,
+                headers=get_conditional_request_headers(feed_instance),
+            ) as response:
+                content = read_response_content(feed_instance, response, deadline)
+
+    return build_feed_fetch_response(feed_instance, response, content)
+
+
+def build_async_http_client(**kwargs) -> httpx.AsyncClient:
+    """
+    Create the http client used to fetch the feeds from their sources concurrently.
+    """
+    return httpx.AsyncClient(**get_http_client_options(), **kwargs)
+
+
+def get_fetch_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    The event loop running the async fetches of the thread, it's kept between the tasks so the connections
+        of the async http client pool, which belong to the loop, are reused by the next fetches batches.
+    """
+    if getattr(_async_fetch_context, "event_loop", None) is None:
+        _async_fetch_context.event_loop = asyncio.new_event_loop()
+
+    return _async_fetch_context.event_loop
+
+
+def run_fetches(coroutine: Coroutine) -> Any:
+    """
+    Run the async fetches at the thread event loop till they are done.
+
+    A run interrupted by an exception raised from outside, like the celery task soft time limit, leaves
+        its fetches pending at the loop. They are cancelled, so they don't resume at the next run.
+    """
+    event_loop = get_fetch_event_loop()
+
+    try:
+        return event_loop.run_until_complete(coroutine)
+    except BaseException:
+        if pending_tasks := asyncio.all_tasks(event_loop):
+            for task in pending_tasks:
+                task.cancel()
+
+            event_loop.run_until_complete(
+                asyncio.gather(*pending_tasks, return_exceptions=True)
+            )
+
+        raise
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    The async http client of the thread event loop. The connections count is bounded by the callers concurrency,
+        the pool keeps up to `FEED_FETCH_MAX_KEEPALIVE_CONNECTIONS` of them alive between the fetches batches.
+    """
+    if getattr(_async_fetch_context, "http_client", None) is None:
+        _async_fetch_context.http_client = build_async_http_client(
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=settings.FEED_FETCH_MAX_KEEPALIVE_CONNECTIONS,
+            )
+        )
+
+    return _async_fetch_context.http_client
+
+
+def get_async_host_limiter() -> AsyncHostLimiter:
+    global _async_host_limiter
+
+    if _async_host_limiter is None:
+        _async_host_limiter = AsyncHostLimiter(
+            settings.FEED_FETCH_MAX_CONCURRENCY_PER_HOST,
+            settings.FEED_FETCH_MAX_REQUESTS_PER_SECOND_PER_HOST,
+        )
+
+    return _async_host_limiter
+
+
+async def fetch_feed_async(
+    client: httpx.AsyncClient, feed_instance: Feed
+) -> FeedFetchResponse:
+    """
+    Download a feed content from its source using the feed ETag and Last-Modified values,
+        within the first byte and total deadlines and the max content size.
+
+    :raises FeedDownloadLimitExceededError: if the download overran one of its limits.
+    """
+
+    async def download() -> FeedFetchResponse:
+        request = client.build_request(
+            "GET",
+            feed_instance.url,
+            headers=get_conditional_request_headers(feed_instance),
+        )
+        response = await asyncio.wait_for(
+            client.send(request, stream=True),
+            settings.FEED_FETCH_FIRST_BYTE_TIMEOUT_IN_SECONDS,
+        )
+
+        try:
+            content = await read_response_content_async(feed_instance, response)
+        finally:
+            await response.aclose()
+
+        return build_feed_fetch_response(feed_instance, response, content)
+
+    with download_timeouts_as_limit_errors(feed_instance):
+        return await asyncio.wait_for(
+            download(), settings.FEED_FETCH_TOTAL_TIMEOUT_IN_SECONDS
+        )
+
+
+async def fetch_feeds_async(
+    feed_instances: list[Feed], concurrency: int
+) -> list[Union[FeedFetchResponse, Exception]]:
+    """
+    Download the feeds contents concurrently, at most `concurrency` feeds are being downloaded at the same time
+        and the politeness limits per host are respected. Connections to the same host are reused.
+
+    :return: a list of fetch responses or the raised exceptions ordered the same as the given feeds.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    host_limiter = get_async_host_limiter()
+    client = get_async_http_client()
+
+    async def fetch(feed_instance: Feed) -> FeedFetchResponse:
+        async with host_limiter.limit(httpx.URL(feed_instance.url).host):
+            async with semaphore:
+                return await fetch_feed_async(client, feed_instance)
+
+    return await asyncio.gather(
+        *(fetch(feed_instance) for feed_instance in feed_instances),
+        return_exceptions=True,
+    )
+
+
+def fetch_feeds(
+    feed_instances: list[Feed], concurrency: Optional[int] = None
+) -> list[Union[FeedFetchResponse, Exception]]:
+    """
+    Download the feeds contents concurrently from a sync context like the celery tasks.
+        Feeds of the hosts with open circuit breakers are short-circuited with `FeedHostCircuitOpenError`.
+    """
+    if not feed_instances:
+        return []
+
+    allowed_feed_instances, _ = split_feeds_by_host_circuit_breakers(feed_instances)
+    allowed_fetched_responses = (
+        run_fetches(
+            fetch_feeds_async(
+                allowed_feed_instances, concurrency or settings.FEED_FETCH_CONCURRENCY
+            )
+        )
+        if allowed_feed_instances
+        else []
+    )
+    record_hosts_fetch_results(allowed_feed_instances, allowed_fetched_responses)
+
+    fetched_responses = dict(
+        zip(
+            (feed_instance.id for feed_instance in allowed_feed_instances),
+            allowed_fetched_responses,
+        )
+    )
+    return [
+        fetched_responses.get(feed_instance.id)
+        or get_host_circuit_open_error(feed_instance)
+        for feed_instance in feed_instances
+    ]
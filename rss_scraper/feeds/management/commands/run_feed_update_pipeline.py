@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rss_scraper.feeds.pipelines import FeedUpdatePipeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the due feeds through the fetch, parse and persist pipeline. "
+        "Enable `FEED_UPDATE_PIPELINE_MODE` to stop the periodic task from scheduling the batch tasks meanwhile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fetch-concurrency",
+            type=int,
+            help="Max number of feeds downloaded at the same time.",
+        )
+        parser.add_argument(
+            "--parse-processes",
+            type=int,
+            help="Number of the feed parser processes, defaults to the number of CPU cores.",
+        )
+        parser.add_argument(
+            "--persist-batch-size",
+            type=int,
+            help="Max number of feeds saved in one transaction.",
+        )
+        parser.add_argument(
+            "--queue-size",
+            type=int,
+            help="Max number of feeds waiting between two stages.",
+        )
+        parser.add_argument(
+            "--loop-interval",
+            type=int,
+            default=0,
+            help="Seconds to wait between two updates of the due feeds, 0 to update them only once.",
+        )
+
+    def handle(self, *args, **options):
+        with FeedUpdatePipeline(
+            fetch_concurrency=options["fetch_concurrency"],
+            parse_processes=options["parse_processes"],
+            persist_batch_size=options["persist_batch_size"],
+            queue_size=options["queue_size"],
+        ) as pipeline:
+            while True:
+                feeds_count = pipeline.update_due_feeds()
+                self.stdout.write(f"Updated {feeds_count} due feeds.")
+
+                if not options["loop_interval"]:
+                    break
+
+                time.sleep(options["loop_interval"])
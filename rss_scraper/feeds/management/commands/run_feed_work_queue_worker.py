@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rss_scraper.feeds.tasks import update_next_due_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        "Claim the due feeds from the DB in batches and update them, many workers can run side by side. "
+        "Enable `FEED_UPDATE_WORK_QUEUE_MODE` to stop the periodic task from scheduling the batch tasks meanwhile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Max number of feeds claimed and updated at once.",
+        )
+        parser.add_argument(
+            "--idle-interval",
+            type=int,
+            help="Seconds to wait before claiming again once no feed is due.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Claim and update one batch only.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"] or settings.FEED_WORK_QUEUE_BATCH_SIZE
+        idle_interval = (
+            options["idle_interval"]
+            or settings.FEED_WORK_QUEUE_IDLE_INTERVAL_IN_SECONDS
+        )
+
+        while True:
+            feeds_count = update_next_due_feeds(batch_size)
+            self.stdout.write(f"Updated {feeds_count} due feeds.")
+
+            if options["once"]:
+                break
+
+            # A full batch means more feeds may be due already.
+            if feeds_count < batch_size:
+                time.sleep(idle_interval)
@@ -0,0 +1,31 @@
+import logging
+import time
+from typing import Optional
+
+# Metrics are logged through their own logger, so they can be routed to the metrics collector apart from the logs.
+metrics_logger = logging.getLogger(__name__)
+
+FEED_SCHEDULER_LAG = "feeds.scheduler.lag_seconds"
+FEED_UPDATE_QUEUE_WAIT = "feeds.update.queue_wait_seconds"
+FEED_UPDATE_ENQUEUE_TO_FIRST_ITEM = "feeds.update.enqueue_to_first_item_seconds"
+
+
+def emit_metric(name: str, value: float, **tags):
+    """
+    Log a metric measurement as `name=value tag=value ...`, the measurement is also attached to the log record.
+    """
+    formatted_tags = "".join(f" {tag}={tag_value}" for tag, tag_value in tags.items())
+    metrics_logger.info(
+        f"{name}={value:.3f}{formatted_tags}",
+        extra={"metric": name, "value": value, "tags": tags},
+    )
+
+
+def get_seconds_since(timestamp: Optional[float]) -> Optional[float]:
+    """
+    :param timestamp: a `time.time()` timestamp, taken by another process like the one which queued a task.
+    """
+    if timestamp is None:
+        return None
+
+    return max(time.time() - timestamp, 0)
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.11 on 2026-10-18 18:53
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def delete_duplicate_feed_items(apps, schema_editor):
+    """
+    Keep only the latest item of every (feed, url) pair so the unique constraint can be created.
+    The kept item is marked as read if any of its duplicates has been read, so the user read state isn't lost.
+    """
+    Item = apps.get_model('feeds', 'Item')
+    duplicates = (
+        Item.objects.values('feed_id', 'url')
+        # The read status is the highest one, the max status is read if any of the duplicates is read.
+        .annotate(items_count=Count('id'), latest_item_id=Max('id'), max_status=Max('status'))
+        .filter(items_count__gt=1)
+    )
+
+    for duplicate in duplicates.iterator():
+        Item.objects.filter(id=duplicate['latest_item_id']).update(status=duplicate['max_status'])
+        Item.objects.filter(feed_id=duplicate['feed_id'], url=duplicate['url']).exclude(
+            id=duplicate['latest_item_id']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0005_alter_item_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_feed_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(fields=('feed', 'url'), name='unique_feed_item_url'),
+        ),
+    ]
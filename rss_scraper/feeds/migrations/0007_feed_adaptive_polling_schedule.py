@@ -0,0 +1,34 @@
+# Generated by Django 3.2.11 on 2026-10-18 18:54
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0006_item_unique_feed_item_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='consecutive_fetch_failures',
+            field=models.PositiveIntegerField(default=0, help_text='Number of the failed fetches since the last success.'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='fetch_interval',
+            field=models.DurationField(default=datetime.timedelta(seconds=1800), help_text='The adaptive polling interval, computed from the feed publish rate and its not modified responses.'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='next_fetch_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the feed is due to be fetched again from the source, empty means as soon as possible.', null=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='not_modified_ratio',
+            field=models.FloatField(default=0, help_text='Moving average of the fetches answered with not modified, recent fetches weigh the most.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0007_feed_adaptive_polling_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 hash of the last saved feed content, an identical content is not parsed and saved again.', max_length=64),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0008_feed_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='conditional_fetch_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of the fetches sent with the ETag or Last-Modified.'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='last_modified_header',
+            field=models.CharField(blank=True, help_text='The raw Last-Modified header of the last feed response, sent back as is at `If-Modified-Since` header.', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='not_modified_fetch_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of the conditional fetches answered with `304 Not Modified`.'),
+        ),
+        migrations.AlterField(
+            model_name='feed',
+            name='e_tag',
+            field=models.CharField(blank=True, help_text='The raw ETag header of the last feed response, sent back as is at `If-None-Match` header.', max_length=255),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0009_feed_conditional_request_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='cache_expires_at',
+            field=models.DateTimeField(blank=True, help_text='When the last feed response expires, from its Cache-Control or Expires headers.', null=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='skip_days',
+            field=models.JSONField(blank=True, default=list, help_text='The days at which the source asks not to be fetched.'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='skip_hours',
+            field=models.JSONField(blank=True, default=list, help_text='The GMT hours at which the source asks not to be fetched.'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='ttl',
+            field=models.DurationField(blank=True, help_text='How long the source declares the feed can be cached, from its RSS `ttl` or `sy:updatePeriod`.', null=True),
+        ),
+    ]
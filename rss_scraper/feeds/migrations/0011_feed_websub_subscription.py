@@ -0,0 +1,33 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0010_feed_source_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='websub_hub_url',
+            field=models.URLField(blank=True, help_text='The WebSub hub advertised by the feed to push its updates.'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='websub_lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text="When the verified WebSub subscription expires, the feed isn't polled till then.", null=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='websub_secret',
+            field=models.CharField(blank=True, help_text='Secret shared with the WebSub hub to sign the pushed content.', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='websub_topic_url',
+            field=models.URLField(blank=True, help_text='The feed url the WebSub hub knows it by, its `self` link.'),
+        ),
+    ]
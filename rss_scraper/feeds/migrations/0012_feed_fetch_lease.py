@@ -0,0 +1,23 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0011_feed_websub_subscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='fetch_lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='Till when the feed update is leased, duplicate updates are dropped till then.', null=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='fetch_lease_token',
+            field=models.CharField(blank=True, help_text='Token of the update which is queued or running for the feed.', max_length=32),
+        ),
+    ]
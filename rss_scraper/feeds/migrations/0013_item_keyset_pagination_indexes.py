@@ -0,0 +1,21 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0012_feed_fetch_lease'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-published_at', '-id'], name='item_published_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['feed', '-published_at', '-id'], name='item_feed_published_at_id_idx'),
+        ),
+    ]
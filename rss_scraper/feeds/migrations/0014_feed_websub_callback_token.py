@@ -0,0 +1,18 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0013_item_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='websub_callback_token',
+            field=models.CharField(blank=True, help_text='Unguessable token of the WebSub callback url, only the hub intents carrying it are verified.', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0014_feed_websub_callback_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='fetch_lease_is_preemptible',
+            field=models.BooleanField(default=False, help_text="Whether the lease is held by a background update which hasn't started yet, a user update can take it over."),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.11 on 2026-10-18 20:15
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def set_never_fetched_feeds_due_at_creation(apps, schema_editor):
+    """
+    A never fetched feed has been due since it was created, so it keeps its place in the due feeds order.
+    """
+    Feed = apps.get_model('feeds', 'Feed')
+    Feed.objects.filter(next_fetch_at__isnull=True).update(next_fetch_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0015_feed_fetch_lease_is_preemptible'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_never_fetched_feeds_due_at_creation, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='feed',
+            name='next_fetch_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text="When the feed is due to be fetched again from the source, a new feed is due once it's created."),
+        ),
+        migrations.AddIndex(
+            model_name='feed',
+            index=models.Index(fields=['next_fetch_at', 'id'], name='feed_next_fetch_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feed',
+            index=models.Index(fields=['user', 'next_fetch_at', 'id'], name='feed_user_next_fetch_at_id_idx'),
+        ),
+    ]
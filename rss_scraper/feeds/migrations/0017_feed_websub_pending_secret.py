@@ -0,0 +1,18 @@
+# Generated by Django 3.2.11 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0016_feed_next_fetch_at_due_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='websub_pending_secret',
+            field=models.CharField(blank=True, help_text="Secret of the subscription request the WebSub hub hasn't verified yet, it replaces the secret then.", max_length=64),
+        ),
+    ]
@@ -1,5 +1,23 @@
+import hashlib
+from typing import Any, Callable, Optional, Type
+
+from django.db.models import QuerySet
 from django.http import HttpRequest
-from rest_framework import serializers
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import serializers, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from rss_scraper.feeds.caching import (
+    get_cached_response_data,
+    get_user_cache_generation,
+    get_user_cache_generation_at,
+    get_user_response_cache_key,
+    set_cached_response_data,
+)
 
 
 class DisableAdminAddPermission:
@@ -34,4 +52,160 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
                 self.fields.pop(field_name)
 
         for field_name in exclude:
-            self.fields.pop(field_name)
+            self.fields.pop(field_name, None)
+
+
+class UserCachedResponseMixin:
+    """
+    A viewset mixin which caches the `list` and `retrieve` responses data per user, so repeated requests
+        skip the DB and the serialization. The cache is invalidated by the user cache generation,
+        which every write to the user feeds and items moves forward.
+    """
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cached_response(
+        self, handler: Callable[..., Response], request: Request, *args, **kwargs
+    ) -> Response:
+        cache_key = get_user_response_cache_key(
+            request.user.id, self.action, request.build_absolute_uri()
+        )
+
+        if (data := get_cached_response_data(cache_key)) is not None:
+            return Response(data, status=status.HTTP_200_OK)
+
+        response = handler(request, *args, **kwargs)
+
+        if response.status_code == status.HTTP_200_OK:
+            set_cached_response_data(cache_key, response.data)
+
+        return response
+
+
+class ItemsConditionalResponseMixin:
+    """
+    A viewset mixin which answers the items list requests with `304 Not Modified` if the client copy is still
+        fresh, without serializing the page.
+
+    - `ETag` of the user cache generation and the request path, compared with `If-None-Match`. Every write to
+        the user feeds and items moves the generation forward, so it is read from the cache without touching the DB.
+    - `Last-Modified` of the time the user cache generation moved forward at, compared with `If-Modified-Since`.
+        It's stored along with the generation so it's read from the cache as well, it changes with any of the user
+        feeds and items, not only the listed ones.
+    """
+
+    def get_conditional_items_response(
+        self,
+        request: Request,
+        get_response: Callable[[], Response],
+    ) -> HttpResponseBase:
+        etag = quote_etag(
+            hashlib.md5(
+                f"{request.user.id}:{get_user_cache_generation(request.user.id)}:"
+                f"{request.get_full_path()}".encode()
+            ).hexdigest()
+        )
+        last_modified = get_user_cache_generation_at(request.user.id)
+
+        if not_modified_response := get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        ):
+            return not_modified_response
+
+        response = get_response()
+
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+
+        return response
+
+
+class SparseFieldsetsMixin:
+    """
+    A viewset mixin which lets the clients pick the serialized fields of a `DynamicFieldsModelSerializer`
+        using the `fields` and `exclude` comma separated query params, e.g. `?fields=id,title`.
+        The columns of the left out fields are not read from the DB either, using `.only()` and `.defer()`.
+    """
+
+    fields_query_param = "fields"
+    exclude_query_param = "exclude"
+    # Columns which are always read, even if their fields are left out of the response.
+    sparse_fieldsets_required_fields = ("id",)
+
+    def get_query_param_fields(self, query_param: str) -> Optional[tuple[str, ...]]:
+        if query_param not in self.request.query_params:
+            return None
+
+        return tuple(
+            field_name.strip()
+            for field_name in self.request.query_params[query_param].split(",")
+            if field_name.strip()
+        )
+
+    def get_sparse_fieldsets(
+        self, serializer_class: Type[DynamicFieldsModelSerializer]
+    ) -> tuple[Optional[tuple[str, ...]], tuple[str, ...]]:
+        """
+        :return: (the fields to be included, None to include all of them, the fields to be excluded).
+        :raise ValidationError: if a requested field is not one of the serializer fields.
+        """
+        fields = self.get_query_param_fields(self.fields_query_param)
+        exclude = self.get_query_param_fields(self.exclude_query_param) or ()
+
+        for query_param, field_names in (
+            (self.fields_query_param, fields or ()),
+            (self.exclude_query_param, exclude),
+        ):
+            if unknown_field_names := set(field_names) - set(
+                serializer_class.Meta.fields
+            ):
+                raise ValidationError(
+                    {
+                        query_param: [
+                            f"Unknown fields: {', '.join(sorted(unknown_field_names))}. "
+                            f"Choose from: {', '.join(serializer_class.Meta.fields)}."
+                        ]
+                    }
+                )
+
+        return fields, exclude
+
+    def get_sparse_serializer_kwargs(
+        self,
+        serializer_class: Type[DynamicFieldsModelSerializer],
+        exclude: tuple[str, ...] = (),
+    ) -> dict[str, Any]:
+        fields, requested_exclude = self.get_sparse_fieldsets(serializer_class)
+        return {"fields": fields, "exclude": (*exclude, *requested_exclude)}
+
+    def get_sparse_queryset(
+        self,
+        queryset: QuerySet,
+        serializer_class: Type[DynamicFieldsModelSerializer],
+        exclude: tuple[str, ...] = (),
+    ) -> QuerySet:
+        """
+        Read only the columns of the fields to be serialized, the required fields are always read.
+        """
+        fields, requested_exclude = self.get_sparse_fieldsets(serializer_class)
+        model_field_names = {
+            model_field.name for model_field in queryset.model._meta.concrete_fields
+        }
+
+        if fields is not None:
+            return queryset.only(
+                *(set(fields) & model_field_names)
+                | set(self.sparse_fieldsets_required_fields)
+            )
+
+        deferred_field_names = (
+            (set(exclude) | set(requested_exclude)) & model_field_names
+        ) - set(self.sparse_fieldsets_required_fields)
+        return (
+            queryset.defer(*deferred_field_names) if deferred_field_names else queryset
+        )
@@ -1,5 +1,12 @@
+import datetime
+from typing import Optional
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from rss_scraper.feeds.enums import ItemStatus
@@ -8,6 +15,159 @@ from rss_scraper.utils.models import AbstractTimeStampedModel
 User = get_user_model()
 
 
+class FeedQuerySet(models.QuerySet):
+    def auto_updatable(self) -> "FeedQuerySet":
+        """
+        Feeds followed by their creators with active auto update.
+        """
+        return self.filter(is_followed=True, auto_update_is_active=True)
+
+    def shared_source_leaders(self) -> "FeedQuerySet":
+        """
+        One feed per source url, the auto updatable feed with the lowest id of every url.
+
+        The leader feed is the canonical source record of its url, it's the only one to be fetched and parsed
+            at the refresh cycle then the parsed data is shared with the rest of the url subscribers.
+        """
+        return self.exclude(
+            Exists(
+                Feed.objects.auto_updatable().filter(
+                    url=OuterRef("url"), id__lt=OuterRef("id")
+                )
+            )
+        )
+
+    def due_for_fetch(self) -> "FeedQuerySet":
+        """
+        Feeds which their adaptive polling schedule says it's time to fetch them again.
+
+        Feeds of a source url pushed by a WebSub hub are not polled, till their subscription is about to expire
+            so the poll renews it.
+        """
+        now = timezone.now()
+        return self.filter(next_fetch_at__lte=now).exclude(
+            Exists(
+                Feed.objects.filter(
+                    url=OuterRef("url"),
+                    websub_lease_expires_at__gt=now
+                    + datetime.timedelta(
+                        seconds=settings.FEED_WEBSUB_RENEW_BEFORE_IN_SECONDS
+                    ),
+                )
+            )
+        )
+
+    def in_fair_user_order(self) -> "FeedQuerySet":
+        """
+        Feeds in round robin order across their creators: the first feed of every user, then the second one, ...
+            so the users with many feeds don't crowd out the feeds of the other users.
+
+        Every user feeds are ranked at `user_fetch_rank` starting from 1, the most overdue feed first.
+        """
+        return self.annotate(
+            user_fetch_rank=Window(
+                RowNumber(),
+                partition_by=[F("user_id")],
+                order_by=[F("next_fetch_at").asc(), F("id").asc()],
+            )
+        ).order_by("user_fetch_rank", "next_fetch_at", "id")
+
+    def with_free_fetch_lease(
+        self, token: str = "", preempt: bool = False
+    ) -> "FeedQuerySet":
+        """
+        Feeds which are not queued or being updated, their fetch lease is not claimed or has expired.
+
+        :param token: a lease token, the feeds already leased with it are included as well.
+        :param preempt: include the feeds whose lease is preemptible, their background update hasn't started yet.
+        """
+        free_fetch_lease = Q(fetch_lease_expires_at__isnull=True) | Q(
+            fetch_lease_expires_at__lte=timezone.now()
+        )
+
+        if token:
+            free_fetch_lease |= Q(fetch_lease_token=token)
+
+        if preempt:
+            free_fetch_lease |= Q(fetch_lease_is_preemptible=True)
+
+        return self.filter(free_fetch_lease)
+
+    def claim_fetch_lease(
+        self,
+        token: str,
+        lease_in_seconds: Optional[int] = None,
+        preemptible: bool = False,
+        preempt: bool = False,
+    ) -> list[int]:
+        """
+        Claim the fetch lease of the feeds which are not queued or being updated already, using a conditional
+            UPDATE so only one of the concurrent claims of a feed wins. A claim with the same token renews the lease.
+
+        A background update which waits to start, like a spread batch or a retrial, claims a preemptible lease.
+            A user requested update takes it over, so it isn't held back till the background update runs.
+            The background update finds its lease taken once it starts and is dropped.
+
+        :param token: unique token of the claim, the update of the claimed feeds is done under it.
+        :param lease_in_seconds: how long the claim lasts, defaults to `FEED_FETCH_LEASE_TIMEOUT_IN_SECONDS`.
+        :param preemptible: whether the claimed lease can be taken over by a preempting claim.
+        :param preempt: take over the preemptible leases as well.
+        :return: ids of the claimed feeds.
+        """
+        expires_at = timezone.now() + datetime.timedelta(
+            seconds=lease_in_seconds or settings.FEED_FETCH_LEASE_TIMEOUT_IN_SECONDS
+        )
+        self.with_free_fetch_lease(token, preempt).update(
+            fetch_lease_token=token,
+            fetch_lease_expires_at=expires_at,
+            fetch_lease_is_preemptible=preemptible,
+        )
+        return list(
+            self.filter(fetch_lease_token=token)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def claim_next_fetch_leases(
+        self, token: str, limit: int, lease_in_seconds: Optional[int] = None
+    ) -> list[int]:
+        """
+        Claim the fetch lease of up to `limit` feeds, the earliest due first, using the feeds table as a work queue.
+
+        The free feeds are selected with `SELECT ... FOR UPDATE SKIP LOCKED`, the rows locked by a concurrent claim
+            are skipped instead of waited for, so every worker gets its own feeds. The locks are held only till
+            the lease is claimed, an unfinished lease expires on its own.
+
+        Unlike the scheduler, the claims are not taken round robin across the users with `in_fair_user_order`.
+            The window ranking can't be locked `FOR UPDATE` and would rank the whole due set at every claim,
+            while ranking it at a subquery would have the concurrent workers skip the same locked top rows.
+            The workers drain the due feeds continuously, so a user with many feeds delays the others only
+            by the time its overdue feeds take to be claimed.
+
+        :return: ids of the claimed feeds.
+        """
+        with transaction.atomic():
+            feed_ids = list(
+                self.with_free_fetch_lease()
+                .order_by("next_fetch_at", "id")
+                .select_for_update(skip_locked=True, of=("self",))
+                .values_list("id", flat=True)[:limit]
+            )
+            return Feed.objects.filter(id__in=feed_ids).claim_fetch_lease(
+                token, lease_in_seconds
+            )
+
+    def release_fetch_lease(self, token: str) -> int:
+        """
+        Release the fetch lease of the feeds claimed with the token, so they can be queued again.
+        """
+        return self.filter(fetch_lease_token=token).update(
+            fetch_lease_token="",
+            fetch_lease_expires_at=None,
+            fetch_lease_is_preemptible=False,
+        )
+
+
 class Feed(AbstractTimeStampedModel):
     """
     RSS Feed DB Model.
@@ -44,7 +204,128 @@ class Feed(AbstractTimeStampedModel):
         max_length=255,
         blank=True,
         help_text=_(
-            "ETag and Last-Modified Headers aka `last_update_by_source_at` can be used to save resources bandwidth."
+            "The raw ETag header of the last feed response, sent back as is at `If-None-Match` header."
+        ),
+    )
+    last_modified_header = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text=_(
+            "The raw Last-Modified header of the last feed response, sent back as is at `If-Modified-Since` header."
+        ),
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text=_(
+            "SHA-256 hash of the last saved feed content, an identical content is not parsed and saved again."
+        ),
+    )
+    ttl = models.DurationField(
+        null=True,
+        blank=True,
+        help_text=_(
+            "How long the source declares the feed can be cached, from its RSS `ttl` or `sy:updatePeriod`."
+        ),
+    )
+    skip_hours = models.JSONField(
+        default=list,
+        blank=True,
+        help_text=_("The GMT hours at which the source asks not to be fetched."),
+    )
+    skip_days = models.JSONField(
+        default=list,
+        blank=True,
+        help_text=_("The days at which the source asks not to be fetched."),
+    )
+    cache_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_(
+            "When the last feed response expires, from its Cache-Control or Expires headers."
+        ),
+    )
+    websub_hub_url = models.URLField(
+        blank=True,
+        help_text=_("The WebSub hub advertised by the feed to push its updates."),
+    )
+    websub_topic_url = models.URLField(
+        blank=True,
+        help_text=_("The feed url the WebSub hub knows it by, its `self` link."),
+    )
+    websub_secret = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text=_("Secret shared with the WebSub hub to sign the pushed content."),
+    )
+    websub_pending_secret = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text=_(
+            "Secret of the subscription request the WebSub hub hasn't verified yet, it replaces the secret then."
+        ),
+    )
+    websub_callback_token = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text=_(
+            "Unguessable token of the WebSub callback url, only the hub intents carrying it are verified."
+        ),
+    )
+    websub_lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_(
+            "When the verified WebSub subscription expires, the feed isn't polled till then."
+        ),
+    )
+    fetch_lease_token = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text=_("Token of the update which is queued or running for the feed."),
+    )
+    fetch_lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_(
+            "Till when the feed update is leased, duplicate updates are dropped till then."
+        ),
+    )
+    fetch_lease_is_preemptible = models.BooleanField(
+        default=False,
+        help_text=_(
+            "Whether the lease is held by a background update which hasn't started yet, a user update can take it over."
+        ),
+    )
+    next_fetch_at = models.DateTimeField(
+        default=timezone.now,
+        help_text=_(
+            "When the feed is due to be fetched again from the source, a new feed is due once it's created."
+        ),
+    )
+    fetch_interval = models.DurationField(
+        default=datetime.timedelta(minutes=30),
+        help_text=_(
+            "The adaptive polling interval, computed from the feed publish rate and its not modified responses."
+        ),
+    )
+    not_modified_ratio = models.FloatField(
+        default=0,
+        help_text=_(
+            "Moving average of the fetches answered with not modified, recent fetches weigh the most."
+        ),
+    )
+    consecutive_fetch_failures = models.PositiveIntegerField(
+        default=0, help_text=_("Number of the failed fetches since the last success.")
+    )
+    conditional_fetch_count = models.PositiveIntegerField(
+        default=0,
+        help_text=_("Number of the fetches sent with the ETag or Last-Modified."),
+    )
+    not_modified_fetch_count = models.PositiveIntegerField(
+        default=0,
+        help_text=_(
+            "Number of the conditional fetches answered with `304 Not Modified`."
         ),
     )
 
@@ -53,15 +334,47 @@ class Feed(AbstractTimeStampedModel):
         User, related_name=_("feeds"), blank=True, null=True, on_delete=models.SET_NULL
     )
 
+    objects = FeedQuerySet.as_manager()
+
     class Meta:
         unique_together = ("url", "user")
         ordering = ("-updated_at",)
+        # Match the due feeds order, for the fetch lease claims and for the round robin ranking of every user feeds.
+        indexes = [
+            models.Index(
+                fields=("next_fetch_at", "id"), name="feed_next_fetch_at_id_idx"
+            ),
+            models.Index(
+                fields=("user", "next_fetch_at", "id"),
+                name="feed_user_next_fetch_at_id_idx",
+            ),
+        ]
 
     def __str__(self):
         return (
             f"{self.__class__.__name__}(id={self.id}, url={self.url}, user={self.user})"
         )
 
+    @property
+    def not_modified_hit_rate(self) -> Optional[float]:
+        """
+        The share of the conditional fetches answered with `304 Not Modified`, empty if none has been sent yet.
+        """
+        if not self.conditional_fetch_count:
+            return None
+
+        return self.not_modified_fetch_count / self.conditional_fetch_count
+
+    @property
+    def is_pushed(self) -> bool:
+        """
+        Whether the feed updates are pushed by its WebSub hub.
+        """
+        return bool(
+            self.websub_lease_expires_at
+            and self.websub_lease_expires_at > timezone.now()
+        )
+
     def follow(self):
         self.is_followed = True
         self.save()
@@ -79,6 +392,67 @@ class Feed(AbstractTimeStampedModel):
         self.save()
 
 
+class ItemQuerySet(models.QuerySet):
+    UPSERT_BATCH_SIZE = 500
+
+    def bulk_upsert(self, items: list["Item"], batch_size: int = UPSERT_BATCH_SIZE):
+        """
+        Insert the given items or update the content of the already existing items with the same feed and url,
+            using one `INSERT ... ON CONFLICT (feed_id, url) DO UPDATE` statement per batch.
+        The items status is kept as it is for the existing items, so read items stay read.
+
+        :param items: unsaved item instances, expected to have unique urls per feed.
+        """
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        now = timezone.now()
+        insert_fields = [
+            self.model._meta.get_field(field_name)
+            for field_name in (
+                "created_at",
+                "updated_at",
+                "feed",
+                "url",
+                "title",
+                "description",
+                "status",
+                "published_at",
+            )
+        ]
+        update_columns = ("updated_at", "title", "description", "published_at")
+        row_placeholder = f"({', '.join(['%s'] * len(insert_fields))})"
+        sql_prefix = (
+            f"INSERT INTO {quote_name(self.model._meta.db_table)} "
+            f"({', '.join(quote_name(field.column) for field in insert_fields)}) VALUES "
+        )
+        sql_suffix = (
+            f" ON CONFLICT ({quote_name('feed_id')}, {quote_name('url')}) DO UPDATE SET "
+            + ", ".join(
+                f"{quote_name(column)} = EXCLUDED.{quote_name(column)}"
+                for column in update_columns
+            )
+        )
+
+        for item in items:
+            item.created_at = item.updated_at = now
+
+        with connection.cursor() as cursor:
+            for batch_start in range(0, len(items), batch_size):
+                batch_end = batch_start + batch_size
+                batch_items = items[batch_start:batch_end]
+                params = [
+                    field.get_db_prep_save(getattr(item, field.attname), connection)
+                    for item in batch_items
+                    for field in insert_fields
+                ]
+                cursor.execute(
+                    sql_prefix
+                    + ", ".join([row_placeholder] * len(batch_items))
+                    + sql_suffix,
+                    params,
+                )
+
+
 class Item(AbstractTimeStampedModel):
     """
     RSS Feed Item DB Model.
@@ -106,8 +480,23 @@ class Item(AbstractTimeStampedModel):
     # relationships
     feed = models.ForeignKey(Feed, related_name=_("items"), on_delete=models.CASCADE)
 
+    objects = ItemQuerySet.as_manager()
+
     class Meta:
         ordering = ("-published_at", "-updated_at")
+        constraints = [
+            models.UniqueConstraint(fields=("feed", "url"), name="unique_feed_item_url")
+        ]
+        # Match the items keyset pagination order, for the timeline of all the user feeds and for a single feed.
+        indexes = [
+            models.Index(
+                fields=("-published_at", "-id"), name="item_published_at_id_idx"
+            ),
+            models.Index(
+                fields=("feed", "-published_at", "-id"),
+                name="item_feed_published_at_id_idx",
+            ),
+        ]
 
     def __str__(self):
         return (
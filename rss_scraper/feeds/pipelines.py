@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Union
+
+import httpx
+from django.conf import settings
+from django.db import connections, transaction
+
+from rss_scraper.feeds.fetchers import (
+    FeedFetchResponse,
+    fetch_feed_async,
+    get_async_host_limiter,
+    get_async_http_client,
+    get_host_circuit_open_error,
+    record_hosts_fetch_results,
+    run_fetches,
+    split_feeds_by_host_circuit_breakers,
+)
+from rss_scraper.feeds.models import Feed
+from rss_scraper.feeds.services import FeedParsedData, FeedReaderService
+from rss_scraper.feeds.tasks import update_fetched_feed
+from rss_scraper.feeds.utils import (
+    get_content_hash,
+    get_fetch_lease_token,
+    iterate_fair_ids_in_chunks,
+)
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_NAME = "feed_update_pipeline"
+
+FetchResult = Union[FeedFetchResponse, Exception]
+
+
+def parse_fetched_feed(fetched_response: FeedFetchResponse) -> FeedParsedData:
+    """
+    Parser processes entry point. The parsing exception is sent back as text as not all of them can be pickled.
+    """
+    feed_parsed_data = FeedReaderService.build_feed_parsed_data(fetched_response)
+
+    if feed_parsed_data.exception is not None:
+        feed_parsed_data = feed_parsed_data._replace(
+            exception=repr(feed_parsed_data.exception)
+        )
+
+    return feed_parsed_data
+
+
+class FeedUpdatePipeline:
+    """
+    Update feeds through three stages connected with bounded queues, so each stage is sized for its own work.
+
+    - Fetch: I/O bound, up to `fetch_concurrency` feeds are downloaded concurrently by the event loop.
+    - Parse: CPU bound, feedparser runs at a pool of `parse_processes` processes, one per CPU core by default.
+    - Persist: the parsed feeds are saved in batches of up to `persist_batch_size` feeds, one transaction per batch,
+        from a single DB thread.
+
+    Every queue holds at most `queue_size` feeds, a full queue pauses the stage before it.
+    The process pool can't be created from the celery prefork workers, so the pipeline runs at its own process
+        using the `run_feed_update_pipeline` command.
+
+    Usage:
+        - with FeedUpdatePipeline() as pipeline:
+            pipeline.update_due_feeds()
+    """
+
+    def __init__(
+        self,
+        fetch_concurrency: Optional[int] = None,
+        parse_processes: Optional[int] = None,
+        persist_batch_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ):
+        self.fetch_concurrency = (
+            fetch_concurrency or settings.FEED_PIPELINE_FETCH_CONCURRENCY
+        )
+        self.parse_processes = (
+            parse_processes or settings.FEED_PIPELINE_PARSE_PROCESSES or os.cpu_count()
+        )
+        self.persist_batch_size = (
+            persist_batch_size or settings.FEED_PIPELINE_PERSIST_BATCH_SIZE
+        )
+        self.queue_size = queue_size or settings.FEED_PIPELINE_QUEUE_SIZE
+        self.fetch_lease_token = get_fetch_lease_token()
+        self.parse_executor = None
+        self.persist_executor = None
+
+    def __enter__(self) -> "FeedUpdatePipeline":
+        # The parser processes are forked to inherit the already set up django apps, they are started right away
+        # before the pipeline threads exist, so no lock held by these threads is copied to them.
+        self.parse_executor = ProcessPoolExecutor(
+            self.parse_processes, mp_context=multiprocessing.get_context("fork")
+        )
+        self.parse_executor.submit(os.getpid).result()
+        self.persist_executor = ThreadPoolExecutor(1)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.persist_executor.submit(connections.close_all).result()
+        self.persist_executor.shutdown()
+        self.parse_executor.shutdown()
+
+    def update_due_feeds(self) -> int:
+        """
+        Update the followed feeds which are due to be fetched, one chunk of feeds at a time.
+            The feeds are taken round robin across their creators, up to `FEED_UPDATE_USER_BUDGET_PER_CYCLE`
+            feeds per user.
+
+        :return: the number of the updated feeds.
+        """
+        due_feeds_queryset = (
+            Feed.objects.auto_updatable().due_for_fetch().shared_source_leaders()
+        )
+        feeds_count = 0
+
+        for feed_ids in iterate_fair_ids_in_chunks(
+            due_feeds_queryset,
+            settings.FEED_SCHEDULER_CHUNK_SIZE,
+            settings.FEED_UPDATE_USER_BUDGET_PER_CYCLE,
+        ):
+            self.update_feeds(list(Feed.objects.filter(id__in=feed_ids)))
+            feeds_count += len(feed_ids)
+
+        return feeds_count
+
+    def update_feeds(self, feed_instances: list[Feed]):
+        """
+        Update the feeds whose fetch lease is claimed, the others are being updated by the feed update tasks.
+        """
+        claimed_feed_ids = set(
+            Feed.objects.filter(
+                id__in=[feed_instance.id for feed_instance in feed_instances]
+            ).claim_fetch_lease(self.fetch_lease_token)
+        )
+        feed_instances = [
+            feed_instance
+            for feed_instance in feed_instances
+            if feed_instance.id in claimed_feed_ids
+        ]
+        (
+            allowed_feed_instances,
+            short_circuited_feed_instances,
+        ) = split_feeds_by_host_circuit_breakers(feed_instances)
+        self.persist_batch(
+            [
+                (feed_instance, None, get_host_circuit_open_error(feed_instance))
+                for feed_instance in short_circuited_feed_instances
+            ]
+        )
+
+        if allowed_feed_instances:
+            run_fetches(self.run_stages(allowed_feed_instances))
+
+    async def run_stages(self, feed_instances: list[Feed]):
+        """
+        Run the stages till all the feeds are persisted. Every stage stops the next one once it is done,
+            a failing stage fails the whole run instead of leaving the other stages blocked on its queue.
+        """
+        parse_queue = asyncio.Queue(self.queue_size)
+        persist_queue = asyncio.Queue(self.queue_size)
+
+        async def fetch():
+            await self.fetch_stage(feed_instances, parse_queue)
+
+            for _ in range(self.parse_processes):
+                await parse_queue.put(None)
+
+        async def parse():
+            await asyncio.gather(
+                *(
+                    self.parse_stage(parse_queue, persist_queue)
+                    for _ in range(self.parse_processes)
+                )
+            )
+            await persist_queue.put(None)
+
+        await asyncio.gather(fetch(), parse(), self.persist_stage(persist_queue))
+
+    async def fetch_stage(self, feed_instances: list[Feed], parse_queue: asyncio.Queue):
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+        host_limiter = get_async_host_limiter()
+        client = get_async_http_client()
+
+        async def fetch(feed_instance: Feed):
+            async with host_limiter.limit(httpx.URL(feed_instance.url).host):
+                # The fetch slot is held till the feed is queued, so a full parse queue pauses the fetching.
+                async with semaphore:
+                    try:
+                        fetch_result = await fetch_feed_async(client, feed_instance)
+                    except Exception as err:
+                        fetch_result = err
+
+                    await parse_queue.put((feed_instance, fetch_result))
+
+        await asyncio.gather(
+            *(fetch(feed_instance) for feed_instance in feed_instances)
+        )
+
+    async def parse_stage(
+        self, parse_queue: asyncio.Queue, persist_queue: asyncio.Queue
+    ):
+        loop = asyncio.get_running_loop()
+
+        while (queued := await parse_queue.get()) is not None:
+            feed_instance, fetch_result = queued
+            parse_result = fetch_result
+
+            # An unchanged content isn't sent to the parser processes, its fetch response is saved as not modified.
+            if isinstance(fetch_result, FeedFetchResponse) and not self.is_unchanged(
+                feed_instance, fetch_result
+            ):
+                try:
+                    parse_result = await loop.run_in_executor(
+                        self.parse_executor, parse_fetched_feed, fetch_result
+                    )
+                except Exception as err:
+                    parse_result = err
+
+                # The content isn't needed anymore, only the status code is kept for the host circuit breaker.
+                fetch_result = fetch_result._replace(content=b"")
+
+            await persist_queue.put((feed_instance, fetch_result, parse_result))
+
+    @staticmethod
+    def is_unchanged(feed_instance: Feed, fetch_result: FeedFetchResponse) -> bool:
+        return FeedReaderService(feed_instance).has_same_content(
+            fetch_result.status_code, get_content_hash(fetch_result.content)
+        )
+
+    async def persist_stage(self, persist_queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        batch = []
+
+        while (queued := await persist_queue.get()) is not None:
+            batch.append(queued)
+
+            # Don't hold the parsed feeds waiting for a full batch while the queue is drained.
+            if len(batch) >= self.persist_batch_size or persist_queue.empty():
+                await loop.run_in_executor(
+                    self.persist_executor, self.persist_batch, batch
+                )
+                batch = []
+
+        if batch:
+            await loop.run_in_executor(self.persist_executor, self.persist_batch, batch)
+
+    def persist_batch(
+        self,
+        batch: list[
+            tuple[Feed, Optional[FetchResult], Union[FeedParsedData, Exception]]
+        ],
+    ):
+        """
+        Save a batch of parsed feeds in one transaction, every feed at its own savepoint
+            so a failing feed doesn't roll back the whole batch.
+        """
+        fetched_batch = [
+            (feed_instance, fetch_result)
+            for feed_instance, fetch_result, _ in batch
+            if fetch_result is not None
+        ]
+        record_hosts_fetch_results(
+            [feed_instance for feed_instance, _ in fetched_batch],
+            [fetch_result for _, fetch_result in fetched_batch],
+        )
+
+        released_feed_ids = []
+
+        with transaction.atomic():
+            for feed_instance, _, parse_result in batch:
+                try:
+                    with transaction.atomic():
+                        is_handed_off = update_fetched_feed(
+                            feed_instance,
+                            parse_result,
+                            PIPELINE_NAME,
+                            self.fetch_lease_token,
+                        )
+                except Exception:
+                    # The pipeline is long running, a feed which failed to be saved is picked up at the next run.
+                    logger.exception(
+                        f"Feed with id: {feed_instance.id} failed to be saved. Task_name: {PIPELINE_NAME}."
+                    )
+                    is_handed_off = False
+
+                if not is_handed_off:
+                    released_feed_ids.append(feed_instance.id)
+
+            Feed.objects.filter(id__in=released_feed_ids).release_fetch_lease(
+                self.fetch_lease_token
+            )
@@ -0,0 +1,318 @@
+import datetime
+import random
+import re
+import statistics
+import zlib
+from typing import Any, Mapping, Optional
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.http import parse_http_date_safe
+
+from rss_scraper.feeds.enums import FeedFetchResult
+from rss_scraper.feeds.models import Feed
+from rss_scraper.feeds.utils import get_datetime_from_struct_time
+
+# Weight of the latest fetch result at the `not_modified_ratio` moving average.
+NOT_MODIFIED_RATIO_SMOOTHING_FACTOR = 0.2
+# Failed fetches backoff multiplier stops growing after this number of consecutive failures.
+MAX_FAILURES_BACKOFF_EXPONENT = 6
+# Keeps the retry delay computation small, the delay is capped way before reaching it anyway.
+MAX_RETRY_BACKOFF_EXPONENT = 32
+
+# `sy:updatePeriod` values of the RSS syndication module.
+UPDATE_PERIODS = {
+    "hourly": datetime.timedelta(hours=1),
+    "daily": datetime.timedelta(days=1),
+    "weekly": datetime.timedelta(weeks=1),
+    "monthly": datetime.timedelta(days=30),
+    "yearly": datetime.timedelta(days=365),
+}
+WEEK_DAYS = (
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+)
+# feedparser keeps only the last `hour` and `day` of the skip lists, so they are read from the feed content.
+SKIP_HOURS_PATTERN = re.compile(rb"<skipHours\b[^>]*>(.*?)</skipHours>", re.I | re.S)
+SKIP_DAYS_PATTERN = re.compile(rb"<skipDays\b[^>]*>(.*?)</skipDays>", re.I | re.S)
+HOUR_PATTERN = re.compile(rb"<hour>\s*(\d{1,2})\s*</hour>", re.I)
+DAY_PATTERN = re.compile(rb"<day>\s*([a-z]+)\s*</day>", re.I)
+MAX_AGE_PATTERN = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.I)
+
+
+def get_fetch_interval_bounds() -> tuple[datetime.timedelta, datetime.timedelta]:
+    return (
+        datetime.timedelta(minutes=settings.FEED_FETCH_MIN_INTERVAL_IN_MINUTES),
+        datetime.timedelta(minutes=settings.FEED_FETCH_MAX_INTERVAL_IN_MINUTES),
+    )
+
+
+def clamp_fetch_interval(interval: datetime.timedelta) -> datetime.timedelta:
+    min_interval, max_interval = get_fetch_interval_bounds()
+    return max(min_interval, min(interval, max_interval))
+
+
+def get_publish_interval(
+    items_server_data: list[dict[str, Any]]
+) -> Optional[datetime.timedelta]:
+    """
+    Observed publish rate of a feed, the median time between its consecutive items.
+
+    :param items_server_data: List of parsed item entries.
+    :return: the median interval or None if there are not enough dated items.
+    """
+    published_dates = sorted(
+        published_at
+        for item in items_server_data
+        if (published_at := get_datetime_from_struct_time(item.get("published_parsed")))
+    )
+    intervals = [
+        later - earlier
+        for earlier, later in zip(published_dates, published_dates[1:])
+        if later > earlier
+    ]
+
+    if not intervals:
+        return None
+
+    return statistics.median(intervals)
+
+
+def get_next_fetch_interval(
+    feed_instance: Feed,
+    fetch_result: FeedFetchResult,
+    items_server_data: Optional[list[dict[str, Any]]] = None,
+) -> datetime.timedelta:
+    """
+    Adapt the feed polling interval to the result of its last fetch.
+
+    - Updated: poll at twice the observed publish rate of the feed.
+    - Not modified: stretch the interval, the more the recent fetches were not modified the more it stretches.
+    - Failed: keep the interval, the failure backoff is applied on top of it.
+    """
+    interval = feed_instance.fetch_interval
+
+    if fetch_result == FeedFetchResult.UPDATED:
+        if publish_interval := get_publish_interval(items_server_data or []):
+            interval = publish_interval / 2
+    elif fetch_result == FeedFetchResult.NOT_MODIFIED:
+        interval = interval * (1 + feed_instance.not_modified_ratio)
+
+    return clamp_fetch_interval(interval)
+
+
+def get_not_modified_ratio(feed_instance: Feed, fetch_result: FeedFetchResult) -> float:
+    if fetch_result == FeedFetchResult.FAILED:
+        return feed_instance.not_modified_ratio
+
+    is_not_modified = int(fetch_result == FeedFetchResult.NOT_MODIFIED)
+    return (
+        feed_instance.not_modified_ratio * (1 - NOT_MODIFIED_RATIO_SMOOTHING_FACTOR)
+        + is_not_modified * NOT_MODIFIED_RATIO_SMOOTHING_FACTOR
+    )
+
+
+def get_source_ttl(feed_server_data: dict[str, Any]) -> Optional[datetime.timedelta]:
+    """
+    How long the source declares its feed can be cached, from the RSS `ttl` in minutes
+        or the `sy:updatePeriod` and `sy:updateFrequency` of the syndication module. The longest one wins.
+    """
+    ttls = []
+
+    if (ttl := str(feed_server_data.get("ttl", "")).strip()).isdigit() and int(ttl):
+        ttls.append(datetime.timedelta(minutes=int(ttl)))
+
+    if update_period := UPDATE_PERIODS.get(
+        str(feed_server_data.get("sy_updateperiod", "")).strip().lower()
+    ):
+        update_frequency = str(feed_server_data.get("sy_updatefrequency", "")).strip()
+        ttls.append(
+            update_period / int(update_frequency)
+            if update_frequency.isdigit() and int(update_frequency)
+            else update_period
+        )
+
+    return max(ttls, default=None)
+
+
+def get_skip_hours(content: bytes) -> list[int]:
+    """
+    The RSS `skipHours` of a feed content, the GMT hours at which the source asks not to be fetched.
+    """
+    if not (skip_hours := SKIP_HOURS_PATTERN.search(content)):
+        return []
+
+    return sorted({int(hour) % 24 for hour in HOUR_PATTERN.findall(skip_hours[1])})
+
+
+def get_skip_days(content: bytes) -> list[str]:
+    """
+    The RSS `skipDays` of a feed content, the days at which the source asks not to be fetched.
+    """
+    if not (skip_days := SKIP_DAYS_PATTERN.search(content)):
+        return []
+
+    days = {day.decode().capitalize() for day in DAY_PATTERN.findall(skip_days[1])}
+    return [day for day in WEEK_DAYS if day in days]
+
+
+def get_cache_expires_at(
+    headers: Mapping[str, str], now: Optional[datetime.datetime] = None
+) -> Optional[datetime.datetime]:
+    """
+    When the http response of a feed expires, from its `Cache-Control: max-age` or else its `Expires` header.
+    """
+    now = now or timezone.now()
+    cache_control = headers.get("cache-control", "")
+
+    if "no-cache" in cache_control.lower() or "no-store" in cache_control.lower():
+        return None
+
+    if max_age := MAX_AGE_PATTERN.search(cache_control):
+        age = headers.get("age", "")
+        return now + datetime.timedelta(
+            seconds=int(max_age[1]) - (int(age) if age.isdigit() else 0)
+        )
+
+    if expires_timestamp := parse_http_date_safe(headers.get("expires", "")):
+        return datetime.datetime.fromtimestamp(
+            expires_timestamp, tz=datetime.timezone.utc
+        )
+
+    return None
+
+
+def apply_source_schedule(
+    feed_instance: Feed, fetch_at: datetime.datetime, now: datetime.datetime
+) -> datetime.datetime:
+    """
+    Hold off a fetch till the source says new content can exist: not before its TTL passes or its last response
+        expires, and not at its skip hours and days. The source can't hold the fetch off for more than
+        `FEED_FETCH_MAX_SOURCE_DELAY_IN_MINUTES`.
+    """
+    latest_fetch_at = now + datetime.timedelta(
+        minutes=settings.FEED_FETCH_MAX_SOURCE_DELAY_IN_MINUTES
+    )
+
+    if feed_instance.ttl:
+        fetch_at = max(fetch_at, now + feed_instance.ttl)
+
+    if feed_instance.cache_expires_at:
+        fetch_at = max(fetch_at, feed_instance.cache_expires_at)
+
+    skip_hours = set(feed_instance.skip_hours or [])
+    skip_days = set(feed_instance.skip_days or [])
+
+    # A source skipping all the hours of the week is ignored, one week of hours is checked at most.
+    for _ in range(len(WEEK_DAYS) * 24):
+        fetch_at_in_gmt = fetch_at.astimezone(datetime.timezone.utc)
+
+        if (
+            fetch_at_in_gmt.hour not in skip_hours
+            and WEEK_DAYS[fetch_at_in_gmt.weekday()] not in skip_days
+        ):
+            break
+
+        fetch_at = fetch_at_in_gmt.replace(minute=0, second=0, microsecond=0)
+        fetch_at += datetime.timedelta(hours=1)
+
+    return min(fetch_at, latest_fetch_at)
+
+
+def get_failures_backoff(consecutive_fetch_failures: int) -> int:
+    return 2 ** min(consecutive_fetch_failures, MAX_FAILURES_BACKOFF_EXPONENT)
+
+
+def get_retry_countdown(consecutive_fetch_failures: int) -> float:
+    """
+    Exponential backoff with jitter of a failed feed retrial, in seconds.
+
+    The delay doubles with every consecutive failure of the feed starting from `FEED_UPDATE_TASK_RETRY_DELAY_IN_SECONDS`
+        up to `FEED_UPDATE_TASK_MAX_RETRY_DELAY_IN_SECONDS`. Half of the delay is random, so the feeds which failed
+        together, like the feeds of the same host, don't retry together.
+    """
+    exponent = min(max(consecutive_fetch_failures - 1, 0), MAX_RETRY_BACKOFF_EXPONENT)
+    delay = min(
+        settings.FEED_UPDATE_TASK_RETRY_DELAY_IN_SECONDS * 2 ** exponent,
+        settings.FEED_UPDATE_TASK_MAX_RETRY_DELAY_IN_SECONDS,
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def update_feed_fetch_schedule(
+    feed_instance: Feed,
+    fetch_result: FeedFetchResult,
+    items_server_data: Optional[list[dict[str, Any]]] = None,
+    now: Optional[datetime.datetime] = None,
+    retry_in: Optional[datetime.timedelta] = None,
+):
+    """
+    Compute and set the next fetch time of a feed from its publish rate, not modified rate and failures history,
+        held off by the schedule declared by its source. The caller is responsible for saving the feed instance.
+
+    :param retry_in: the delay of an already scheduled retrial of a failed fetch, it is used as the next fetch time.
+    """
+    now = now or timezone.now()
+    _, max_interval = get_fetch_interval_bounds()
+
+    feed_instance.not_modified_ratio = get_not_modified_ratio(
+        feed_instance, fetch_result
+    )
+    feed_instance.fetch_interval = get_next_fetch_interval(
+        feed_instance, fetch_result, items_server_data
+    )
+
+    if fetch_result == FeedFetchResult.FAILED:
+        feed_instance.consecutive_fetch_failures += 1
+    else:
+        feed_instance.consecutive_fetch_failures = 0
+
+    next_fetch_in = min(
+        feed_instance.fetch_interval
+        * get_failures_backoff(feed_instance.consecutive_fetch_failures),
+        max_interval,
+    )
+    next_fetch_at = now + (retry_in or next_fetch_in)
+
+    if fetch_result != FeedFetchResult.FAILED:
+        next_fetch_at = apply_source_schedule(feed_instance, next_fetch_at, now)
+
+    feed_instance.next_fetch_at = next_fetch_at
+
+
+def get_feed_fetch_slot(feed_id: int, window_in_seconds: int) -> int:
+    """
+    Stable slot of a feed in the scheduling window, the same feed is always fetched at the same offset
+        of the window so the fetches are spread evenly instead of all starting at the beat time.
+    """
+    if window_in_seconds <= 0:
+        return 0
+
+    return zlib.crc32(str(feed_id).encode()) % window_in_seconds
+
+
+def spread_feed_ids_over_window(
+    feed_ids: list[int], batch_size: int, window_in_seconds: int
+) -> list[tuple[int, list[int]]]:
+    """
+    Split the feed ids into batches ordered by their slots at the scheduling window.
+
+    :return: list of (countdown in seconds, batch feed ids), the countdown is the slot of the batch first feed.
+    """
+    slotted_feed_ids = sorted(
+        (get_feed_fetch_slot(feed_id, window_in_seconds), feed_id)
+        for feed_id in feed_ids
+    )
+    batches = []
+
+    for batch_start in range(0, len(slotted_feed_ids), batch_size):
+        batch_end = batch_start + batch_size
+        batch = slotted_feed_ids[batch_start:batch_end]
+        batches.append((batch[0][0], [feed_id for _, feed_id in batch]))
+
+    return batches
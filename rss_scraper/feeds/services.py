@@ -1,11 +1,18 @@
+import datetime
 import logging
+import time
 from collections import namedtuple
 from typing import Any, Optional, Type, Union
 
 import feedparser
+import httpx
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils.http import parse_http_date_safe
 from rest_framework import status
 
-from rss_scraper.feeds.enums import FeedParsingErrorCodes
+from rss_scraper.feeds.caching import bump_user_cache_generation
+from rss_scraper.feeds.enums import FeedFetchResult, FeedParsingErrorCodes
 from rss_scraper.feeds.errors import (
     FeedContentNotChangedError,
     FeedIsGoneError,
@@ -13,11 +20,31 @@ from rss_scraper.feeds.errors import (
     FeedParsingError,
     FeedUrlChangedError,
 )
+from rss_scraper.feeds.fetchers import FeedFetchResponse, fetch_feed
 from rss_scraper.feeds.models import Feed, Item
-from rss_scraper.feeds.utils import get_datetime_from_struct_time
+from rss_scraper.feeds.scheduling import (
+    get_cache_expires_at,
+    get_skip_days,
+    get_skip_hours,
+    get_source_ttl,
+    update_feed_fetch_schedule,
+)
+from rss_scraper.feeds.utils import get_content_hash, get_datetime_from_struct_time
+from rss_scraper.feeds.websub import get_websub_links
 
 logger = logging.getLogger(__name__)
 
+# The feed fields set by `update_feed_fetch_schedule`.
+FEED_FETCH_SCHEDULE_FIELDS = [
+    "next_fetch_at",
+    "fetch_interval",
+    "not_modified_ratio",
+    "consecutive_fetch_failures",
+    "conditional_fetch_count",
+    "not_modified_fetch_count",
+    "cache_expires_at",
+]
+
 FeedParsedData = namedtuple(
     "FeedParsedData",
     [
@@ -29,6 +56,12 @@ FeedParsedData = namedtuple(
         "href",
         "etag",
         "last_modified",
+        "last_modified_header",
+        "content_hash",
+        "ttl",
+        "skip_hours",
+        "skip_days",
+        "cache_expires_at",
     ],
 )
 
@@ -53,7 +86,8 @@ class FeedReaderService:
         Update feed instance from the parsed feed server data.
 
         :param feed_server_data: parsed feed data object using feed parser package.
-        :param kwargs: like `modified` and `etag` or the newly redirected to `href`.
+        :param kwargs: like `modified`, `etag`, `last_modified_header` and `content_hash`
+            or the newly redirected to `href`, the feed isn't moved to it if the user has another feed there.
         """
         self.feed_instance.auto_update_is_active = True
         self.feed_instance.title = feed_server_data.get(
@@ -62,14 +96,36 @@ class FeedReaderService:
         self.feed_instance.description = feed_server_data.get(
             "subtitle", self.feed_instance.description
         )
-        self.feed_instance.url = kwargs.get("href", self.feed_instance.url)
+        if self.can_move_to_url(kwargs.get("href")):
+            self.feed_instance.url = kwargs["href"]
+
         self.feed_instance.last_update_by_source_at = kwargs.get(
             "modified", self.feed_instance.last_update_by_source_at
         )
+        self.feed_instance.content_hash = kwargs.get(
+            "content_hash", self.feed_instance.content_hash
+        )
 
         if kwargs.get("etag") or self.feed_instance.e_tag:
             self.feed_instance.e_tag = kwargs.get("etag") or self.feed_instance.e_tag
 
+        if kwargs.get("last_modified_header"):
+            self.feed_instance.last_modified_header = kwargs["last_modified_header"]
+
+        websub_hub_url, websub_topic_url = get_websub_links(feed_server_data)
+
+        if (websub_hub_url or "", websub_topic_url or "") != (
+            self.feed_instance.websub_hub_url,
+            self.feed_instance.websub_topic_url,
+        ):
+            # A subscription belongs to its hub and topic, the feed is polled till it subscribes to the new ones
+            # at a new callback url, so the intents and the pushes of the old subscription aren't taken anymore.
+            self.feed_instance.websub_lease_expires_at = None
+            self.feed_instance.websub_callback_token = ""
+
+        self.feed_instance.websub_hub_url = websub_hub_url or ""
+        self.feed_instance.websub_topic_url = websub_topic_url or ""
+
         if feed_server_data.get("image") and (
             feed_image_url := feed_server_data["image"].get("href")
         ):
@@ -83,37 +139,29 @@ class FeedReaderService:
 
         :param items_server_data: List of parsed item entries.
         """
-        if self.first_time_to_be_read_from_source:
-            refined_items = [
-                Item(
-                    **{
-                        "feed": self.feed_instance,
-                        "url": item.get("link"),
-                        "title": item.get("title"),
-                        "description": item.get("summary"),
-                        "published_at": get_datetime_from_struct_time(
-                            item["published_parsed"]
-                        ),
-                    }
-                )
-                for item in items_server_data
-            ]
-
-            Item.objects.bulk_create(refined_items)
-            return
-
-        for item in items_server_data:
-            Item.objects.update_or_create(
-                feed=self.feed_instance,
-                url=item.get("link"),
-                defaults={
+        refined_items = {
+            item.get("link"): Item(
+                **{
+                    "feed": self.feed_instance,
+                    "url": item.get("link"),
                     "title": item.get("title"),
                     "description": item.get("summary"),
                     "published_at": get_datetime_from_struct_time(
-                        item["published_parsed"]
+                        item.get("published_parsed")
                     ),
-                },
+                }
             )
+            for item in items_server_data
+        }
+
+        # The bulk writes don't send the model signals, the user cached responses are invalidated here.
+        bump_user_cache_generation(self.feed_instance.user_id)
+
+        if self.first_time_to_be_read_from_source:
+            Item.objects.bulk_create(refined_items.values(), ignore_conflicts=True)
+            return
+
+        Item.objects.bulk_upsert(list(refined_items.values()))
 
     def parsed_data_validator(
         self, feed_parsed_data: FeedParsedData
@@ -151,19 +199,81 @@ class FeedReaderService:
 
         return False, FeedNotAvailableError
 
-    def parse_feed(self) -> Union[FeedParsedData, FeedParsingError]:
+    @staticmethod
+    def parse_fetched_response(fetched_response: FeedFetchResponse) -> dict[str, Any]:
         """
-        Read the feed data from the source using the feedparser package, validate on the result and save the refined
-            data at FeedParsedData named tuple.
+        Parse an already downloaded feed content using the feedparser package, the http response info
+            is set at the result the same as if feedparser downloaded the feed by itself.
 
-        :return: the parsed feed info at `FeedParsedData` or `FeedParsingError`.
+        :param fetched_response: the downloaded feed content and its http response info.
         """
         source_parsing_feed_result = feedparser.parse(
-            self.feed_instance.url,
-            modified=self.feed_instance.last_update_by_source_at,
-            etag=self.feed_instance.e_tag,
+            fetched_response.content, response_headers=fetched_response.headers
+        )
+        source_parsing_feed_result.update(
+            {
+                "status": fetched_response.status_code,
+                "href": fetched_response.href,
+                "etag": fetched_response.headers.get("etag"),
+            }
         )
-        feed_parsed_data = FeedParsedData(
+
+        if last_modified_timestamp := parse_http_date_safe(
+            fetched_response.headers.get("last-modified", "")
+        ):
+            source_parsing_feed_result["modified_parsed"] = time.gmtime(
+                last_modified_timestamp
+            )
+
+        return source_parsing_feed_result
+
+    def record_fetch_response(
+        self,
+        status_code: Optional[int],
+        cache_expires_at: Optional[datetime.datetime],
+    ):
+        """
+        Record the fetch response info which is saved along with the feed after the fetch,
+            whatever the fetch result is.
+
+        - Count a fetch sent with the feed validators and whether it is answered with `304 Not Modified`.
+        - Keep when the response of a successful fetch expires, so the feed isn't fetched again before that.
+        """
+        if status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            self.feed_instance.cache_expires_at = cache_expires_at
+
+        if not (self.feed_instance.e_tag or self.feed_instance.last_modified_header):
+            return
+
+        self.feed_instance.conditional_fetch_count += 1
+
+        if status_code == status.HTTP_304_NOT_MODIFIED:
+            self.feed_instance.not_modified_fetch_count += 1
+
+    def has_same_content(self, status_code: int, content_hash: str) -> bool:
+        """
+        Whether a full response carries the same content as the last saved one. Many sources send neither ETag
+            nor Last-Modified headers, so their unchanged feeds are detected by the content hash instead of `304`.
+        """
+        return (
+            status_code == status.HTTP_200_OK
+            and bool(self.feed_instance.content_hash)
+            and content_hash == self.feed_instance.content_hash
+        )
+
+    @classmethod
+    def build_feed_parsed_data(
+        cls, fetched_response: FeedFetchResponse
+    ) -> FeedParsedData:
+        """
+        Parse a downloaded feed content and refine the result at FeedParsedData named tuple, without validating it.
+            It doesn't touch the DB, so it can run off the main process like at the feeds update pipeline.
+
+        :param fetched_response: the downloaded feed content and its http response info.
+        """
+        source_parsing_feed_result = cls.parse_fetched_response(fetched_response)
+
+        return FeedParsedData(
             has_error=source_parsing_feed_result["bozo"],
             exception=source_parsing_feed_result.get("bozo_exception"),
             status_code=source_parsing_feed_result.get("status"),
@@ -174,6 +284,56 @@ class FeedReaderService:
             last_modified=get_datetime_from_struct_time(
                 source_parsing_feed_result.get("updated_parsed")
             ),
+            last_modified_header=fetched_response.headers.get("last-modified"),
+            content_hash=get_content_hash(fetched_response.content),
+            ttl=get_source_ttl(source_parsing_feed_result.get("feed", {})),
+            skip_hours=get_skip_hours(fetched_response.content),
+            skip_days=get_skip_days(fetched_response.content),
+            cache_expires_at=get_cache_expires_at(fetched_response.headers),
+        )
+
+    def parse_feed(
+        self,
+        fetched_response: Optional[FeedFetchResponse] = None,
+        feed_parsed_data: Optional[FeedParsedData] = None,
+    ) -> Union[FeedParsedData, FeedParsingError]:
+        """
+        Read the feed data from the source using the feedparser package, validate on the result and save the refined
+            data at FeedParsedData named tuple.
+
+        :param fetched_response: already downloaded feed content, like the ones fetched concurrently
+            by the `fetchers` module. If not passed the feed will be downloaded from its source.
+        :param feed_parsed_data: already parsed feed content, like the ones parsed by the feeds update pipeline.
+            If passed it will only be validated.
+        :return: the parsed feed info at `FeedParsedData` or `FeedParsingError`.
+        """
+        if feed_parsed_data is None:
+            if fetched_response is None:
+                try:
+                    fetched_response = fetch_feed(self.feed_instance)
+                except (httpx.HTTPError, httpx.InvalidURL) as err:
+                    logger.error(
+                        f"Feed with id: {self.feed_instance.id} has not updated due to download error: {err!r}."
+                    )
+                    raise FeedNotAvailableError(None, str(err))
+
+            if self.has_same_content(
+                fetched_response.status_code,
+                get_content_hash(fetched_response.content),
+            ):
+                self.record_fetch_response(
+                    fetched_response.status_code,
+                    get_cache_expires_at(fetched_response.headers),
+                )
+                raise FeedContentNotChangedError(
+                    fetched_response.status_code,
+                    "Feed content is identical to the last saved content.",
+                )
+
+            feed_parsed_data = self.build_feed_parsed_data(fetched_response)
+
+        self.record_fetch_response(
+            feed_parsed_data.status_code, feed_parsed_data.cache_expires_at
         )
         is_valid, ErrorType = self.parsed_data_validator(feed_parsed_data)
 
@@ -182,32 +342,170 @@ class FeedReaderService:
                 f"Feed with id: {self.feed_instance.id} has not updated due to error: {ErrorType},"
                 f"with code: {feed_parsed_data.status_code} and message: {feed_parsed_data.exception}."
             )
+
+            if ErrorType is FeedUrlChangedError:
+                raise FeedUrlChangedError(
+                    feed_parsed_data.status_code,
+                    feed_parsed_data.exception,
+                    href=feed_parsed_data.href,
+                )
+
             raise ErrorType(feed_parsed_data.status_code, feed_parsed_data.exception)
 
+        # The source schedule is set before the next fetch is scheduled, it is saved along with the feed data.
+        self.feed_instance.ttl = feed_parsed_data.ttl
+        self.feed_instance.skip_hours = feed_parsed_data.skip_hours
+        self.feed_instance.skip_days = feed_parsed_data.skip_days
         return feed_parsed_data
 
-    def process_feed_data_from_source(self):
+    def get_subscriber_feeds(self) -> QuerySet:
         """
-        Handles reading the feed data from the source and saving it at the DB.
+        :return: the other auto updatable feeds of the same source url, registered by other users.
         """
-        logger.info(f"Started to update feed with id: {self.feed_instance.id}.")
+        return (
+            Feed.objects.auto_updatable()
+            .filter(url=self.feed_instance.url)
+            .exclude(id=self.feed_instance.id)
+        )
 
-        try:
-            feed_parsed_data = self.parse_feed()
+    def can_move_to_url(self, new_url: Optional[str]) -> bool:
+        """
+        Whether the feed can be moved to a new url, a feed can't be moved to its own url
+            or to the url of another feed of the same user.
+        """
+        if not new_url or new_url == self.feed_instance.url:
+            return False
+
+        return (
+            not Feed.objects.filter(user_id=self.feed_instance.user_id, url=new_url)
+            .exclude(id=self.feed_instance.id)
+            .exists()
+        )
+
+    def move_to_new_url(self, new_url: Optional[str]) -> bool:
+        """
+        Save the new url of a permanently redirected feed. The validators of the old url are cleared.
+
+        :param new_url: the url the feed has been permanently redirected to.
+        :return: whether the feed has been moved, see `can_move_to_url`.
+        """
+        if not self.can_move_to_url(new_url):
+            return False
+
+        self.feed_instance.url = new_url
+        self.feed_instance.e_tag = ""
+        self.feed_instance.last_modified_header = ""
+        self.feed_instance.save(
+            update_fields=["url", "e_tag", "last_modified_header", "updated_at"]
+        )
+        return True
+
+    def schedule_next_fetch(
+        self,
+        fetch_result: FeedFetchResult,
+        retry_in: Optional[datetime.timedelta] = None,
+    ):
+        """
+        Save the next time to fetch the feed after a fetch which didn't update the feed data.
+
+        :param fetch_result: the result of the last fetch, not modified or failed.
+        :param retry_in: the delay of the retrial scheduled for a failed fetch.
+        """
+        update_feed_fetch_schedule(self.feed_instance, fetch_result, retry_in=retry_in)
+        self.feed_instance.save(update_fields=FEED_FETCH_SCHEDULE_FIELDS)
+
+    def schedule_subscriber_feeds_next_fetch(self, fetch_result: FeedFetchResult):
+        """
+        Save the next time to fetch the other subscribers of the source url after a fetch of it which didn't update
+            the feed data, as if they have been fetched by themselves, in one bulk update.
+        """
+        subscriber_feeds = list(self.get_subscriber_feeds())
+
+        for subscriber_feed_instance in subscriber_feeds:
+            update_feed_fetch_schedule(subscriber_feed_instance, fetch_result)
+
+        Feed.objects.bulk_update(subscriber_feeds, FEED_FETCH_SCHEDULE_FIELDS)
+
+    def save_feed_parsed_data(self, feed_parsed_data: FeedParsedData):
+        """
+        Save the parsed feed info and its items at the DB.
+
+        :param feed_parsed_data: the validated feed info parsed using the feed parser.
+        """
+        # The content hash is saved with the feed, so it must not be kept if the items failed to be saved.
+        with transaction.atomic():
             self.update_feed_instance(
                 feed_parsed_data.feed,
                 **{
                     "href": feed_parsed_data.href,
                     "etag": feed_parsed_data.etag,
                     "modified": feed_parsed_data.last_modified,
+                    "last_modified_header": feed_parsed_data.last_modified_header,
+                    "content_hash": feed_parsed_data.content_hash,
                 },
             )
             self.update_feed_items(feed_parsed_data.items)
+
+    def save_shared_feed_parsed_data(self, feed_parsed_data: FeedParsedData):
+        """
+        Save the parsed feed info fetched by another subscriber of the same source url, the feed is scheduled
+            as if it has been fetched by itself, so it isn't due the moment it becomes the source leader.
+
+        :param feed_parsed_data: the validated feed info parsed using the feed parser.
+        """
+        self.feed_instance.ttl = feed_parsed_data.ttl
+        self.feed_instance.skip_hours = feed_parsed_data.skip_hours
+        self.feed_instance.skip_days = feed_parsed_data.skip_days
+        update_feed_fetch_schedule(
+            self.feed_instance, FeedFetchResult.UPDATED, feed_parsed_data.items
+        )
+        self.save_feed_parsed_data(feed_parsed_data)
+
+    def process_feed_data_from_source(
+        self,
+        fetched_response: Optional[FeedFetchResponse] = None,
+        share_with_subscribers: bool = False,
+        feed_parsed_data: Optional[FeedParsedData] = None,
+    ):
+        """
+        Handles reading the feed data from the source and saving it at the DB.
+
+        :param fetched_response: already downloaded feed content to be parsed instead of downloading it again.
+        :param feed_parsed_data: already parsed feed content to be validated and saved.
+        :param share_with_subscribers: save the parsed data also at the feeds of the other subscribers of the same
+            source url, so a shared source is fetched and parsed only once.
+        """
+        logger.info(f"Started to update feed with id: {self.feed_instance.id}.")
+
+        try:
+            feed_parsed_data = self.parse_feed(fetched_response, feed_parsed_data)
+            subscriber_feeds = (
+                list(self.get_subscriber_feeds()) if share_with_subscribers else []
+            )
+            update_feed_fetch_schedule(
+                self.feed_instance, FeedFetchResult.UPDATED, feed_parsed_data.items
+            )
+            self.save_feed_parsed_data(feed_parsed_data)
             logger.info(
                 f"Feed with id: {self.feed_instance.id} has been updated successfully."
             )
+
+            for subscriber_feed_instance in subscriber_feeds:
+                FeedReaderService(
+                    subscriber_feed_instance
+                ).save_shared_feed_parsed_data(feed_parsed_data)
+
+            if subscriber_feeds:
+                logger.info(
+                    f"Feed with id: {self.feed_instance.id} parsed data has been shared with "
+                    f"{len(subscriber_feeds)} subscriber feeds."
+                )
         except FeedContentNotChangedError:
             # Feed content not changed error will be passed, the other errors should be handled by the caller.
             logger.info(
                 f"Feed with id: {self.feed_instance.id} has not updated as its content not changed."
             )
+            self.schedule_next_fetch(FeedFetchResult.NOT_MODIFIED)
+
+            if share_with_subscribers:
+                self.schedule_subscriber_feeds_next_fetch(FeedFetchResult.NOT_MODIFIED)
@@ -0,0 +1,54 @@
+from typing import Optional
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rss_scraper.feeds.caching import bump_user_cache_generation
+from rss_scraper.feeds.models import Feed, Item
+
+# The feed fields saved by the fetchers bookkeeping, like the polling schedule, the conditional request validators
+# and the WebSub subscription. They are not served by the API, their saves don't invalidate the user cache,
+# the `updated_at` they touch is served as of the last user visible change till the cached responses expire.
+FEED_BOOKKEEPING_FIELDS = frozenset(
+    (
+        "next_fetch_at",
+        "fetch_interval",
+        "not_modified_ratio",
+        "consecutive_fetch_failures",
+        "conditional_fetch_count",
+        "not_modified_fetch_count",
+        "cache_expires_at",
+        "e_tag",
+        "last_modified_header",
+        "websub_secret",
+        "websub_pending_secret",
+        "websub_callback_token",
+        "websub_lease_expires_at",
+        "updated_at",
+    )
+)
+
+
+def is_bookkeeping_save(update_fields: Optional[frozenset]) -> bool:
+    return bool(update_fields) and update_fields <= FEED_BOOKKEEPING_FIELDS
+
+
+@receiver(post_save, sender=Feed)
+@receiver(post_delete, sender=Feed)
+def invalidate_feed_user_cache(sender, instance: Feed, **kwargs):
+    if is_bookkeeping_save(kwargs.get("update_fields")):
+        return
+
+    bump_user_cache_generation(instance.user_id)
+
+
+@receiver(post_save, sender=Item)
+def invalidate_item_user_cache(sender, instance: Item, **kwargs):
+    # Only the feed user is needed, the feed isn't loaded for it unless it is already.
+    bump_user_cache_generation(
+        instance.feed.user_id
+        if Item.feed.is_cached(instance)
+        else Feed.objects.filter(id=instance.feed_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
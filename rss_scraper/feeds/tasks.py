@@ -1,51 +1,283 @@
+import datetime
 import logging
+import time
+from functools import partial
+from typing import Iterator, Optional, Union
 
-from celery.exceptions import MaxRetriesExceededError
+import httpx
+from celery.exceptions import MaxRetriesExceededError, SoftTimeLimitExceeded
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from kombu.exceptions import ChannelError, OperationalError
 
 from config import celery_app
+from rss_scraper.feeds.enums import FeedFetchResult
 from rss_scraper.feeds.errors import (
+    FeedDownloadLimitExceededError,
+    FeedHostCircuitOpenError,
     FeedIsGoneError,
     FeedNotAvailableError,
+    FeedParsingError,
     FeedUrlChangedError,
 )
-from rss_scraper.feeds.models import Feed
-from rss_scraper.feeds.services import FeedReaderService
-from rss_scraper.feeds.utils import notify_feed_creator_with_stalled_feed
+from rss_scraper.feeds.fetchers import FeedFetchResponse, fetch_feeds
+from rss_scraper.feeds.metrics import (
+    FEED_SCHEDULER_LAG,
+    FEED_UPDATE_ENQUEUE_TO_FIRST_ITEM,
+    FEED_UPDATE_QUEUE_WAIT,
+    emit_metric,
+    get_seconds_since,
+)
+from rss_scraper.feeds.models import Feed, FeedQuerySet
+from rss_scraper.feeds.scheduling import (
+    get_retry_countdown,
+    spread_feed_ids_over_window,
+)
+from rss_scraper.feeds.services import FeedParsedData, FeedReaderService
+from rss_scraper.feeds.utils import (
+    get_fetch_lease_token,
+    iterate_fair_ids_in_chunks,
+    notify_feed_creator_with_stalled_feed,
+)
+from rss_scraper.feeds.websub import needs_websub_subscription, subscribe_to_websub_hub
 
 logger = logging.getLogger(__name__)
 
 
+def deactivate_gone_feed(feed_instance: Feed, task_name: str):
+    """
+    Stop polling a feed which is gone permanently and let its creator know.
+    """
+    feed_instance.deactivate_auto_update()
+    notify_feed_creator_with_stalled_feed(feed_instance)
+    logger.info(
+        f"Feed with id: {feed_instance.id} is gone, its auto active updater has been disabled "
+        f"and its creator has been notified. Task_name: {task_name}."
+    )
+
+
+def refetch_redirected_feed(
+    feed_reader_service: FeedReaderService,
+    error: FeedUrlChangedError,
+    task_name: str,
+    **kwargs,
+) -> bool:
+    """
+    Save the new url of a permanently redirected feed and fetch it once from there.
+
+    :return: whether the feed has been moved to the new url and queued to be refetched.
+    """
+    feed_instance = feed_reader_service.feed_instance
+    old_url = feed_instance.url
+
+    if not feed_reader_service.move_to_new_url(error.href):
+        return False
+
+    transaction.on_commit(
+        partial(
+            update_feed_data_from_source_task.delay,
+            feed_instance.id,
+            is_redirect_refetch=True,
+            **kwargs,
+        )
+    )
+    logger.info(
+        f"Feed with id: {feed_instance.id} has moved from: {old_url} to: {feed_instance.url}, "
+        f"it will be refetched from the new url. Task_name: {task_name}."
+    )
+    return True
+
+
+def queue_feed_update(
+    feed_instance_id: int, interactive: bool = False, **kwargs
+) -> bool:
+    """
+    Queue `update_feed_data_from_source_task` for a feed unless an update of it is already queued or running,
+        a duplicate request coalesces into that update.
+
+    :param interactive: the update is requested by a user who waits for it, it is routed to the
+        `FEED_INTERACTIVE_UPDATE_QUEUE` queue which has its own workers, so it isn't stuck behind
+        the background refresh batches. It takes over the lease of a background update which hasn't started yet,
+        like a spread batch or a retrial, instead of waiting for it. The enqueue time is sent along to measure
+        the update latency.
+    :return: whether the feed update has been queued.
+    """
+    fetch_lease_token = get_fetch_lease_token()
+
+    if not Feed.objects.filter(id=feed_instance_id).claim_fetch_lease(
+        fetch_lease_token, preempt=interactive
+    ):
+        logger.info(
+            f"Feed with id: {feed_instance_id} update is already queued or running, it won't be queued again."
+        )
+        return False
+
+    def publish():
+        if interactive:
+            update_feed_data_from_source_task.apply_async(
+                (feed_instance_id,),
+                {
+                    "fetch_lease_token": fetch_lease_token,
+                    "enqueued_at": time.time(),
+                    **kwargs,
+                },
+                queue=settings.FEED_INTERACTIVE_UPDATE_QUEUE,
+            )
+        else:
+            update_feed_data_from_source_task.delay(
+                feed_instance_id, fetch_lease_token=fetch_lease_token, **kwargs
+            )
+
+    # The task is published once the lease, and a just created feed, are committed, so the worker sees them.
+    transaction.on_commit(publish)
+    return True
+
+
+def emit_feed_update_latency(
+    feed_instance: Feed, enqueued_at: Optional[float], had_items: bool
+):
+    """
+    Emit the time from queueing a requested feed update till the feed has its first items to show.
+        A feed which had items before the update is skipped, its first items have been shown already.
+    """
+    if (
+        not had_items
+        and (seconds := get_seconds_since(enqueued_at)) is not None
+        and feed_instance.items.exists()
+    ):
+        emit_metric(
+            FEED_UPDATE_ENQUEUE_TO_FIRST_ITEM, seconds, feed_id=feed_instance.id
+        )
+
+
+def subscribe_to_websub_hub_if_needed(feed_instance: Feed, task_name: str):
+    """
+    Queue the WebSub subscription of a feed which advertises a hub, once it is fetched successfully.
+        A pushed feed is polled again only when its lease is about to expire, so that poll renews it.
+    """
+    if needs_websub_subscription(feed_instance):
+        transaction.on_commit(
+            partial(subscribe_feed_to_websub_hub_task.delay, feed_instance.id)
+        )
+        logger.info(
+            f"Feed with id: {feed_instance.id} has been queued to subscribe to its WebSub hub. "
+            f"Task_name: {task_name}."
+        )
+
+
 @celery_app.task(
     max_retries=settings.FEED_UPDATE_TASK_MAX_RETRIES,
     default_retry_delay=settings.FEED_UPDATE_TASK_RETRY_DELAY_IN_SECONDS,
 )
 def update_feed_data_from_source_task(feed_instance_id: int, *args, **kwargs):
     """
-    Update feed data from the source at the background.
+    Update feed data from the source at the background, the parsing errors are handled per their type.
+
+    - Gone feeds (410) are deactivated at once.
+    - Permanently redirected feeds (301) are moved to their new url and refetched once from there.
+    - Feeds which overran their download limits or whose host circuit breaker is open are not retried,
+        they are only backed off till their next scheduled fetch.
+    - Only the transient failures are retried, with exponential backoff and jitter based on the consecutive
+        failures of the feed. The time of the next retrial is saved as the feed next fetch time.
+
+    The feed fetch lease is claimed at start, the task is dropped if another update of the feed holds it.
+        The lease is held through the retrials and the redirect refetch and released once the feed is done.
 
-    TODO: Apply exponential backoff retrial mechanism.
     TODO: Move task meta logging data to a decorator.
     :param feed_instance_id:
+    :param kwargs:
+        - share_with_subscribers (bool) to share the parsed data with the other subscribers of the feed url.
+        - is_redirect_refetch (bool) the feed has just been moved to its new url, it won't be moved again.
+        - fetch_lease_token (str) the token the feed fetch lease is claimed with when the task is queued.
+        - enqueued_at (float) the time an interactive update has been queued at, the time it waited at the queue
+            and the time till the feed has its first items are emitted as metrics.
     """
-    task_name = "schedule_update_for_followed_feeds_periodic_task"
+    task_name = "update_feed_data_from_source_task"
     logger.info(f"Started on {task_name}")
+    share_with_subscribers = kwargs.get("share_with_subscribers", False)
+    enqueued_at = kwargs.get("enqueued_at")
+
+    if (queue_wait := get_seconds_since(enqueued_at)) is not None:
+        emit_metric(FEED_UPDATE_QUEUE_WAIT, queue_wait, feed_id=feed_instance_id)
+
+    fetch_lease_token = kwargs.get("fetch_lease_token") or get_fetch_lease_token()
+    feed_queryset = Feed.objects.filter(id=feed_instance_id)
+
+    if not feed_queryset.claim_fetch_lease(fetch_lease_token):
+        logger.info(
+            f"Feed with id: {feed_instance_id} is missing or already being updated by another task, "
+            f"this update is dropped. Task_name: {task_name}."
+        )
+        return
+
+    kwargs["fetch_lease_token"] = fetch_lease_token
+    keeps_fetch_lease = False
 
     try:
         feed_instance = Feed.objects.get(id=feed_instance_id)
+        had_items = enqueued_at is not None and feed_instance.items.exists()
         feed_reader_service = FeedReaderService(feed_instance)
-        feed_reader_service.process_feed_data_from_source()
+        feed_reader_service.process_feed_data_from_source(
+            share_with_subscribers=share_with_subscribers
+        )
         logger.info(
             f"Feed with id: {feed_instance.id} has been updated successfully. Task_name: {task_name}."
         )
+        emit_feed_update_latency(feed_instance, enqueued_at, had_items)
+        subscribe_to_websub_hub_if_needed(feed_instance, task_name)
     except Feed.DoesNotExist:
         logger.error(
             f"No feed instance with id: {feed_instance_id}. Task_name: {task_name}."
         )
-    except (FeedIsGoneError, FeedUrlChangedError, FeedNotAvailableError):
+    except FeedIsGoneError:
+        deactivate_gone_feed(feed_instance, task_name)
+    except (FeedDownloadLimitExceededError, FeedHostCircuitOpenError) as err:
+        # Retrying right away would hit the same limit or host, back the feed off till its next scheduled fetch.
+        logger.warning(f"{err.message} Task_name: {task_name}.")
+        feed_reader_service.schedule_next_fetch(FeedFetchResult.FAILED)
+    except (FeedUrlChangedError, FeedNotAvailableError) as err:
+        if (
+            isinstance(err, FeedUrlChangedError)
+            and not kwargs.get("is_redirect_refetch", False)
+            and refetch_redirected_feed(
+                feed_reader_service,
+                err,
+                task_name,
+                share_with_subscribers=share_with_subscribers,
+                fetch_lease_token=fetch_lease_token,
+            )
+        ):
+            keeps_fetch_lease = True
+            return
+
+        retry_countdown = get_retry_countdown(
+            feed_instance.consecutive_fetch_failures + 1
+        )
+        feed_reader_service.schedule_next_fetch(
+            FeedFetchResult.FAILED,
+            retry_in=datetime.timedelta(seconds=retry_countdown),
+        )
+
         try:
-            update_feed_data_from_source_task.retry()
+            # The lease covers the wait till the retrial, so the retrial isn't duplicated meanwhile.
+            # A user requested update of the feed takes over the lease meanwhile, the retrial is dropped then.
+            keeps_fetch_lease = bool(
+                feed_queryset.claim_fetch_lease(
+                    fetch_lease_token,
+                    lease_in_seconds=int(retry_countdown)
+                    + settings.FEED_FETCH_LEASE_TIMEOUT_IN_SECONDS,
+                    preemptible=True,
+                )
+            )
+            # The retrial is a background update, its backoff isn't counted as the requested update queue wait.
+            kwargs.pop("enqueued_at", None)
+            update_feed_data_from_source_task.retry(
+                countdown=retry_countdown, kwargs=kwargs
+            )
         except MaxRetriesExceededError:
+            keeps_fetch_lease = False
             logger.error(
                 f"Updating feed with id: {feed_instance.id} has exceeded the max number of retries. "
                 f"Task_name: {task_name}."
@@ -57,22 +289,371 @@ def update_feed_data_from_source_task(feed_instance_id: int, *args, **kwargs):
                 f"also we disabled the auto active updater for feed with id: {feed_instance.id}. "
                 f"Task_name: {task_name}."
             )
+    finally:
+        if not keeps_fetch_lease:
+            feed_queryset.release_fetch_lease(fetch_lease_token)
 
     logger.info(f"Finished of {task_name}, feed_id: {feed_instance_id}.")
 
 
+def update_fetched_feed(
+    feed_instance: Feed,
+    fetch_result: Union[FeedFetchResponse, FeedParsedData, Exception],
+    task_name: str,
+    fetch_lease_token: str = "",
+) -> bool:
+    """
+    Save an already fetched feed and share its data with the other subscribers of its source url,
+        taking the decisions on its failures per their type.
+
+    :param fetch_result: the downloaded feed content, its already parsed content or the download error.
+    :param fetch_lease_token: the token the feed fetch lease is claimed with, it is handed to the feed own update
+        task if the feed is refetched or retried separately.
+    :return: whether the feed has been handed to `update_feed_data_from_source_task`,
+        which holds the feed fetch lease from now on. The tasks are queued once the current transaction commits,
+        so they don't read the feed before it's saved.
+    """
+    if isinstance(
+        fetch_result, (FeedDownloadLimitExceededError, FeedHostCircuitOpenError)
+    ):
+        logger.warning(f"{fetch_result.message} Task_name: {task_name}.")
+        FeedReaderService(feed_instance).schedule_next_fetch(FeedFetchResult.FAILED)
+        return False
+
+    feed_reader_service = FeedReaderService(feed_instance)
+
+    try:
+        if isinstance(fetch_result, Exception):
+            raise FeedNotAvailableError(None, str(fetch_result))
+
+        if isinstance(fetch_result, FeedParsedData):
+            feed_reader_service.process_feed_data_from_source(
+                share_with_subscribers=True, feed_parsed_data=fetch_result
+            )
+        else:
+            feed_reader_service.process_feed_data_from_source(
+                fetch_result, share_with_subscribers=True
+            )
+    except FeedIsGoneError:
+        deactivate_gone_feed(feed_instance, task_name)
+    except FeedUrlChangedError as err:
+        if not refetch_redirected_feed(
+            feed_reader_service,
+            err,
+            task_name,
+            share_with_subscribers=True,
+            fetch_lease_token=fetch_lease_token,
+        ):
+            transaction.on_commit(
+                partial(
+                    update_feed_data_from_source_task.delay,
+                    feed_instance.id,
+                    share_with_subscribers=True,
+                    fetch_lease_token=fetch_lease_token,
+                )
+            )
+        return True
+    except FeedParsingError as err:
+        logger.error(
+            f"Feed with id: {feed_instance.id} failed to be updated with error: {err.__class__.__name__}, "
+            f"it will be retried separately. Task_name: {task_name}."
+        )
+        transaction.on_commit(
+            partial(
+                update_feed_data_from_source_task.delay,
+                feed_instance.id,
+                share_with_subscribers=True,
+                fetch_lease_token=fetch_lease_token,
+            )
+        )
+        return True
+    else:
+        subscribe_to_websub_hub_if_needed(feed_instance, task_name)
+
+    return False
+
+
+@celery_app.task()
+def subscribe_feed_to_websub_hub_task(feed_instance_id: int, *args, **kwargs):
+    """
+    Subscribe a feed to its WebSub hub, so the hub pushes the feed updates to the API callback url
+        instead of the feed being polled. The feed is polled as usual till the hub verifies the subscription,
+        a failing subscription request is retried at the next successful poll of the feed.
+    :param feed_instance_id:
+    """
+    task_name = "subscribe_feed_to_websub_hub_task"
+    logger.info(f"Started on {task_name}, feed_id: {feed_instance_id}.")
+
+    try:
+        feed_instance = Feed.objects.get(id=feed_instance_id)
+        subscribe_to_websub_hub(feed_instance)
+    except Feed.DoesNotExist:
+        logger.error(
+            f"No feed instance with id: {feed_instance_id}. Task_name: {task_name}."
+        )
+    except httpx.HTTPError as err:
+        logger.warning(
+            f"Feed with id: {feed_instance_id} failed to subscribe to its WebSub hub with error: {err!r}. "
+            f"Task_name: {task_name}."
+        )
+
+    logger.info(f"Finished of {task_name}, feed_id: {feed_instance_id}.")
+
+
+def update_leased_feeds(
+    feed_instance_ids: list[int], fetch_lease_token: str, task_name: str
+):
+    """
+    Download the feeds whose fetch lease is claimed with the token concurrently then save them one by one.
+        A feed which fails to be saved is logged and skipped, so it doesn't fail the rest of the batch.
+        The lease of every feed is released once the batch is done, unless the feed is handed to its own update task.
+    """
+    handed_off_feed_ids = []
+
+    try:
+        feed_instances = list(Feed.objects.filter(id__in=feed_instance_ids))
+        fetched_responses = fetch_feeds(feed_instances)
+
+        for feed_instance, fetched_response in zip(feed_instances, fetched_responses):
+            try:
+                if update_fetched_feed(
+                    feed_instance, fetched_response, task_name, fetch_lease_token
+                ):
+                    handed_off_feed_ids.append(feed_instance.id)
+            except SoftTimeLimitExceeded:
+                raise
+            except Exception:
+                # The lease is released, so the feed is picked up again at its next fetch.
+                logger.exception(
+                    f"Feed with id: {feed_instance.id} failed to be saved. Task_name: {task_name}."
+                )
+    finally:
+        # The feeds left over by a task which has hit its time limit, while downloading or saving them,
+        # are released as well.
+        Feed.objects.filter(id__in=feed_instance_ids).exclude(
+            id__in=handed_off_feed_ids
+        ).release_fetch_lease(fetch_lease_token)
+
+
+@celery_app.task(
+    soft_time_limit=settings.FEED_UPDATE_BATCH_TASK_SOFT_TIME_LIMIT_IN_SECONDS,
+    time_limit=settings.FEED_UPDATE_BATCH_TASK_TIME_LIMIT_IN_SECONDS,
+)
+def update_feeds_data_from_source_task(feed_instance_ids: list[int], *args, **kwargs):
+    """
+    Update a batch of feeds data from the source at the background.
+
+    The feeds are downloaded concurrently from one worker process then parsed and saved one by one,
+        the parsed data of every feed is shared with the other subscribers of the same source url.
+    Gone feeds are deactivated and permanently redirected feeds are moved and refetched from their new urls.
+    Feeds which overran their download limits or were short-circuited by their host circuit breaker
+        are only backed off till their next fetch.
+    The other feeds that failed to be downloaded or parsed are handed to `update_feed_data_from_source_task`
+        to take the usual retrial decisions on them.
+    Only the feeds whose fetch lease is claimed at start are updated, the others are being updated by another task.
+    A batch takes longer than a single feed update, it has its own time limits which stay under the lease timeout.
+    :param feed_instance_ids:
+    :param kwargs:
+        - fetch_lease_token (str) the token the feeds fetch lease is claimed with when the task is queued.
+    """
+    task_name = "update_feeds_data_from_source_task"
+    logger.info(f"Started on {task_name}, feeds count: {len(feed_instance_ids)}.")
+    fetch_lease_token = kwargs.get("fetch_lease_token") or get_fetch_lease_token()
+
+    claimed_feed_ids = Feed.objects.filter(id__in=feed_instance_ids).claim_fetch_lease(
+        fetch_lease_token
+    )
+    update_leased_feeds(claimed_feed_ids, fetch_lease_token, task_name)
+
+    logger.info(
+        f"Finished of {task_name}, feed_ids: {claimed_feed_ids}, "
+        f"dropped as already being updated: {len(feed_instance_ids) - len(claimed_feed_ids)}."
+    )
+
+
+def get_queue_depth(queue_name: str) -> Optional[int]:
+    """
+    The number of the tasks waiting at a broker queue, the tasks already reserved by the workers are not counted.
+
+    :return: the queue depth, None if the broker is not reachable.
+    """
+    try:
+        with celery_app.connection_for_read() as connection:
+            return connection.default_channel.queue_declare(
+                queue=queue_name, passive=True
+            ).message_count
+    except ChannelError:
+        # The queue is declared with its first task.
+        return 0
+    except OperationalError as err:
+        logger.warning(
+            f"Queue: {queue_name} depth failed to be read with error: {err!r}."
+        )
+        return None
+
+
+def get_available_queue_capacity(queue_depth: Optional[int]) -> Optional[int]:
+    """
+    :return: the number of the tasks which can be queued before the queue reaches `FEED_UPDATE_QUEUE_MAX_DEPTH`,
+        None for no limit.
+    """
+    if not settings.FEED_UPDATE_QUEUE_MAX_DEPTH or queue_depth is None:
+        return None
+
+    return max(settings.FEED_UPDATE_QUEUE_MAX_DEPTH - queue_depth, 0)
+
+
+def emit_scheduler_lag_if_behind(
+    due_feeds_queryset: FeedQuerySet, queue_depth: Optional[int], task_name: str
+):
+    """
+    Emit the scheduler lag, how long the most overdue feed has been due for, once it crosses
+        `FEED_SCHEDULER_LAG_THRESHOLD_IN_SECONDS`.
+    """
+    oldest_due_at = due_feeds_queryset.aggregate(oldest_due_at=Min("next_fetch_at"))[
+        "oldest_due_at"
+    ]
+
+    if oldest_due_at is None:
+        return
+
+    lag = (timezone.now() - oldest_due_at).total_seconds()
+
+    if lag >= settings.FEED_SCHEDULER_LAG_THRESHOLD_IN_SECONDS:
+        emit_metric(FEED_SCHEDULER_LAG, lag, queue_depth=queue_depth)
+        logger.warning(
+            f"The feeds updates are lagging {lag:.0f} seconds behind their schedule, "
+            f"queue depth: {queue_depth}. Task_name: {task_name}."
+        )
+
+
+def iterate_due_feed_batches(
+    due_feeds_queryset: FeedQuerySet,
+) -> Iterator[tuple[int, list[int]]]:
+    """
+    Iterate over the due feeds batches, the feeds are taken fairly across their users
+        then spread over the scheduling window.
+
+    :return: iterator of (countdown in seconds, batch feed ids).
+    """
+    for feed_ids in iterate_fair_ids_in_chunks(
+        due_feeds_queryset,
+        settings.FEED_SCHEDULER_CHUNK_SIZE,
+        settings.FEED_UPDATE_USER_BUDGET_PER_CYCLE,
+    ):
+        yield from spread_feed_ids_over_window(
+            feed_ids,
+            settings.FEED_UPDATE_BATCH_SIZE,
+            settings.FEED_UPDATE_SPREAD_WINDOW_IN_SECONDS,
+        )
+
+
+def update_next_due_feeds(batch_size: int) -> int:
+    """
+    Work queue mode entry point, claim the fetch lease of the next batch of due feeds then update them.
+        Many workers can run it concurrently, every worker claims different feeds without the broker.
+
+    :return: the number of the claimed feeds.
+    """
+    task_name = "feeds_work_queue_worker"
+    fetch_lease_token = get_fetch_lease_token()
+    claimed_feed_ids = (
+        Feed.objects.auto_updatable()
+        .due_for_fetch()
+        .shared_source_leaders()
+        .claim_next_fetch_leases(fetch_lease_token, batch_size)
+    )
+
+    if claimed_feed_ids:
+        update_leased_feeds(claimed_feed_ids, fetch_lease_token, task_name)
+        logger.info(f"{task_name} has updated feed_ids: {claimed_feed_ids}.")
+
+    return len(claimed_feed_ids)
+
+
 @celery_app.task()
 def schedule_update_for_followed_feeds_periodic_task(*args, **kwargs):
     """
-    Schedule a background task to update all the followed feed objects with active auto update.
+    Schedule background tasks to update the followed feed objects with active auto update which are due
+        to be fetched according to their adaptive polling schedule.
+    Feeds are sent in batches of `FEED_UPDATE_BATCH_SIZE` to be fetched concurrently, the batches are spread
+        over `FEED_UPDATE_SPREAD_WINDOW_IN_SECONDS` using a stable hash based slot per feed to keep the load flat.
+    Due feed ids are streamed in chunks of `FEED_SCHEDULER_CHUNK_SIZE`, so the scheduling cost grows with
+        the number of batches instead of loading every feed id at once.
+    The due feeds are taken round robin across their creators, up to `FEED_UPDATE_USER_BUDGET_PER_CYCLE` feeds
+        per user, the most overdue first. The feeds over a user budget stay due and are scheduled at the next cycles,
+        so a user with many feeds doesn't delay the refresh of the other users feeds.
+
+    Only one feed per source url is scheduled, its subscribers get their updates from the shared fetch.
+    Feeds whose update is already queued or running hold a fetch lease, they are not queued again.
+
+    Backpressure: if the workers fall behind, the queue isn't flooded with another full set of batches on top of
+        the unfinished ones. At most `FEED_UPDATE_QUEUE_MAX_DEPTH` tasks are kept waiting at the queue, the due
+        feeds over that are left to the next runs. The scheduler lag is emitted as a metric once it crosses
+        `FEED_SCHEDULER_LAG_THRESHOLD_IN_SECONDS`.
+    Nothing is scheduled at the pipeline mode, the due feeds are updated by the feeds update pipeline process.
+        Nor at the work queue mode, the due feeds are claimed from the DB by the feeds work queue workers.
     """
     task_name = "schedule_update_for_followed_feeds_periodic_task"
     logger.info(f"Started on {task_name}.")
-    feed_ids = Feed.objects.filter(
-        is_followed=True, auto_update_is_active=True
-    ).values_list("id", flat=True)
 
-    for feed_id in feed_ids:
-        update_feed_data_from_source_task.delay(feed_id)
+    if settings.FEED_UPDATE_PIPELINE_MODE:
+        logger.info(
+            f"Finished of {task_name}, the due feeds are updated by the feeds update pipeline."
+        )
+        return
+
+    if settings.FEED_UPDATE_WORK_QUEUE_MODE:
+        logger.info(
+            f"Finished of {task_name}, the due feeds are claimed by the feeds work queue workers."
+        )
+        return
+
+    due_feeds_queryset = (
+        Feed.objects.auto_updatable().due_for_fetch().shared_source_leaders()
+    )
+    queue_depth = get_queue_depth(settings.CELERY_TASK_DEFAULT_QUEUE)
+    emit_scheduler_lag_if_behind(due_feeds_queryset, queue_depth, task_name)
+    max_batches_count = get_available_queue_capacity(queue_depth)
+    feeds_count = batches_count = 0
+
+    if max_batches_count == 0:
+        logger.warning(
+            f"Finished of {task_name}, the queue is backed up with {queue_depth} tasks, "
+            f"nothing has been scheduled."
+        )
+        return
+
+    for countdown, batch_feed_ids in iterate_due_feed_batches(
+        due_feeds_queryset.with_free_fetch_lease()
+    ):
+        # The lease covers the spread countdown, the feeds already queued or running are not queued again.
+        # A user requested update of a feed takes over its lease meanwhile, the feed is dropped from the batch then.
+        fetch_lease_token = get_fetch_lease_token()
+        claimed_feed_ids = Feed.objects.filter(id__in=batch_feed_ids).claim_fetch_lease(
+            fetch_lease_token,
+            lease_in_seconds=countdown + settings.FEED_FETCH_LEASE_TIMEOUT_IN_SECONDS,
+            preemptible=True,
+        )
+
+        if not claimed_feed_ids:
+            continue
+
+        update_feeds_data_from_source_task.apply_async(
+            (claimed_feed_ids,),
+            {"fetch_lease_token": fetch_lease_token},
+            countdown=countdown,
+        )
+        batches_count += 1
+        feeds_count += len(claimed_feed_ids)
+
+        if max_batches_count is not None and batches_count >= max_batches_count:
+            logger.warning(
+                f"The queue has reached its max depth of {settings.FEED_UPDATE_QUEUE_MAX_DEPTH} tasks, "
+                f"the rest of the due feeds are left to the next run. Task_name: {task_name}."
+            )
+            break
 
-    logger.info(f"Finished of {task_name}, feed_ids: {feed_ids}.")
+    logger.info(
+        f"Finished of {task_name}, feeds count: {feeds_count}, batches count: {batches_count}."
+    )
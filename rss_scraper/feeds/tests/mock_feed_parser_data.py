@@ -1,5 +1,7 @@
 import time
 
+from rss_scraper.feeds.fetchers import FeedFetchResponse
+
 base_valid_data = {
     "bozo": False,
     "status": 200,
@@ -98,3 +100,44 @@ feed_url_changed_without_valid_data = base_not_valid_data.copy()
 feed_url_changed_without_valid_data.update(
     {"status": 301, "href": "https://feeds.feedburner.com/tweakers/mixed/changed/"}
 )
+
+valid_feed_xml_content = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+  <channel>
+    <title>Tweakers Mixed RSS Feed</title>
+    <link>https://tweakers.net/</link>
+    <description>Tweakers is de grootste hardwaresite en techcommunity van Nederland.</description>
+    <image>
+      <url>https://tweakers.net/g/if/logo.gif</url>
+      <title>Tweakers</title>
+      <link>https://tweakers.net/</link>
+    </image>
+    <item>
+      <title>Bulk Crap Uninstaller 5.2</title>
+      <link>https://tweakers.net/downloads/59260/bulk-crap-uninstaller-52.html</link>
+      <description>Klocman Software heeft versie 5.2 van Bulk Crap Uninstaller uitgebracht.</description>
+      <pubDate>Mon, 07 Feb 2022 19:31:54 GMT</pubDate>
+    </item>
+    <item>
+      <title>Gerucht: Disney+-serie gebaseerd op Obi-Wan Kenobi komt in mei uit</title>
+      <link>https://tweakers.net/geek/192904/gerucht-disney+-serie-komt-in-mei-uit.html</link>
+      <description>De Disney+-serie over Obi-Wan Kenobi komt mogelijk in mei uit.</description>
+      <pubDate>Sat, 05 Feb 2022 12:40:40 GMT</pubDate>
+    </item>
+  </channel>
+</rss>
+"""
+
+
+def get_feed_fetch_response(feed_parsed_content: dict) -> FeedFetchResponse:
+    """
+    The http response info of a feed download which its parsed content is `feed_parsed_content`.
+    """
+    return FeedFetchResponse(
+        status_code=feed_parsed_content["status"],
+        href=feed_parsed_content["href"],
+        headers={"etag": feed_parsed_content["etag"]}
+        if feed_parsed_content.get("etag")
+        else {},
+        content=b"",
+    )
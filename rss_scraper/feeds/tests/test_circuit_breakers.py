@@ -0,0 +1,61 @@
+import pytest
+from django.core.cache import cache
+
+from rss_scraper.feeds.circuit_breakers import HostCircuitBreaker
+
+
+@pytest.fixture
+def circuit_breaker(settings) -> HostCircuitBreaker:
+    settings.FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD = 3
+    return HostCircuitBreaker("failing.example.com")
+
+
+def test__host_circuit_breaker__given_failures_below_threshold__should_allow_requests(
+    circuit_breaker: HostCircuitBreaker,
+):
+    circuit_breaker.record_failure()
+    circuit_breaker.record_failure()
+
+    assert circuit_breaker.allow_request()
+
+
+def test__host_circuit_breaker__given_failures_reaching_threshold__should_short_circuit_requests(
+    circuit_breaker: HostCircuitBreaker,
+):
+    for _ in range(3):
+        circuit_breaker.record_failure()
+
+    assert not circuit_breaker.allow_request()
+    assert HostCircuitBreaker("healthy.example.com").allow_request()
+
+
+def test__host_circuit_breaker__given_reset_timeout_passed__should_allow_a_single_probe(
+    circuit_breaker: HostCircuitBreaker,
+):
+    for _ in range(3):
+        circuit_breaker.record_failure()
+
+    # Simulate the expiry of the open state after the reset timeout.
+    cache.delete(circuit_breaker.open_key)
+
+    assert circuit_breaker.allow_request()
+    assert not circuit_breaker.allow_request()
+
+    circuit_breaker.record_success()
+
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.allow_request()
+
+
+def test__host_circuit_breaker__given_failed_probe__should_open_again(
+    circuit_breaker: HostCircuitBreaker,
+):
+    for _ in range(3):
+        circuit_breaker.record_failure()
+
+    cache.delete(circuit_breaker.open_key)
+    assert circuit_breaker.allow_request()
+
+    circuit_breaker.record_failure()
+
+    assert not circuit_breaker.allow_request()
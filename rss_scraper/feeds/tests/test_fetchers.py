@@ -0,0 +1,456 @@
+import asyncio
+import datetime
+import gzip
+import threading
+import time
+from unittest import mock
+
+import httpx
+import pytest
+import pytz
+from model_bakery import baker
+from rest_framework import status
+
+from rss_scraper.feeds.circuit_breakers import HostCircuitBreaker
+from rss_scraper.feeds.enums import FeedParsingErrorCodes
+from rss_scraper.feeds.errors import (
+    FeedDownloadLimitExceededError,
+    FeedHostCircuitOpenError,
+)
+from rss_scraper.feeds.fetchers import (
+    AsyncHostLimiter,
+    FeedFetchResponse,
+    HostLimiter,
+    SharedHostLimits,
+    build_async_http_client,
+    build_http_client,
+    fetch_feed,
+    fetch_feeds,
+    get_conditional_request_headers,
+    get_fetch_event_loop,
+    run_fetches,
+)
+from rss_scraper.feeds.models import Feed
+from rss_scraper.feeds.tests.mock_feed_parser_data import valid_feed_xml_content
+from rss_scraper.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+def mock_http_client(handler):
+    """
+    Patch the fetchers http client to be served by the given handler instead of the network.
+    """
+    return mock.patch(
+        "rss_scraper.feeds.fetchers.get_async_http_client",
+        side_effect=lambda: build_async_http_client(
+            transport=httpx.MockTransport(handler)
+        ),
+    )
+
+
+def test__get_conditional_request_headers__given_feed_with_stored_validators__should_replay_them_as_is(
+    user: User,
+):
+    feed_instance = baker.make(
+        Feed,
+        user=user,
+        e_tag='W/"0jy9tuaV"',
+        last_modified_header="Tue, 8 Feb 2022 01:20:16 +0000",
+        last_update_by_source_at=datetime.datetime(
+            2022, 2, 9, 1, 20, 16, tzinfo=pytz.utc
+        ),
+    )
+
+    headers = get_conditional_request_headers(feed_instance)
+
+    assert headers == {
+        "If-None-Match": 'W/"0jy9tuaV"',
+        "If-Modified-Since": "Tue, 8 Feb 2022 01:20:16 +0000",
+    }
+
+
+def test__get_conditional_request_headers__given_never_read_feed__should_return_no_headers(
+    feed_instance: Feed,
+):
+    assert get_conditional_request_headers(feed_instance) == {}
+
+
+def test__fetch_feeds__given_valid_feeds__should_return_responses_in_the_same_order(
+    user: User,
+):
+    feed_instances = baker.make(Feed, user=user, _quantity=5)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            status.HTTP_200_OK,
+            headers={"ETag": str(request.url)},
+            content=valid_feed_xml_content,
+        )
+
+    with mock_http_client(handler):
+        fetched_responses = fetch_feeds(feed_instances, concurrency=2)
+
+    assert all(
+        isinstance(fetched_response, FeedFetchResponse)
+        for fetched_response in fetched_responses
+    )
+    assert [
+        fetched_response.headers["etag"] for fetched_response in fetched_responses
+    ] == [str(httpx.URL(feed_instance.url)) for feed_instance in feed_instances]
+    assert fetched_responses[0].status_code == status.HTTP_200_OK
+    assert fetched_responses[0].content == valid_feed_xml_content
+
+
+def test__fetch_feeds__given_permanently_redirected_feed__should_return_url_changed_status_with_new_href(
+    user: User,
+):
+    feed_instance = baker.make(Feed, url="https://old.example.com/rss", user=user)
+    new_feed_url = "https://new.example.com/rss"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "old.example.com":
+            return httpx.Response(
+                status.HTTP_301_MOVED_PERMANENTLY, headers={"Location": new_feed_url}
+            )
+        return httpx.Response(status.HTTP_200_OK, content=valid_feed_xml_content)
+
+    with mock_http_client(handler):
+        (fetched_response,) = fetch_feeds([feed_instance])
+
+    assert fetched_response.status_code == FeedParsingErrorCodes.URL_CHANGED.value
+    assert fetched_response.href == new_feed_url
+
+
+def test__fetch_feeds__given_unreachable_feed__should_return_the_raised_exception(
+    user: User,
+):
+    feed_instances = baker.make(Feed, user=user, _quantity=2)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url == httpx.URL(feed_instances[0].url):
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(status.HTTP_200_OK, content=valid_feed_xml_content)
+
+    with mock_http_client(handler):
+        fetched_responses = fetch_feeds(feed_instances)
+
+    assert isinstance(fetched_responses[0], httpx.ConnectError)
+    assert isinstance(fetched_responses[1], FeedFetchResponse)
+
+
+def test__fetch_feeds__given_no_feeds__should_return_empty_list():
+    assert fetch_feeds([]) == []
+
+
+def test__fetch_feeds__given_many_feeds_of_the_same_host__should_respect_the_host_concurrency_limit(
+    user: User,
+):
+    feed_instances = [
+        baker.make(Feed, url=f"https://same-host.example.com/{index}", user=user)
+        for index in range(6)
+    ]
+    in_flight_requests = max_in_flight_requests = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight_requests, max_in_flight_requests
+        in_flight_requests += 1
+        max_in_flight_requests = max(max_in_flight_requests, in_flight_requests)
+        await asyncio.sleep(0.01)
+        in_flight_requests -= 1
+        return httpx.Response(status.HTTP_200_OK, content=valid_feed_xml_content)
+
+    with mock_http_client(handler), mock.patch(
+        "rss_scraper.feeds.fetchers.get_async_host_limiter",
+        return_value=AsyncHostLimiter(max_concurrency=2, max_requests_per_second=0),
+    ):
+        fetched_responses = fetch_feeds(feed_instances, concurrency=10)
+
+    assert len(fetched_responses) == 6
+    assert max_in_flight_requests == 2
+
+
+def test__async_host_limiter__given_requests_rate__should_space_out_requests_to_the_same_host():
+    host_limiter = AsyncHostLimiter(max_concurrency=10, max_requests_per_second=20)
+    request_times = []
+
+    async def request(host: str):
+        async with host_limiter.limit(host):
+            request_times.append((host, asyncio.get_running_loop().time()))
+
+    async def run():
+        await asyncio.gather(
+            *(request("a.example.com") for _ in range(3)), request("b.example.com")
+        )
+
+    started_at = time.monotonic()
+    asyncio.run(run())
+
+    same_host_times = [at for host, at in request_times if host == "a.example.com"]
+    assert all(
+        later - earlier >= 0.04
+        for earlier, later in zip(same_host_times, same_host_times[1:])
+    )
+    assert time.monotonic() - started_at < 1
+
+
+def test__host_limiter__given_requests_rate__should_space_out_sync_requests_to_the_same_host():
+    host_limiter = HostLimiter(max_concurrency=1, max_requests_per_second=20)
+    request_times = []
+
+    for _ in range(3):
+        with host_limiter.limit("a.example.com"):
+            request_times.append(time.monotonic())
+
+    assert request_times[2] - request_times[0] >= 0.09
+
+
+def test__host_limiter__given_request_slots_taken_by_another_worker__should_wait_for_them():
+    other_worker_host_limits = SharedHostLimits(
+        "a.example.com", max_concurrency=1, max_requests_per_second=0
+    )
+    request_slot_key = other_worker_host_limits.acquire_request_slot()
+    threading.Timer(
+        0.1, other_worker_host_limits.release_request_slot, [request_slot_key]
+    ).start()
+    started_at = time.monotonic()
+
+    with HostLimiter(max_concurrency=1, max_requests_per_second=0).limit(
+        "a.example.com"
+    ):
+        assert time.monotonic() - started_at >= 0.1
+
+
+def test__shared_host_limits__given_send_times_reserved_by_other_workers__should_reserve_the_next_free_one():
+    send_delays = [
+        SharedHostLimits(
+            "a.example.com", max_concurrency=3, max_requests_per_second=10
+        ).reserve_send_delay()
+        for _ in range(3)
+    ]
+
+    assert all(
+        later - earlier >= 0.09 for earlier, later in zip(send_delays, send_delays[1:])
+    )
+
+
+def test__fetch_feed__given_valid_feed__should_download_it_using_the_shared_client(
+    feed_instance: Feed,
+):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status.HTTP_200_OK, content=valid_feed_xml_content)
+
+    http_client = build_http_client(transport=httpx.MockTransport(handler))
+
+    with mock.patch(
+        "rss_scraper.feeds.fetchers.get_http_client", return_value=http_client
+    ):
+        fetched_response = fetch_feed(feed_instance)
+
+    assert fetched_response.status_code == status.HTTP_200_OK
+    assert fetched_response.content == valid_feed_xml_content
+
+
+def test__fetch_feeds__given_gzip_encoded_feed__should_return_the_decompressed_content(
+    feed_instance: Feed,
+):
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert "gzip" in request.headers["Accept-Encoding"]
+        return httpx.Response(
+            status.HTTP_200_OK,
+            headers={"Content-Encoding": "gzip"},
+            content=gzip.compress(valid_feed_xml_content),
+        )
+
+    with mock_http_client(handler):
+        (fetched_response,) = fetch_feeds([feed_instance])
+
+    assert fetched_response.content == valid_feed_xml_content
+
+
+def test__fetch_feeds__given_feed_content_larger_than_max_size__should_return_download_limit_error(
+    feed_instance: Feed, settings
+):
+    settings.FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES = 100
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            status.HTTP_200_OK,
+            headers={"Content-Encoding": "gzip"},
+            content=gzip.compress(b" " * 1000),
+        )
+
+    with mock_http_client(handler):
+        (fetched_response,) = fetch_feeds([feed_instance])
+
+    assert isinstance(fetched_response, FeedDownloadLimitExceededError)
+
+
+def test__fetch_feeds__given_declared_content_length_larger_than_max_size__should_not_read_the_content(
+    feed_instance: Feed, settings
+):
+    settings.FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES = 100
+    read_chunks = []
+
+    async def content():
+        read_chunks.append(b" " * 1000)
+        yield read_chunks[-1]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            status.HTTP_200_OK, headers={"Content-Length": "1000"}, content=content()
+        )
+
+    with mock_http_client(handler):
+        (fetched_response,) = fetch_feeds([feed_instance])
+
+    assert isinstance(fetched_response, FeedDownloadLimitExceededError)
+    assert read_chunks == []
+
+
+def test__fetch_feeds__given_source_slower_than_first_byte_timeout__should_return_download_limit_error(
+    user: User, settings
+):
+    settings.FEED_FETCH_FIRST_BYTE_TIMEOUT_IN_SECONDS = 0.05
+    slow_feed_instance, fast_feed_instance = baker.make(Feed, user=user, _quantity=2)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url == httpx.URL(slow_feed_instance.url):
+            await asyncio.sleep(1)
+        return httpx.Response(status.HTTP_200_OK, content=valid_feed_xml_content)
+
+    started_at = time.monotonic()
+
+    with mock_http_client(handler):
+        fetched_responses = fetch_feeds([slow_feed_instance, fast_feed_instance])
+
+    assert time.monotonic() - started_at < 0.5
+    assert isinstance(fetched_responses[0], FeedDownloadLimitExceededError)
+    assert isinstance(fetched_responses[1], FeedFetchResponse)
+
+
+def test__fetch_feeds__given_content_trickling_past_total_timeout__should_return_download_limit_error(
+    feed_instance: Feed, settings
+):
+    settings.FEED_FETCH_TOTAL_TIMEOUT_IN_SECONDS = 0.1
+
+    async def trickle_content():
+        for _ in range(20):
+            await asyncio.sleep(0.02)
+            yield b" "
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status.HTTP_200_OK, content=trickle_content())
+
+    with mock_http_client(handler):
+        (fetched_response,) = fetch_feeds([feed_instance])
+
+    assert isinstance(fetched_response, FeedDownloadLimitExceededError)
+
+
+def test__fetch_feed__given_content_trickling_past_total_timeout__should_raise_download_limit_error(
+    feed_instance: Feed, settings
+):
+    settings.FEED_FETCH_TOTAL_TIMEOUT_IN_SECONDS = 0.1
+
+    def trickle_content():
+        for _ in range(20):
+            time.sleep(0.02)
+            yield b" "
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status.HTTP_200_OK, content=trickle_content())
+
+    http_client = build_http_client(transport=httpx.MockTransport(handler))
+
+    with mock.patch(
+        "rss_scraper.feeds.fetchers.get_http_client", return_value=http_client
+    ):
+        with pytest.raises(FeedDownloadLimitExceededError):
+            fetch_feed(feed_instance)
+
+
+def test__fetch_feeds__given_host_failing_repeatedly__should_short_circuit_its_feeds(
+    user: User, settings
+):
+    settings.FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD = 2
+    failing_feed_instance = baker.make(
+        Feed, url="https://failing.example.com/rss", user=user
+    )
+    healthy_feed_instance = baker.make(
+        Feed, url="https://healthy.example.com/rss", user=user
+    )
+    requested_hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested_hosts.append(request.url.host)
+        if request.url.host == "failing.example.com":
+            return httpx.Response(status.HTTP_503_SERVICE_UNAVAILABLE)
+        return httpx.Response(status.HTTP_200_OK, content=valid_feed_xml_content)
+
+    with mock_http_client(handler):
+        for _ in range(3):
+            fetched_responses = fetch_feeds(
+                [failing_feed_instance, healthy_feed_instance]
+            )
+
+    assert requested_hosts.count("failing.example.com") == 2
+    assert requested_hosts.count("healthy.example.com") == 3
+    assert isinstance(fetched_responses[0], FeedHostCircuitOpenError)
+    assert isinstance(fetched_responses[1], FeedFetchResponse)
+
+
+def test__fetch_feeds__given_feeds_over_the_max_content_size__should_not_count_host_failures(
+    user: User, settings
+):
+    settings.FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD = 1
+    settings.FEED_FETCH_MAX_CONTENT_SIZE_IN_BYTES = 10
+    feed_instance = baker.make(Feed, url="https://large.example.com/rss", user=user)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status.HTTP_200_OK, content=valid_feed_xml_content)
+
+    with mock_http_client(handler):
+        for _ in range(2):
+            (fetched_response,) = fetch_feeds([feed_instance])
+
+            assert isinstance(fetched_response, FeedDownloadLimitExceededError)
+
+    assert HostCircuitBreaker("large.example.com").allow_request()
+
+
+def test__fetch_feed__given_host_with_open_circuit_breaker__should_raise_without_sending_requests(
+    feed_instance: Feed, settings
+):
+    settings.FEED_HOST_CIRCUIT_BREAKER_FAILURE_THRESHOLD = 1
+    HostCircuitBreaker(httpx.URL(feed_instance.url).host).record_failure()
+
+    with mock.patch(
+        "rss_scraper.feeds.fetchers.get_http_client"
+    ) as get_http_client_mock:
+        with pytest.raises(FeedHostCircuitOpenError):
+            fetch_feed(feed_instance)
+
+    get_http_client_mock.assert_not_called()
+
+
+def test__run_fetches__given_run_interrupted_from_outside__should_cancel_its_pending_fetches():
+    cancelled_fetches = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled_fetches.append(True)
+            raise
+
+    async def run():
+        asyncio.ensure_future(fetch())
+        await asyncio.sleep(0)
+        raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        run_fetches(run())
+
+    assert cancelled_fetches == [True]
+    assert not asyncio.all_tasks(get_fetch_event_loop())
@@ -1,9 +1,13 @@
+import datetime
+
 import pytest
 from django.db import IntegrityError, transaction
+from django.utils import timezone
 from model_bakery import baker
 
 from rss_scraper.feeds.enums import ItemStatus
 from rss_scraper.feeds.models import Feed, Item
+from rss_scraper.users.models import User
 
 pytestmark = pytest.mark.django_db
 
@@ -87,3 +91,91 @@ def test__mark_item_as_read__given_new_item__should_change_its_status_to_read(
     item_instance.mark_as_read()
 
     assert item_instance.status == ItemStatus.READ
+
+
+def test__feed_shared_source_leaders__given_feeds_with_the_same_url__should_return_one_feed_per_url(
+    user: User, random_url: str
+):
+    user_2, user_3 = baker.make(User, _quantity=2)
+    baker.make(Feed, url=random_url, auto_update_is_active=False, user=user)
+    leader_feed_instance = baker.make(Feed, url=random_url, user=user_2)
+    baker.make(Feed, url=random_url, user=user_3)
+    other_url_feed_instance = baker.make(Feed, user=user)
+
+    leader_feed_instances = Feed.objects.auto_updatable().shared_source_leaders()
+
+    assert set(leader_feed_instances.values_list("id", flat=True)) == {
+        leader_feed_instance.id,
+        other_url_feed_instance.id,
+    }
+
+
+def test__feed_claim_next_fetch_leases__given_free_and_leased_feeds__should_claim_the_earliest_due_free_feeds(
+    user: User,
+):
+    now = timezone.now()
+    latest_feed, leased_feed, earliest_feed, middle_feed = [
+        baker.make(Feed, user=user, next_fetch_at=now - datetime.timedelta(minutes=m))
+        for m in (1, 40, 30, 20)
+    ]
+    Feed.objects.filter(id=leased_feed.id).claim_fetch_lease("other-worker")
+    # A never fetched feed is due since it has been created, after the overdue feeds.
+    never_fetched_feed = baker.make(Feed, user=user)
+
+    assert Feed.objects.claim_next_fetch_leases("first-worker", limit=1) == [
+        earliest_feed.id
+    ]
+
+    claimed_feed_ids = Feed.objects.claim_next_fetch_leases("worker", limit=2)
+
+    assert claimed_feed_ids == sorted([middle_feed.id, latest_feed.id])
+    assert Feed.objects.claim_next_fetch_leases("another-worker", limit=2) == [
+        never_fetched_feed.id
+    ]
+
+
+def test__feed_claim_fetch_lease__given_preemptible_and_running_leases__should_take_over_only_the_preemptible_one(
+    user: User,
+):
+    queued_feed, running_feed = baker.make(Feed, user=user, _quantity=2)
+    Feed.objects.filter(id=queued_feed.id).claim_fetch_lease(
+        "queued-batch", preemptible=True
+    )
+    Feed.objects.filter(id=running_feed.id).claim_fetch_lease("running-batch")
+
+    assert Feed.objects.claim_fetch_lease("duplicate-update") == []
+    assert Feed.objects.claim_fetch_lease("user-update", preempt=True) == [
+        queued_feed.id
+    ]
+    assert Feed.objects.claim_fetch_lease("queued-batch") == []
+    assert Feed.objects.claim_fetch_lease("another-user-update", preempt=True) == []
+
+
+def test__item_bulk_upsert__given_new_and_existing_items__should_create_new_and_update_existing_items(
+    feed_instance: Feed,
+):
+    read_item = baker.make(
+        Item, feed=feed_instance, title="old title", status=ItemStatus.READ
+    )
+
+    Item.objects.bulk_upsert(
+        [
+            Item(feed=feed_instance, url=read_item.url, title="new title"),
+            Item(feed=feed_instance, url="https://example.com/new-item", title="new"),
+        ]
+    )
+    read_item.refresh_from_db()
+
+    assert feed_instance.items.count() == 2
+    assert read_item.title == "new title"
+    assert read_item.status == ItemStatus.READ
+
+
+def test__item_create__given_duplicate_url_and_feed__should_raise_integrity_error(
+    item_instance: Item,
+):
+    with pytest.raises(IntegrityError):
+        with transaction.atomic():
+            baker.make(Item, url=item_instance.url, feed=item_instance.feed)
+
+    assert Item.objects.count() == 1
@@ -0,0 +1,125 @@
+import pickle
+from unittest import mock
+
+import httpx
+import pytest
+from model_bakery import baker
+from rest_framework import status
+
+from rss_scraper.feeds.fetchers import FeedFetchResponse, build_async_http_client
+from rss_scraper.feeds.models import Feed, Item
+from rss_scraper.feeds.pipelines import FeedUpdatePipeline, parse_fetched_feed
+from rss_scraper.feeds.tests.mock_feed_parser_data import valid_feed_xml_content
+from rss_scraper.users.models import User
+
+
+def mock_pipeline_http_client(handler):
+    return mock.patch(
+        "rss_scraper.feeds.pipelines.get_async_http_client",
+        side_effect=lambda: build_async_http_client(
+            transport=httpx.MockTransport(handler)
+        ),
+    )
+
+
+def test__parse_fetched_feed__given_not_well_formed_content__should_return_picklable_parsed_data():
+    fetched_response = FeedFetchResponse(
+        status_code=status.HTTP_200_OK,
+        href="https://example.com/rss",
+        headers={},
+        content=b"<rss><channel><item><title>a&b</title></item>",
+    )
+
+    feed_parsed_data = parse_fetched_feed(fetched_response)
+
+    assert feed_parsed_data.has_error
+    assert isinstance(feed_parsed_data.exception, str)
+    assert pickle.loads(pickle.dumps(feed_parsed_data)) == feed_parsed_data
+
+
+@pytest.mark.django_db(transaction=True)
+def test__feed_update_pipeline__given_due_feeds__should_fetch_parse_and_save_them(
+    user: User,
+):
+    valid_feed_instances = [
+        baker.make(Feed, url=f"https://valid.example.com/{index}", user=user)
+        for index in range(3)
+    ]
+    gone_feed_instance = baker.make(Feed, url="https://gone.example.com/rss", user=user)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "gone.example.com":
+            return httpx.Response(status.HTTP_410_GONE)
+        return httpx.Response(
+            status.HTTP_200_OK,
+            headers={"Content-Type": "application/rss+xml"},
+            content=valid_feed_xml_content,
+        )
+
+    with mock_pipeline_http_client(handler):
+        with FeedUpdatePipeline(
+            parse_processes=2, persist_batch_size=2, queue_size=1
+        ) as pipeline:
+            feeds_count = pipeline.update_due_feeds()
+
+    assert feeds_count == 4
+    assert Item.objects.filter(feed__in=valid_feed_instances).count() == 6
+    assert all(
+        feed_instance.title == "Tweakers Mixed RSS Feed"
+        and feed_instance.next_fetch_at is not None
+        for feed_instance in Feed.objects.filter(
+            id__in=[feed_instance.id for feed_instance in valid_feed_instances]
+        )
+    )
+    gone_feed_instance.refresh_from_db()
+    assert gone_feed_instance.auto_update_is_active is False
+
+
+@pytest.mark.django_db(transaction=True)
+@mock.patch(
+    "rss_scraper.feeds.pipelines.update_fetched_feed",
+    side_effect=RuntimeError("broker is down"),
+)
+def test__feed_update_pipeline__given_feeds_failing_to_be_saved__should_go_on_with_the_other_feeds(
+    update_fetched_feed_mock, user: User
+):
+    baker.make(Feed, user=user, _quantity=4)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status.HTTP_200_OK, content=valid_feed_xml_content)
+
+    with mock_pipeline_http_client(handler):
+        with FeedUpdatePipeline(
+            parse_processes=1, persist_batch_size=1, queue_size=1
+        ) as pipeline:
+            feeds_count = pipeline.update_due_feeds()
+
+    assert feeds_count == 4
+    assert update_fetched_feed_mock.call_count == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test__feed_update_pipeline__given_unchanged_feed_content__should_not_parse_it_again(
+    user: User,
+):
+    feed_instance = baker.make(Feed, user=user)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            status.HTTP_200_OK,
+            headers={"Content-Type": "application/rss+xml"},
+            content=valid_feed_xml_content,
+        )
+
+    with mock_pipeline_http_client(handler):
+        with FeedUpdatePipeline(parse_processes=1) as pipeline:
+            pipeline.update_feeds([feed_instance])
+            feed_instance.refresh_from_db()
+
+            with mock.patch(
+                "rss_scraper.feeds.pipelines.parse_fetched_feed"
+            ) as parse_fetched_feed_mock:
+                pipeline.update_feeds([feed_instance])
+
+    parse_fetched_feed_mock.assert_not_called()
+    assert Item.objects.filter(feed=feed_instance).count() == 2
@@ -0,0 +1,241 @@
+import datetime
+import time
+
+import pytest
+from django.utils import timezone
+
+from rss_scraper.feeds.enums import FeedFetchResult
+from rss_scraper.feeds.models import Feed
+from rss_scraper.feeds.scheduling import (
+    get_cache_expires_at,
+    get_feed_fetch_slot,
+    get_publish_interval,
+    get_retry_countdown,
+    get_skip_days,
+    get_skip_hours,
+    get_source_ttl,
+    spread_feed_ids_over_window,
+    update_feed_fetch_schedule,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def build_items_server_data(published_hours: list[int]) -> list[dict]:
+    return [
+        {"published_parsed": time.struct_time((2022, 2, 7, hour, 0, 0, 0, 38, 0))}
+        for hour in published_hours
+    ]
+
+
+def test__get_publish_interval__given_dated_items__should_return_median_interval_between_items():
+    items_server_data = build_items_server_data([1, 2, 3, 5, 9])
+
+    assert get_publish_interval(items_server_data) == datetime.timedelta(hours=1.5)
+
+
+def test__get_publish_interval__given_less_than_two_dated_items__should_return_none():
+    items_server_data = build_items_server_data([1]) + [{"title": "not dated"}]
+
+    assert get_publish_interval(items_server_data) is None
+
+
+def test__update_feed_fetch_schedule__given_updated_feed__should_poll_at_twice_its_publish_rate(
+    feed_instance: Feed,
+):
+    now = timezone.now()
+    feed_instance.consecutive_fetch_failures = 2
+
+    update_feed_fetch_schedule(
+        feed_instance,
+        FeedFetchResult.UPDATED,
+        build_items_server_data([1, 3, 5]),
+        now=now,
+    )
+
+    assert feed_instance.fetch_interval == datetime.timedelta(hours=1)
+    assert feed_instance.next_fetch_at == now + datetime.timedelta(hours=1)
+    assert feed_instance.consecutive_fetch_failures == 0
+
+
+def test__update_feed_fetch_schedule__given_not_modified_feed__should_stretch_its_polling_interval(
+    feed_instance: Feed,
+):
+    initial_fetch_interval = feed_instance.fetch_interval
+
+    update_feed_fetch_schedule(feed_instance, FeedFetchResult.NOT_MODIFIED)
+    first_not_modified_interval = feed_instance.fetch_interval
+    update_feed_fetch_schedule(feed_instance, FeedFetchResult.NOT_MODIFIED)
+
+    assert feed_instance.not_modified_ratio > 0
+    assert initial_fetch_interval < first_not_modified_interval
+    assert first_not_modified_interval < feed_instance.fetch_interval
+
+
+def test__update_feed_fetch_schedule__given_failed_fetches__should_back_off_within_the_max_interval(
+    feed_instance: Feed, settings
+):
+    now = timezone.now()
+
+    update_feed_fetch_schedule(feed_instance, FeedFetchResult.FAILED, now=now)
+
+    assert feed_instance.consecutive_fetch_failures == 1
+    assert feed_instance.next_fetch_at == now + feed_instance.fetch_interval * 2
+
+    for _ in range(20):
+        update_feed_fetch_schedule(feed_instance, FeedFetchResult.FAILED, now=now)
+
+    assert feed_instance.next_fetch_at == now + datetime.timedelta(
+        minutes=settings.FEED_FETCH_MAX_INTERVAL_IN_MINUTES
+    )
+
+
+def test__update_feed_fetch_schedule__given_very_busy_feed__should_not_poll_faster_than_the_min_interval(
+    feed_instance: Feed, settings
+):
+    items_server_data = [
+        {"published_parsed": time.struct_time((2022, 2, 7, 1, minute, 0, 0, 38, 0))}
+        for minute in range(10)
+    ]
+
+    update_feed_fetch_schedule(
+        feed_instance, FeedFetchResult.UPDATED, items_server_data
+    )
+
+    assert feed_instance.fetch_interval == datetime.timedelta(
+        minutes=settings.FEED_FETCH_MIN_INTERVAL_IN_MINUTES
+    )
+
+
+def test__get_feed_fetch_slot__given_feed_id__should_return_stable_slot_within_the_window():
+    slots = {get_feed_fetch_slot(feed_id, 300) for feed_id in range(1000)}
+
+    assert get_feed_fetch_slot(42, 300) == get_feed_fetch_slot(42, 300)
+    assert all(0 <= slot < 300 for slot in slots)
+    assert len(slots) > 250
+
+
+def test__spread_feed_ids_over_window__given_feed_ids__should_return_batches_ordered_by_their_slots():
+    batches = spread_feed_ids_over_window(list(range(100)), 10, 300)
+    countdowns = [countdown for countdown, _ in batches]
+
+    assert len(batches) == 10
+    assert countdowns == sorted(countdowns)
+    assert sorted(
+        feed_id for _, batch_feed_ids in batches for feed_id in batch_feed_ids
+    ) == list(range(100))
+
+
+def test__spread_feed_ids_over_window__given_no_window__should_not_delay_the_batches():
+    batches = spread_feed_ids_over_window(list(range(5)), 2, 0)
+
+    assert [countdown for countdown, _ in batches] == [0, 0, 0]
+
+
+def test__get_retry_countdown__given_consecutive_failures__should_back_off_exponentially_with_jitter(
+    settings,
+):
+    settings.FEED_UPDATE_TASK_RETRY_DELAY_IN_SECONDS = 10
+    settings.FEED_UPDATE_TASK_MAX_RETRY_DELAY_IN_SECONDS = 60
+
+    assert 5 <= get_retry_countdown(1) <= 10
+    assert 20 <= get_retry_countdown(3) <= 40
+    assert 30 <= get_retry_countdown(100) <= 60
+    assert len({get_retry_countdown(3) for _ in range(10)}) > 1
+
+
+@pytest.mark.parametrize(
+    "feed_server_data, expected_ttl",
+    [
+        ({"ttl": "90"}, datetime.timedelta(minutes=90)),
+        (
+            {"sy_updateperiod": "hourly", "sy_updatefrequency": "2"},
+            datetime.timedelta(minutes=30),
+        ),
+        (
+            {"ttl": "60", "sy_updateperiod": "daily"},
+            datetime.timedelta(days=1),
+        ),
+        ({"ttl": "soon"}, None),
+        ({}, None),
+    ],
+)
+def test__get_source_ttl__given_feed_server_data__should_return_the_longest_declared_ttl(
+    feed_server_data: dict, expected_ttl
+):
+    assert get_source_ttl(feed_server_data) == expected_ttl
+
+
+def test__get_skip_hours_and_days__given_feed_content__should_return_all_the_listed_ones():
+    content = (
+        b"<rss><channel><skipHours><hour>23</hour><hour>0</hour><hour>24</hour></skipHours>"
+        b"<skipDays><day>Sunday</day><day>saturday</day></skipDays></channel></rss>"
+    )
+
+    assert get_skip_hours(content) == [0, 23]
+    assert get_skip_days(content) == ["Saturday", "Sunday"]
+    assert get_skip_hours(b"<rss></rss>") == []
+
+
+def test__get_cache_expires_at__given_response_headers__should_prefer_max_age_over_expires():
+    now = timezone.now()
+    expires = "Tue, 08 Feb 2022 01:20:16 GMT"
+
+    assert (
+        get_cache_expires_at(
+            {"cache-control": "public, max-age=600", "age": "100", "expires": expires},
+            now=now,
+        )
+        == now + datetime.timedelta(seconds=500)
+    )
+    assert get_cache_expires_at({"expires": expires}, now=now) == datetime.datetime(
+        2022, 2, 8, 1, 20, 16, tzinfo=datetime.timezone.utc
+    )
+    assert get_cache_expires_at({"cache-control": "no-cache, max-age=600"}) is None
+    assert get_cache_expires_at({}) is None
+
+
+def test__update_feed_fetch_schedule__given_source_ttl_and_cache_expiry__should_not_fetch_before_them(
+    feed_instance: Feed,
+):
+    now = timezone.now()
+    feed_instance.ttl = datetime.timedelta(hours=2)
+
+    update_feed_fetch_schedule(feed_instance, FeedFetchResult.NOT_MODIFIED, now=now)
+    assert feed_instance.next_fetch_at == now + datetime.timedelta(hours=2)
+
+    feed_instance.cache_expires_at = now + datetime.timedelta(hours=3)
+    update_feed_fetch_schedule(feed_instance, FeedFetchResult.NOT_MODIFIED, now=now)
+    assert feed_instance.next_fetch_at == now + datetime.timedelta(hours=3)
+
+
+def test__update_feed_fetch_schedule__given_source_skip_hours_and_days__should_fetch_after_them(
+    feed_instance: Feed,
+):
+    # Friday 22:30 GMT.
+    now = datetime.datetime(2022, 2, 4, 22, 30, tzinfo=datetime.timezone.utc)
+    feed_instance.fetch_interval = datetime.timedelta(minutes=5)
+    feed_instance.skip_hours = [22, 23]
+    feed_instance.skip_days = ["Saturday", "Sunday"]
+
+    update_feed_fetch_schedule(feed_instance, FeedFetchResult.UPDATED, now=now)
+
+    assert feed_instance.next_fetch_at == datetime.datetime(
+        2022, 2, 7, 0, 0, tzinfo=datetime.timezone.utc
+    )
+
+
+def test__update_feed_fetch_schedule__given_failed_fetch__should_not_wait_for_the_source_schedule(
+    feed_instance: Feed,
+):
+    now = timezone.now()
+    feed_instance.ttl = datetime.timedelta(days=1)
+
+    update_feed_fetch_schedule(
+        feed_instance,
+        FeedFetchResult.FAILED,
+        now=now,
+        retry_in=datetime.timedelta(minutes=1),
+    )
+
+    assert feed_instance.next_fetch_at == now + datetime.timedelta(minutes=1)
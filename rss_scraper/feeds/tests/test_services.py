@@ -1,23 +1,32 @@
+import datetime
 from unittest import mock
 
+import httpx
 import pytest
+from django.utils import timezone
+from model_bakery import baker
 from rest_framework import status
 
-from rss_scraper.feeds.enums import FeedParsingErrorCodes
+from rss_scraper.feeds.enums import FeedParsingErrorCodes, ItemStatus
 from rss_scraper.feeds.errors import (
     FeedIsGoneError,
     FeedNotAvailableError,
     FeedUrlChangedError,
 )
+from rss_scraper.feeds.fetchers import FeedFetchResponse
+from rss_scraper.feeds.models import Feed, Item
 from rss_scraper.feeds.services import FeedReaderService
 from rss_scraper.feeds.tests.mock_feed_parser_data import (
     feed_content_not_changed_data,
     feed_is_gone_data,
     feed_url_changed_with_valid_data,
     feed_url_changed_without_valid_data,
+    get_feed_fetch_response,
     not_valid_feed,
+    valid_feed_xml_content,
     valid_parsed_feed_content,
 )
+from rss_scraper.users.models import User
 
 pytestmark = pytest.mark.django_db
 
@@ -25,9 +34,13 @@ pytestmark = pytest.mark.django_db
 class TestFeedReaderService:
     VALID_STATUS_CODES = [status.HTTP_200_OK, status.HTTP_301_MOVED_PERMANENTLY]
 
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(valid_parsed_feed_content),
+    )
     @mock.patch("feedparser.parse", return_value=valid_parsed_feed_content)
     def test__service__with_valid_feed_data__should_be_processed_successfully(
-        self, _, feed_service: FeedReaderService
+        self, _, _fetch_feed_mock, feed_service: FeedReaderService
     ):
         feed_service.process_feed_data_from_source()
 
@@ -40,9 +53,13 @@ class TestFeedReaderService:
             valid_parsed_feed_content["entries"]
         )
 
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(valid_parsed_feed_content),
+    )
     @mock.patch("feedparser.parse", return_value=valid_parsed_feed_content)
-    def test__service__with_valid_feed_data_and_already_updated_feed__should_save_items_one_by_one(
-        self, _, feed_service: FeedReaderService
+    def test__service__with_valid_feed_data_and_already_updated_feed__should_bulk_upsert_items(
+        self, _, _fetch_feed_mock, feed_service: FeedReaderService
     ):
         feed_service.first_time_to_be_read_from_source = False
         assert not feed_service.feed_instance.items.count()
@@ -58,6 +75,10 @@ class TestFeedReaderService:
             valid_parsed_feed_content["entries"]
         )
 
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(not_valid_feed),
+    )
     @mock.patch("feedparser.parse", return_value=not_valid_feed)
     @mock.patch("rss_scraper.feeds.services.FeedReaderService.update_feed_items")
     @mock.patch("rss_scraper.feeds.services.FeedReaderService.update_feed_instance")
@@ -66,6 +87,7 @@ class TestFeedReaderService:
         update_feed_instance_mock,
         update_feed_items_mock,
         _,
+        _fetch_feed_mock,
         feed_service: FeedReaderService,
     ):
         with pytest.raises(FeedNotAvailableError) as err_info:
@@ -76,6 +98,10 @@ class TestFeedReaderService:
         update_feed_instance_mock.assert_not_called()
         update_feed_items_mock.assert_not_called()
 
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(feed_is_gone_data),
+    )
     @mock.patch("feedparser.parse", return_value=feed_is_gone_data)
     @mock.patch("rss_scraper.feeds.services.FeedReaderService.update_feed_items")
     @mock.patch("rss_scraper.feeds.services.FeedReaderService.update_feed_instance")
@@ -84,6 +110,7 @@ class TestFeedReaderService:
         update_feed_instance_mock,
         update_feed_items_mock,
         _,
+        _fetch_feed_mock,
         feed_service: FeedReaderService,
     ):
         with pytest.raises(FeedIsGoneError) as err_info:
@@ -93,6 +120,10 @@ class TestFeedReaderService:
         update_feed_instance_mock.assert_not_called()
         update_feed_items_mock.assert_not_called()
 
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(feed_content_not_changed_data),
+    )
     @mock.patch("feedparser.parse", return_value=feed_content_not_changed_data)
     @mock.patch("rss_scraper.feeds.services.FeedReaderService.update_feed_items")
     @mock.patch("rss_scraper.feeds.services.FeedReaderService.update_feed_instance")
@@ -101,13 +132,42 @@ class TestFeedReaderService:
         update_feed_instance_mock,
         update_feed_items_mock,
         _,
+        _fetch_feed_mock,
         feed_service: FeedReaderService,
     ):
         feed_service.process_feed_data_from_source()
+        feed_service.feed_instance.refresh_from_db()
 
         update_feed_instance_mock.assert_not_called()
         update_feed_items_mock.assert_not_called()
+        assert feed_service.feed_instance.not_modified_ratio > 0
+        assert feed_service.feed_instance.next_fetch_at is not None
+
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(feed_content_not_changed_data),
+    )
+    def test__service__with_conditional_fetches__should_count_the_not_modified_hit_rate(
+        self, fetch_feed_mock, feed_service: FeedReaderService
+    ):
+        feed_service.feed_instance.e_tag = '"0jy9tuaV"'
+        feed_service.process_feed_data_from_source()
+        fetch_feed_mock.return_value = get_feed_fetch_response(
+            valid_parsed_feed_content
+        )
+
+        with mock.patch("feedparser.parse", return_value=valid_parsed_feed_content):
+            feed_service.process_feed_data_from_source()
+
+        feed_service.feed_instance.refresh_from_db()
+        assert feed_service.feed_instance.conditional_fetch_count == 2
+        assert feed_service.feed_instance.not_modified_fetch_count == 1
+        assert feed_service.feed_instance.not_modified_hit_rate == 0.5
 
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(feed_url_changed_without_valid_data),
+    )
     @mock.patch("feedparser.parse", return_value=feed_url_changed_without_valid_data)
     @mock.patch("rss_scraper.feeds.services.FeedReaderService.update_feed_items")
     @mock.patch("rss_scraper.feeds.services.FeedReaderService.update_feed_instance")
@@ -116,19 +176,26 @@ class TestFeedReaderService:
         update_feed_instance_mock,
         update_feed_items_mock,
         _,
+        _fetch_feed_mock,
         feed_service: FeedReaderService,
     ):
         with pytest.raises(FeedUrlChangedError) as err_info:
             feed_service.process_feed_data_from_source()
 
         assert err_info.value.code == FeedParsingErrorCodes.URL_CHANGED.value
+        assert err_info.value.href == feed_url_changed_without_valid_data["href"]
         update_feed_instance_mock.assert_not_called()
         update_feed_items_mock.assert_not_called()
 
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(feed_url_changed_with_valid_data),
+    )
     @mock.patch("feedparser.parse", return_value=feed_url_changed_with_valid_data)
     def test__service__with_feed_url_changed_with_valid_data__should_be_processed_successfully(
         self,
         _,
+        _fetch_feed_mock,
         feed_service: FeedReaderService,
     ):
         old_feed_instance_url = feed_service.feed_instance.url
@@ -140,3 +207,209 @@ class TestFeedReaderService:
             == FeedParsingErrorCodes.URL_CHANGED.value
         )
         assert feed_service.feed_instance.url != old_feed_instance_url
+
+    def test__move_to_new_url__given_new_url__should_save_it_and_clear_the_old_url_etag(
+        self, feed_service: FeedReaderService
+    ):
+        new_feed_url = "https://feeds.feedburner.com/tweakers/mixed/changed/"
+        feed_service.feed_instance.e_tag = '"0jy9tuaV"'
+        feed_service.feed_instance.save()
+
+        assert feed_service.move_to_new_url(new_feed_url)
+
+        feed_service.feed_instance.refresh_from_db()
+        assert feed_service.feed_instance.url == new_feed_url
+        assert feed_service.feed_instance.e_tag == ""
+
+    def test__move_to_new_url__given_url_of_another_feed_of_the_same_user__should_not_move_the_feed(
+        self, feed_service: FeedReaderService
+    ):
+        other_feed_instance = baker.make(Feed, user=feed_service.feed_instance.user)
+        old_feed_url = feed_service.feed_instance.url
+
+        assert not feed_service.move_to_new_url(other_feed_instance.url)
+        assert not feed_service.move_to_new_url(old_feed_url)
+
+        feed_service.feed_instance.refresh_from_db()
+        assert feed_service.feed_instance.url == old_feed_url
+
+    def test__service__with_already_fetched_feed_response__should_parse_it_without_downloading_the_feed(
+        self, feed_service: FeedReaderService
+    ):
+        fetched_response = FeedFetchResponse(
+            status_code=status.HTTP_200_OK,
+            href=feed_service.feed_instance.url,
+            headers={
+                "content-type": "application/rss+xml",
+                "etag": '"0jy9tuaV"',
+                "last-modified": "Tue, 08 Feb 2022 01:20:16 GMT",
+            },
+            content=valid_feed_xml_content,
+        )
+
+        with mock.patch("feedparser.http.get") as http_get_mock:
+            feed_service.process_feed_data_from_source(fetched_response)
+
+        http_get_mock.assert_not_called()
+        assert feed_service.feed_instance.title == "Tweakers Mixed RSS Feed"
+        assert feed_service.feed_instance.e_tag == '"0jy9tuaV"'
+        assert (
+            feed_service.feed_instance.last_modified_header
+            == "Tue, 08 Feb 2022 01:20:16 GMT"
+        )
+        assert feed_service.feed_instance.last_update_by_source_at.year == 2022
+        assert feed_service.feed_instance.items.count() == 2
+
+    def test__service__with_feed_declaring_its_schedule__should_save_it_and_not_fetch_before_it(
+        self, feed_service: FeedReaderService
+    ):
+        fetched_response = FeedFetchResponse(
+            status_code=status.HTTP_200_OK,
+            href=feed_service.feed_instance.url,
+            headers={
+                "content-type": "application/rss+xml",
+                "cache-control": "max-age=300",
+            },
+            content=valid_feed_xml_content.replace(
+                b"<channel>",
+                b"<channel><ttl>180</ttl><skipDays><day>Sunday</day></skipDays>",
+            ),
+        )
+
+        feed_service.process_feed_data_from_source(fetched_response)
+        feed_service.feed_instance.refresh_from_db()
+
+        assert feed_service.feed_instance.ttl == datetime.timedelta(minutes=180)
+        assert feed_service.feed_instance.skip_days == ["Sunday"]
+        assert feed_service.feed_instance.cache_expires_at is not None
+        assert feed_service.feed_instance.next_fetch_at >= timezone.now() + (
+            datetime.timedelta(minutes=179)
+        )
+
+    def test__service__with_body_identical_to_the_last_fetch__should_skip_parsing_and_saving_it(
+        self, feed_service: FeedReaderService
+    ):
+        fetched_response = FeedFetchResponse(
+            status_code=status.HTTP_200_OK,
+            href=feed_service.feed_instance.url,
+            headers={"content-type": "application/rss+xml"},
+            content=valid_feed_xml_content,
+        )
+        feed_service.process_feed_data_from_source(fetched_response)
+        feed_service.feed_instance.items.all().delete()
+
+        with mock.patch("feedparser.parse") as feedparser_parse_mock:
+            feed_service.process_feed_data_from_source(fetched_response)
+
+        feedparser_parse_mock.assert_not_called()
+        assert feed_service.feed_instance.content_hash
+        assert feed_service.feed_instance.items.count() == 0
+        assert feed_service.feed_instance.not_modified_ratio > 0
+
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(valid_parsed_feed_content),
+    )
+    @mock.patch("feedparser.parse", return_value=valid_parsed_feed_content)
+    def test__service__sharing_parsed_data_with_subscribers__should_update_all_the_url_subscribers_feeds(
+        self, feedparser_parse_mock, _fetch_feed_mock, feed_service: FeedReaderService
+    ):
+        user_2, user_3 = baker.make(User, _quantity=2)
+        subscriber_feed_instance = baker.make(
+            Feed, url=feed_service.feed_instance.url, user=user_2
+        )
+        inactive_subscriber_feed_instance = baker.make(
+            Feed,
+            url=feed_service.feed_instance.url,
+            auto_update_is_active=False,
+            user=user_3,
+        )
+
+        feed_service.process_feed_data_from_source(share_with_subscribers=True)
+
+        feedparser_parse_mock.assert_called_once()
+        assert subscriber_feed_instance.items.count() == len(
+            valid_parsed_feed_content["entries"]
+        )
+        subscriber_feed_instance.refresh_from_db()
+        assert (
+            subscriber_feed_instance.title == valid_parsed_feed_content["feed"]["title"]
+        )
+        assert subscriber_feed_instance.next_fetch_at > timezone.now()
+        assert not inactive_subscriber_feed_instance.items.exists()
+
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(feed_content_not_changed_data),
+    )
+    @mock.patch("feedparser.parse", return_value=feed_content_not_changed_data)
+    def test__service__sharing_not_modified_feed_with_subscribers__should_schedule_all_the_url_subscribers_feeds(
+        self, _, _fetch_feed_mock, feed_service: FeedReaderService
+    ):
+        now = timezone.now()
+        subscriber_feed_instance = baker.make(
+            Feed,
+            url=feed_service.feed_instance.url,
+            user=baker.make(User),
+            next_fetch_at=now,
+        )
+
+        feed_service.process_feed_data_from_source(share_with_subscribers=True)
+
+        subscriber_feed_instance.refresh_from_db()
+        assert subscriber_feed_instance.next_fetch_at > now
+        assert subscriber_feed_instance.not_modified_ratio > 0
+
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=get_feed_fetch_response(feed_url_changed_with_valid_data),
+    )
+    @mock.patch("feedparser.parse", return_value=feed_url_changed_with_valid_data)
+    def test__service__sharing_moved_feed_with_subscriber_already_following_the_new_url__should_not_move_it(
+        self, _, _fetch_feed_mock, feed_service: FeedReaderService
+    ):
+        user_2 = baker.make(User)
+        old_feed_url = feed_service.feed_instance.url
+        subscriber_feed_instance = baker.make(Feed, url=old_feed_url, user=user_2)
+        baker.make(Feed, url=feed_url_changed_with_valid_data["href"], user=user_2)
+
+        feed_service.process_feed_data_from_source(share_with_subscribers=True)
+
+        subscriber_feed_instance.refresh_from_db()
+        assert (
+            feed_service.feed_instance.url == feed_url_changed_with_valid_data["href"]
+        )
+        assert subscriber_feed_instance.url == old_feed_url
+        assert subscriber_feed_instance.items.exists()
+
+    def test__service__updating_items_of_already_read_feed__should_upsert_them_in_one_query(
+        self, feed_service: FeedReaderService, django_assert_num_queries
+    ):
+        feed_service.first_time_to_be_read_from_source = False
+        items_server_data = valid_parsed_feed_content["entries"]
+        baker.make(
+            Item,
+            feed=feed_service.feed_instance,
+            url=items_server_data[0]["link"],
+            status=ItemStatus.READ,
+        )
+
+        with django_assert_num_queries(1):
+            feed_service.update_feed_items(items_server_data)
+
+        assert feed_service.feed_instance.items.count() == len(items_server_data)
+        assert feed_service.feed_instance.items.get(
+            url=items_server_data[0]["link"]
+        ).title == (items_server_data[0]["title"])
+
+    @mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        side_effect=httpx.ConnectError("connection refused"),
+    )
+    def test__service__with_unreachable_feed_source__should_raises_feed_not_valid_error(
+        self, _, feed_service: FeedReaderService
+    ):
+        with pytest.raises(FeedNotAvailableError):
+            feed_service.process_feed_data_from_source()
+
+        assert not feed_service.feed_instance.items.exists()
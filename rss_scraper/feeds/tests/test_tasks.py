@@ -1,15 +1,29 @@
+import datetime
+import time
 from unittest import mock
 
 import pytest
-from celery.exceptions import MaxRetriesExceededError, Retry
+from celery.exceptions import MaxRetriesExceededError, Retry, SoftTimeLimitExceeded
+from django.db import transaction
+from django.utils import timezone
 from model_bakery import baker
 
-from rss_scraper.feeds.enums import FeedParsingErrorCodes
-from rss_scraper.feeds.errors import FeedIsGoneError, FeedNotAvailableError
-from rss_scraper.feeds.models import Feed
+from rss_scraper.feeds.enums import FeedFetchResult, FeedParsingErrorCodes
+from rss_scraper.feeds.errors import (
+    FeedDownloadLimitExceededError,
+    FeedIsGoneError,
+    FeedNotAvailableError,
+    FeedUrlChangedError,
+)
+from rss_scraper.feeds.models import Feed, Item
+from rss_scraper.feeds.scheduling import get_feed_fetch_slot
 from rss_scraper.feeds.tasks import (
+    queue_feed_update,
     schedule_update_for_followed_feeds_periodic_task,
     update_feed_data_from_source_task,
+    update_feeds_data_from_source_task,
+    update_fetched_feed,
+    update_next_due_feeds,
 )
 from rss_scraper.feeds.tests.mock_feed_parser_data import valid_parsed_feed_content
 from rss_scraper.users.models import User
@@ -17,9 +31,17 @@ from rss_scraper.users.models import User
 pytestmark = pytest.mark.django_db
 
 
-@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+def get_scheduled_feed_ids(update_feeds_data_from_source_task_mock) -> list[int]:
+    return sorted(
+        feed_id
+        for call in update_feeds_data_from_source_task_mock.call_args_list
+        for feed_id in call.args[0][0]
+    )
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
 def test__periodic_task__given_feeds_with_different_followed_and_active__should_run_only_followed_and_active_feeds(
-    update_feed_data_from_source_task_mock, user: User
+    update_feeds_data_from_source_task_mock, user: User
 ):
     """
     Given feeds with different `is_followed` and different `auto_update_is_active`,
@@ -45,11 +67,246 @@ def test__periodic_task__given_feeds_with_different_followed_and_active__should_
 
     schedule_update_for_followed_feeds_periodic_task.run()
 
-    assert update_feed_data_from_source_task_mock.call_count == len(
+    assert get_scheduled_feed_ids(update_feeds_data_from_source_task_mock) == sorted(
         expected_to_be_updated_feed_ids
     )
 
 
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_feeds_more_than_batch_size__should_schedule_them_in_batches(
+    update_feeds_data_from_source_task_mock, user: User, settings
+):
+    settings.FEED_UPDATE_BATCH_SIZE = 2
+    settings.FEED_SCHEDULER_CHUNK_SIZE = 4
+    feed_instances = baker.make(
+        Feed, is_followed=True, auto_update_is_active=True, user=user, _quantity=5
+    )
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    assert update_feeds_data_from_source_task_mock.call_count == 3
+    assert get_scheduled_feed_ids(update_feeds_data_from_source_task_mock) == sorted(
+        feed_instance.id for feed_instance in feed_instances
+    )
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_spread_window__should_delay_batches_by_their_feeds_slots(
+    update_feeds_data_from_source_task_mock, user: User, settings
+):
+    settings.FEED_UPDATE_BATCH_SIZE = 1
+    settings.FEED_UPDATE_SPREAD_WINDOW_IN_SECONDS = 600
+    feed_instances = baker.make(Feed, user=user, _quantity=3)
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    assert {
+        call.args[0][0][0]: call.kwargs["countdown"]
+        for call in update_feeds_data_from_source_task_mock.call_args_list
+    } == {
+        feed_instance.id: get_feed_fetch_slot(feed_instance.id, 600)
+        for feed_instance in feed_instances
+    }
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_user_over_budget__should_schedule_its_most_overdue_feeds_only(
+    update_feeds_data_from_source_task_mock, user: User, settings
+):
+    settings.FEED_UPDATE_USER_BUDGET_PER_CYCLE = 2
+    now = timezone.now()
+    user_2 = baker.make(User)
+    heavy_user_feed_ids = [
+        baker.make(
+            Feed, user=user, next_fetch_at=now - datetime.timedelta(minutes=minutes)
+        ).id
+        for minutes in (1, 30, 20, 10)
+    ]
+    user_2_feed_ids = [feed.id for feed in baker.make(Feed, user=user_2, _quantity=2)]
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    assert get_scheduled_feed_ids(update_feeds_data_from_source_task_mock) == sorted(
+        [heavy_user_feed_ids[1], heavy_user_feed_ids[2], *user_2_feed_ids]
+    )
+
+
+@mock.patch("rss_scraper.feeds.tasks.get_queue_depth", return_value=10)
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_backed_up_queue__should_not_schedule_and_emit_lag(
+    update_feeds_data_from_source_task_mock,
+    get_queue_depth_mock,
+    user: User,
+    settings,
+    caplog,
+):
+    settings.FEED_UPDATE_QUEUE_MAX_DEPTH = 10
+    settings.FEED_SCHEDULER_LAG_THRESHOLD_IN_SECONDS = 60
+    caplog.set_level("INFO", logger="rss_scraper.feeds.metrics")
+    feed_instance = baker.make(
+        Feed, user=user, next_fetch_at=timezone.now() - datetime.timedelta(hours=1)
+    )
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    update_feeds_data_from_source_task_mock.assert_not_called()
+    feed_instance.refresh_from_db()
+    assert feed_instance.fetch_lease_expires_at is None
+    (lag_record,) = [
+        record
+        for record in caplog.records
+        if record.name == "rss_scraper.feeds.metrics"
+    ]
+    assert lag_record.metric == "feeds.scheduler.lag_seconds"
+    assert lag_record.value >= 60 * 60
+    assert lag_record.tags == {"queue_depth": 10}
+
+
+@mock.patch("rss_scraper.feeds.tasks.get_queue_depth", return_value=8)
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_queue_near_max_depth__should_schedule_only_up_to_it(
+    update_feeds_data_from_source_task_mock,
+    get_queue_depth_mock,
+    user: User,
+    settings,
+):
+    settings.FEED_UPDATE_QUEUE_MAX_DEPTH = 10
+    settings.FEED_UPDATE_BATCH_SIZE = 1
+    baker.make(Feed, user=user, _quantity=3)
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    assert update_feeds_data_from_source_task_mock.call_count == 2
+    assert Feed.objects.filter(fetch_lease_expires_at__isnull=True).count() == 1
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+@mock.patch("rss_scraper.feeds.tasks.fetch_feeds")
+def test__update_feeds_data_from_source_task__given_batch_of_feeds__should_retry_only_failed_feeds_separately(
+    fetch_feeds_mock,
+    process_feed_data_from_source_mock,
+    update_feed_data_from_source_task_mock,
+    user: User,
+    django_capture_on_commit_callbacks,
+):
+    feed_instance_1, feed_instance_2 = baker.make(Feed, user=user, _quantity=2)
+    fetched_response = mock.Mock()
+    fetched_responses = {
+        feed_instance_1.id: fetched_response,
+        feed_instance_2.id: ConnectionError("connection refused"),
+    }
+    fetch_feeds_mock.side_effect = lambda feed_instances: [
+        fetched_responses[feed_instance.id] for feed_instance in feed_instances
+    ]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        update_feeds_data_from_source_task.run([feed_instance_1.id, feed_instance_2.id])
+
+    process_feed_data_from_source_mock.assert_called_once_with(
+        fetched_response, share_with_subscribers=True
+    )
+    update_feed_data_from_source_task_mock.assert_called_once_with(
+        feed_instance_2.id, share_with_subscribers=True, fetch_lease_token=mock.ANY
+    )
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+def test__update_fetched_feed__given_failed_feed_saved_in_a_transaction__should_queue_its_retrial_once_committed(
+    update_feed_data_from_source_task_mock,
+    feed_instance: Feed,
+    django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks() as callbacks:
+        with transaction.atomic():
+            assert update_fetched_feed(
+                feed_instance, ConnectionError("connection refused"), "task"
+            )
+
+        update_feed_data_from_source_task_mock.assert_not_called()
+
+    assert len(callbacks) == 1
+    callbacks[0]()
+    update_feed_data_from_source_task_mock.assert_called_once_with(
+        feed_instance.id, share_with_subscribers=True, fetch_lease_token=""
+    )
+
+
+@mock.patch("rss_scraper.feeds.tasks.fetch_feeds", side_effect=SoftTimeLimitExceeded())
+def test__update_feeds_data_from_source_task__given_time_limit_hit_while_downloading__should_release_the_leases(
+    fetch_feeds_mock, user: User
+):
+    feed_instance_ids = [
+        feed_instance.id for feed_instance in baker.make(Feed, user=user, _quantity=2)
+    ]
+
+    with pytest.raises(SoftTimeLimitExceeded):
+        update_feeds_data_from_source_task.run(feed_instance_ids)
+
+    assert Feed.objects.with_free_fetch_lease().count() == 2
+
+
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source",
+    side_effect=[KeyError("published_parsed"), None],
+)
+@mock.patch("rss_scraper.feeds.tasks.fetch_feeds")
+def test__update_feeds_data_from_source_task__given_feed_failing_to_be_saved__should_update_the_rest_of_the_batch(
+    fetch_feeds_mock, process_feed_data_from_source_mock, user: User
+):
+    feed_instance_ids = [
+        feed_instance.id for feed_instance in baker.make(Feed, user=user, _quantity=2)
+    ]
+    fetch_feeds_mock.side_effect = lambda feed_instances: [
+        mock.Mock() for _ in feed_instances
+    ]
+
+    update_feeds_data_from_source_task.run(feed_instance_ids)
+
+    assert process_feed_data_from_source_mock.call_count == 2
+    assert Feed.objects.with_free_fetch_lease().count() == 2
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_feeds_of_different_users_with_the_same_url__should_schedule_the_url_once(
+    update_feeds_data_from_source_task_mock, user: User, random_url: str
+):
+    user_2, user_3 = baker.make(User, _quantity=2)
+    unfollowed_feed_instance = baker.make(
+        Feed, url=random_url, is_followed=False, user=user
+    )
+    leader_feed_instance = baker.make(Feed, url=random_url, user=user_2)
+    baker.make(Feed, url=random_url, user=user_3)
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    assert get_scheduled_feed_ids(update_feeds_data_from_source_task_mock) == [
+        leader_feed_instance.id
+    ]
+    assert unfollowed_feed_instance.id < leader_feed_instance.id
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_feeds_with_different_next_fetch_times__should_schedule_only_due_feeds(
+    update_feeds_data_from_source_task_mock, user: User
+):
+    now = timezone.now()
+    never_fetched_feed_instance = baker.make(Feed, user=user)
+    due_feed_instance = baker.make(
+        Feed, next_fetch_at=now - datetime.timedelta(minutes=1), user=user
+    )
+    baker.make(Feed, next_fetch_at=now + datetime.timedelta(hours=1), user=user)
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    assert get_scheduled_feed_ids(update_feeds_data_from_source_task_mock) == [
+        never_fetched_feed_instance.id,
+        due_feed_instance.id,
+    ]
+
+
 @mock.patch(
     "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
 )
@@ -96,12 +353,18 @@ def test__update_feed_data_from_source_task__given_non_valid_feed_parsing__shoul
     with pytest.raises(Retry):
         update_feed_data_from_source_task.run(feed_instance.id)
 
+    feed_instance.refresh_from_db()
     assert feed_instance.auto_update_is_active
+    assert feed_instance.consecutive_fetch_failures == 1
+    assert feed_instance.next_fetch_at > timezone.now()
     assert process_feed_data_from_source_mock.call_count == 1
     assert update_feed_data_from_source_task_retry_mock.call_count == 1
 
     process_feed_data_from_source_mock.side_effect = valid_parsed_feed_content
-    update_feed_data_from_source_task.run(feed_instance.id)
+    update_feed_data_from_source_task.run(
+        feed_instance.id,
+        **update_feed_data_from_source_task_retry_mock.call_args.kwargs["kwargs"],
+    )
     assert process_feed_data_from_source_mock.call_count == 2
     assert update_feed_data_from_source_task_retry_mock.call_count == 1
 
@@ -117,9 +380,7 @@ def test__update_feed_data_from_source_task__given_exceeding_max_task_retries__s
     notify_feed_creator_with_stalled_feed_mock,
     feed_instance: Feed,
 ):
-    process_feed_data_from_source_mock.side_effect = FeedIsGoneError(
-        FeedParsingErrorCodes.IS_GONE.value, ""
-    )
+    process_feed_data_from_source_mock.side_effect = FeedNotAvailableError(None, "")
     update_feed_data_from_source_task_retry_mock.side_effect = MaxRetriesExceededError()
 
     update_feed_data_from_source_task.run(feed_instance.id)
@@ -128,3 +389,379 @@ def test__update_feed_data_from_source_task__given_exceeding_max_task_retries__s
     update_feed_data_from_source_task_retry_mock.assert_called()
     notify_feed_creator_with_stalled_feed_mock.assert_called()
     assert feed_instance.auto_update_is_active is False
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.retry")
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+def test__update_feed_data_from_source_task__given_download_limit_exceeded__should_back_off_without_retrial(
+    process_feed_data_from_source_mock,
+    update_feed_data_from_source_task_retry_mock,
+    feed_instance: Feed,
+):
+    process_feed_data_from_source_mock.side_effect = FeedDownloadLimitExceededError(
+        None, "Feed download timed out."
+    )
+
+    update_feed_data_from_source_task.run(feed_instance.id)
+
+    feed_instance.refresh_from_db()
+    assert feed_instance.auto_update_is_active
+    assert feed_instance.consecutive_fetch_failures == 1
+    assert feed_instance.next_fetch_at > timezone.now()
+    update_feed_data_from_source_task_retry_mock.assert_not_called()
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+@mock.patch("rss_scraper.feeds.tasks.fetch_feeds")
+def test__update_feeds_data_from_source_task__given_download_limit_exceeded__should_back_off_without_retrial(
+    fetch_feeds_mock, update_feed_data_from_source_task_mock, feed_instance: Feed
+):
+    fetch_feeds_mock.return_value = [
+        FeedDownloadLimitExceededError(None, "Feed content is too large.")
+    ]
+
+    update_feeds_data_from_source_task.run([feed_instance.id])
+
+    feed_instance.refresh_from_db()
+    assert feed_instance.consecutive_fetch_failures == 1
+    update_feed_data_from_source_task_mock.assert_not_called()
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.retry")
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+def test__update_feed_data_from_source_task__given_consecutive_failures__should_retry_with_growing_saved_countdown(
+    process_feed_data_from_source_mock,
+    update_feed_data_from_source_task_retry_mock,
+    feed_instance: Feed,
+    settings,
+):
+    settings.FEED_UPDATE_TASK_RETRY_DELAY_IN_SECONDS = 10
+    settings.FEED_UPDATE_TASK_MAX_RETRY_DELAY_IN_SECONDS = 60 * 60
+    process_feed_data_from_source_mock.side_effect = FeedNotAvailableError(None, "")
+    update_feed_data_from_source_task_retry_mock.side_effect = Retry()
+    feed_instance.consecutive_fetch_failures = 4
+    feed_instance.save()
+
+    with pytest.raises(Retry):
+        update_feed_data_from_source_task.run(feed_instance.id)
+
+    retry_countdown = update_feed_data_from_source_task_retry_mock.call_args.kwargs[
+        "countdown"
+    ]
+    feed_instance.refresh_from_db()
+    assert 80 <= retry_countdown <= 160
+    assert feed_instance.consecutive_fetch_failures == 5
+    assert feed_instance.next_fetch_at <= timezone.now() + datetime.timedelta(
+        seconds=retry_countdown
+    )
+    assert feed_instance.next_fetch_at > timezone.now() + datetime.timedelta(
+        seconds=retry_countdown - 5
+    )
+
+
+@mock.patch("rss_scraper.feeds.tasks.notify_feed_creator_with_stalled_feed")
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.retry")
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+def test__update_feed_data_from_source_task__given_gone_feed__should_deactivate_it_without_retrial(
+    process_feed_data_from_source_mock,
+    update_feed_data_from_source_task_retry_mock,
+    notify_feed_creator_with_stalled_feed_mock,
+    feed_instance: Feed,
+):
+    process_feed_data_from_source_mock.side_effect = FeedIsGoneError(
+        FeedParsingErrorCodes.IS_GONE.value, ""
+    )
+
+    update_feed_data_from_source_task.run(feed_instance.id)
+
+    feed_instance.refresh_from_db()
+    assert feed_instance.auto_update_is_active is False
+    notify_feed_creator_with_stalled_feed_mock.assert_called_once()
+    update_feed_data_from_source_task_retry_mock.assert_not_called()
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.retry")
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+def test__update_feed_data_from_source_task__given_permanently_redirected_feed__should_move_and_refetch_it_once(
+    process_feed_data_from_source_mock,
+    update_feed_data_from_source_task_retry_mock,
+    update_feed_data_from_source_task_delay_mock,
+    feed_instance: Feed,
+    random_url: str,
+    django_capture_on_commit_callbacks,
+):
+    process_feed_data_from_source_mock.side_effect = FeedUrlChangedError(
+        FeedParsingErrorCodes.URL_CHANGED.value, "", href=random_url
+    )
+    update_feed_data_from_source_task_retry_mock.side_effect = Retry()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        update_feed_data_from_source_task.run(feed_instance.id)
+
+    feed_instance.refresh_from_db()
+    assert feed_instance.url == random_url
+    update_feed_data_from_source_task_retry_mock.assert_not_called()
+    update_feed_data_from_source_task_delay_mock.assert_called_once_with(
+        feed_instance.id,
+        is_redirect_refetch=True,
+        share_with_subscribers=False,
+        fetch_lease_token=mock.ANY,
+    )
+
+    with pytest.raises(Retry):
+        update_feed_data_from_source_task.run(
+            *update_feed_data_from_source_task_delay_mock.call_args.args,
+            **update_feed_data_from_source_task_delay_mock.call_args.kwargs,
+        )
+
+    update_feed_data_from_source_task_delay_mock.assert_called_once()
+
+
+@mock.patch("rss_scraper.feeds.tasks.notify_feed_creator_with_stalled_feed")
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+@mock.patch("rss_scraper.feeds.tasks.fetch_feeds")
+def test__update_feeds_data_from_source_task__given_gone_feed__should_deactivate_it_without_retrial(
+    fetch_feeds_mock,
+    process_feed_data_from_source_mock,
+    update_feed_data_from_source_task_mock,
+    _notify_feed_creator_with_stalled_feed_mock,
+    feed_instance: Feed,
+):
+    fetch_feeds_mock.return_value = [mock.Mock()]
+    process_feed_data_from_source_mock.side_effect = FeedIsGoneError(
+        FeedParsingErrorCodes.IS_GONE.value, ""
+    )
+
+    update_feeds_data_from_source_task.run([feed_instance.id])
+
+    feed_instance.refresh_from_db()
+    assert feed_instance.auto_update_is_active is False
+    update_feed_data_from_source_task_mock.assert_not_called()
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_pipeline_mode__should_not_schedule_batch_tasks(
+    update_feeds_data_from_source_task_mock, feed_instance: Feed, settings
+):
+    settings.FEED_UPDATE_PIPELINE_MODE = True
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    update_feeds_data_from_source_task_mock.assert_not_called()
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_work_queue_mode__should_not_schedule_batch_tasks(
+    update_feeds_data_from_source_task_mock, feed_instance: Feed, settings
+):
+    settings.FEED_UPDATE_WORK_QUEUE_MODE = True
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    update_feeds_data_from_source_task_mock.assert_not_called()
+
+
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source",
+    autospec=True,
+)
+@mock.patch("rss_scraper.feeds.tasks.fetch_feeds")
+def test__update_next_due_feeds__given_due_feeds__should_update_a_batch_and_release_its_leases(
+    fetch_feeds_mock, process_feed_data_from_source_mock, user: User
+):
+    fetch_feeds_mock.side_effect = lambda feed_instances: [
+        mock.Mock() for _ in feed_instances
+    ]
+
+    def process_feed_data_from_source(feed_reader_service, *args, **kwargs):
+        feed_reader_service.schedule_next_fetch(FeedFetchResult.UPDATED)
+
+    process_feed_data_from_source_mock.side_effect = process_feed_data_from_source
+    baker.make(Feed, user=user, _quantity=3)
+    baker.make(
+        Feed,
+        user=user,
+        next_fetch_at=timezone.now() + datetime.timedelta(hours=1),
+    )
+
+    assert update_next_due_feeds(batch_size=2) == 2
+    assert update_next_due_feeds(batch_size=2) == 1
+    assert update_next_due_feeds(batch_size=2) == 0
+
+    assert process_feed_data_from_source_mock.call_count == 3
+    assert not Feed.objects.filter(fetch_lease_expires_at__isnull=False).exists()
+
+
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+def test__update_feed_data_from_source_task__given_feed_leased_by_another_update__should_drop_this_update(
+    process_feed_data_from_source_mock, feed_instance: Feed
+):
+    Feed.objects.filter(id=feed_instance.id).claim_fetch_lease("other-update")
+
+    update_feed_data_from_source_task.run(feed_instance.id)
+
+    process_feed_data_from_source_mock.assert_not_called()
+
+    update_feed_data_from_source_task.run(
+        feed_instance.id, fetch_lease_token="other-update"
+    )
+
+    process_feed_data_from_source_mock.assert_called_once()
+    feed_instance.refresh_from_db()
+    assert feed_instance.fetch_lease_expires_at is None
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__periodic_task__given_feeds_already_queued__should_not_queue_them_again(
+    update_feeds_data_from_source_task_mock,
+    update_feed_data_from_source_task_mock,
+    user: User,
+    django_capture_on_commit_callbacks,
+):
+    forced_feed_instance, due_feed_instance = baker.make(Feed, user=user, _quantity=2)
+    with django_capture_on_commit_callbacks(execute=True):
+        queue_feed_update(forced_feed_instance.id)
+
+    schedule_update_for_followed_feeds_periodic_task.run()
+    schedule_update_for_followed_feeds_periodic_task.run()
+
+    update_feed_data_from_source_task_mock.assert_called_once()
+    assert get_scheduled_feed_ids(update_feeds_data_from_source_task_mock) == [
+        due_feed_instance.id
+    ]
+
+
+@mock.patch("rss_scraper.feeds.tasks.fetch_feeds", return_value=[])
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.apply_async")
+@mock.patch("rss_scraper.feeds.tasks.update_feeds_data_from_source_task.apply_async")
+def test__queue_feed_update__given_interactive_update_of_scheduled_feed__should_take_over_the_batch_lease(
+    update_feeds_data_from_source_task_mock,
+    update_feed_data_from_source_task_mock,
+    fetch_feeds_mock,
+    feed_instance: Feed,
+    django_capture_on_commit_callbacks,
+):
+    schedule_update_for_followed_feeds_periodic_task.run()
+    (
+        batch_feed_ids,
+    ), batch_kwargs = update_feeds_data_from_source_task_mock.call_args.args
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert queue_feed_update(feed_instance.id) is False
+        assert queue_feed_update(feed_instance.id, interactive=True) is True
+        # The interactive update is pending as well, a repeated request coalesces into it.
+        assert queue_feed_update(feed_instance.id, interactive=True) is False
+    update_feed_data_from_source_task_mock.assert_called_once()
+
+    update_feeds_data_from_source_task.run(batch_feed_ids, **batch_kwargs)
+
+    fetch_feeds_mock.assert_called_once_with([])
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.apply_async")
+def test__queue_feed_update__given_interactive_update_of_running_feed__should_coalesce_into_it(
+    update_feed_data_from_source_task_mock, feed_instance: Feed
+):
+    Feed.objects.filter(id=feed_instance.id).claim_fetch_lease("running-update")
+
+    assert queue_feed_update(feed_instance.id, interactive=True) is False
+
+    update_feed_data_from_source_task_mock.assert_not_called()
+
+
+@mock.patch(
+    "rss_scraper.feeds.tasks.update_feed_data_from_source_task.apply_async",
+    side_effect=lambda args, kwargs, **options: update_feed_data_from_source_task.run(
+        *args, **kwargs
+    ),
+)
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+def test__queue_feed_update__given_interactive_update__should_route_it_to_its_queue_and_emit_its_latency(
+    process_feed_data_from_source_mock,
+    update_feed_data_from_source_task_mock,
+    feed_instance: Feed,
+    caplog,
+    django_capture_on_commit_callbacks,
+):
+    process_feed_data_from_source_mock.side_effect = lambda **kwargs: baker.make(
+        Item, feed=feed_instance
+    )
+    caplog.set_level("INFO", logger="rss_scraper.feeds.metrics")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert queue_feed_update(feed_instance.id, interactive=True) is True
+
+    assert update_feed_data_from_source_task_mock.call_args.kwargs == {
+        "queue": "feeds-interactive"
+    }
+    process_feed_data_from_source_mock.assert_called_once()
+    metric_records = [
+        record
+        for record in caplog.records
+        if record.name == "rss_scraper.feeds.metrics"
+    ]
+    assert [record.metric for record in metric_records] == [
+        "feeds.update.queue_wait_seconds",
+        "feeds.update.enqueue_to_first_item_seconds",
+    ]
+    assert all(
+        record.tags == {"feed_id": feed_instance.id} for record in metric_records
+    )
+
+
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+def test__update_feed_data_from_source_task__given_requested_update_of_feed_with_items__should_skip_first_item_latency(
+    process_feed_data_from_source_mock, feed_instance: Feed, caplog
+):
+    baker.make(Item, feed=feed_instance)
+    caplog.set_level("INFO", logger="rss_scraper.feeds.metrics")
+
+    update_feed_data_from_source_task.run(feed_instance.id, enqueued_at=time.time())
+
+    assert [
+        record.metric
+        for record in caplog.records
+        if record.name == "rss_scraper.feeds.metrics"
+    ] == ["feeds.update.queue_wait_seconds"]
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.retry")
+@mock.patch(
+    "rss_scraper.feeds.services.FeedReaderService.process_feed_data_from_source"
+)
+def test__update_feed_data_from_source_task__given_failed_requested_update__should_retry_it_without_its_enqueue_time(
+    process_feed_data_from_source_mock,
+    update_feed_data_from_source_task_retry_mock,
+    feed_instance: Feed,
+):
+    process_feed_data_from_source_mock.side_effect = FeedNotAvailableError(
+        FeedParsingErrorCodes.IS_GONE.value, ""
+    )
+    update_feed_data_from_source_task_retry_mock.side_effect = Retry()
+
+    with pytest.raises(Retry):
+        update_feed_data_from_source_task.run(feed_instance.id, enqueued_at=time.time())
+
+    assert (
+        "enqueued_at"
+        not in update_feed_data_from_source_task_retry_mock.call_args.kwargs["kwargs"]
+    )
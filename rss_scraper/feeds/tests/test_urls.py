@@ -94,3 +94,12 @@ class TestItemViewSetUrls:
         expected_url = f"/api/v1/items/?status={ItemStatus.READ.value}&feed={feed_id}"
 
         assert reversed_url == expected_url
+
+
+class TestWebSubCallbackViewSetUrls:
+    def test__websub_callback_api_v1_url__with_feed_pk__should_be_valid_url(self):
+        pk = 1
+        reversed_url = reverse("api:websub-callback", kwargs={"pk": pk})
+        expected_url = f"/api/v1/websub/{pk}/callback/"
+
+        assert reversed_url == expected_url
@@ -3,15 +3,17 @@ import time
 
 import pytest
 import pytz
-from django.conf import settings
 from django.core import mail
 from django.utils.translation import gettext_lazy as _
+from model_bakery import baker
 
 from rss_scraper.feeds.models import Feed
 from rss_scraper.feeds.utils import (
     get_datetime_from_struct_time,
+    iterate_fair_ids_in_chunks,
     notify_feed_creator_with_stalled_feed,
 )
+from rss_scraper.users.models import User
 
 pytestmark = pytest.mark.django_db
 
@@ -22,7 +24,7 @@ def test__get_datetime_from_struct_time__given_time_struct__should_have_valid_da
     returned_datetime = get_datetime_from_struct_time(time_struct)
 
     assert type(returned_datetime) is datetime.datetime
-    assert returned_datetime.tzinfo == pytz.timezone(settings.TIME_ZONE)
+    assert returned_datetime.tzinfo == pytz.utc
     assert returned_datetime.year == time_struct.tm_year
 
 
@@ -42,3 +44,22 @@ def test__notify_feed_creator_with_stalled_feed__with_valid_feed_instance__shoul
         "[RSS Scraper] Sorry, One of your registered feeds has been stalled!"
     )
     assert mail.outbox[0].recipients() == [feed_instance.user.email]
+
+
+def test__iterate_fair_ids_in_chunks__given_users_feeds__should_return_them_round_robin_within_budget(
+    user: User,
+):
+    user_2 = baker.make(User)
+    heavy_user_feed_ids = [
+        feed_instance.id for feed_instance in baker.make(Feed, user=user, _quantity=4)
+    ]
+    user_2_feed_id = baker.make(Feed, user=user_2).id
+
+    ids_chunks = list(
+        iterate_fair_ids_in_chunks(Feed.objects.all(), chunk_size=2, budget_per_user=2)
+    )
+
+    assert ids_chunks == [
+        [heavy_user_feed_ids[0], user_2_feed_id],
+        [heavy_user_feed_ids[1]],
+    ]
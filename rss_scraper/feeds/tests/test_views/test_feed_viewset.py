@@ -1,15 +1,21 @@
+import datetime
 from unittest import mock
 from unittest.mock import ANY
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from model_bakery import baker
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from config.settings.base import REST_FRAMEWORK
 from rss_scraper.feeds.api.serializers import FeedModelSerializer
+from rss_scraper.feeds.enums import FeedFetchResult
 from rss_scraper.feeds.models import Feed, Item
+from rss_scraper.feeds.services import FeedReaderService
 from rss_scraper.users.models import User
 
 pytestmark = pytest.mark.django_db
@@ -55,6 +61,94 @@ def test__list_api__with_feeds_for_different_users__should_return_feeds_of_authe
     assert len(response.json()["results"]) == user_1_feeds_count
 
 
+def test__list_api__with_repeated_requests__should_serve_cached_response_till_user_data_changes(
+    api_client: APIClient, user: User, django_capture_on_commit_callbacks
+):
+    feed_instance = baker.make(Feed, user=user)
+    api_client.force_login(user)
+    api_client.get(reverse("api:feed-list"))
+
+    with CaptureQueriesContext(connection) as captured_queries:
+        response = api_client.get(reverse("api:feed-list"))
+
+    assert [feed["id"] for feed in response.json()["results"]] == [feed_instance.id]
+    assert not any("feeds_feed" in query["sql"] for query in captured_queries)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new_feed_instance = baker.make(Feed, user=user)
+
+    response = api_client.get(reverse("api:feed-list"))
+
+    assert {feed["id"] for feed in response.json()["results"]} == {
+        feed_instance.id,
+        new_feed_instance.id,
+    }
+
+
+def test__retrieve_by_id_api__with_feed_items_updated_by_the_source__should_invalidate_cached_response(
+    api_client: APIClient, user: User, django_capture_on_commit_callbacks
+):
+    feed_instance = baker.make(Feed, user=user, title="old title")
+    api_client.force_login(user)
+    feed_detail_url = reverse("api:feed-detail", kwargs={"pk": feed_instance.id})
+    api_client.get(feed_detail_url)
+    Feed.objects.filter(id=feed_instance.id).update(title="new title")
+
+    assert api_client.get(feed_detail_url).json()["title"] == "old title"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        FeedReaderService(feed_instance).update_feed_items([])
+
+    assert api_client.get(feed_detail_url).json()["title"] == "new title"
+
+
+def test__retrieve_by_id_api__with_feed_fetch_bookkeeping_saves__should_keep_serving_cached_response(
+    api_client: APIClient, user: User, django_capture_on_commit_callbacks
+):
+    feed_instance = baker.make(Feed, user=user)
+    api_client.force_login(user)
+    feed_detail_url = reverse("api:feed-detail", kwargs={"pk": feed_instance.id})
+    api_client.get(feed_detail_url)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        FeedReaderService(feed_instance).schedule_next_fetch(
+            FeedFetchResult.NOT_MODIFIED
+        )
+
+    with CaptureQueriesContext(connection) as captured_queries:
+        api_client.get(feed_detail_url)
+
+    assert not any("feeds_feed" in query["sql"] for query in captured_queries)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        feed_instance.unfollow()
+
+    assert api_client.get(feed_detail_url).json()["is_followed"] is False
+
+
+def test__retrieve_by_id_api__with_feed_item_saved__should_invalidate_cached_response_without_loading_the_feed(
+    api_client: APIClient, item_instance: Item, django_capture_on_commit_callbacks
+):
+    feed_instance = item_instance.feed
+    api_client.force_login(feed_instance.user)
+    feed_detail_url = reverse("api:feed-detail", kwargs={"pk": feed_instance.id})
+    api_client.get(feed_detail_url)
+    Feed.objects.filter(id=feed_instance.id).update(title="new title")
+    item_instance = Item.objects.get(id=item_instance.id)
+
+    with django_capture_on_commit_callbacks(execute=True), CaptureQueriesContext(
+        connection
+    ) as captured_queries:
+        item_instance.mark_as_read()
+
+    feed_queries = [
+        query["sql"] for query in captured_queries if "feeds_feed" in query["sql"]
+    ]
+    assert len(feed_queries) == 1
+    assert '"feeds_feed"."title"' not in feed_queries[0]
+    assert api_client.get(feed_detail_url).json()["title"] == "new title"
+
+
 def test__retrieve_by_id_api__with_anonymous_user__should_return_403(
     api_client: APIClient,
 ):
@@ -101,17 +195,23 @@ def test__create_api__with_anonymous_user__should_return_403(api_client: APIClie
     assert response.json()["detail"] == "Authentication credentials were not provided."
 
 
-@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.apply_async")
 def test__create_api__with_authenticated_user_and_valid_url__should_return_201(
     update_feed_data_from_source_task_mock,
     api_client: APIClient,
     user: User,
     random_url: str,
+    django_capture_on_commit_callbacks,
 ):
     api_client.force_login(user)
 
-    response = api_client.post(reverse("api:feed-list"), data={"url": random_url})
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = api_client.post(reverse("api:feed-list"), data={"url": random_url})
 
+    # The update is published once the new feed is committed, so the worker can claim it.
+    update_feed_data_from_source_task_mock.assert_not_called()
+    for callback in callbacks:
+        callback()
     assert response.status_code == status.HTTP_201_CREATED
     assert response.json() == {
         "url": random_url,
@@ -125,7 +225,11 @@ def test__create_api__with_authenticated_user_and_valid_url__should_return_201(
         "updated_at": ANY,
         "created_at": ANY,
     }
-    update_feed_data_from_source_task_mock.assert_called_with(response.json()["id"])
+    update_feed_data_from_source_task_mock.assert_called_with(
+        (response.json()["id"],),
+        {"fetch_lease_token": ANY, "enqueued_at": ANY},
+        queue="feeds-interactive",
+    )
 
 
 def test__create_api__with_authenticated_user_and_not_valid_url__should_return_url_not_valid(
@@ -290,20 +394,28 @@ def test__force_update_api__with_authenticated_user_and_not_owned_feed__should_r
     assert response.json()["detail"] == "Not found."
 
 
-@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.delay")
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.apply_async")
 def test__force_update_api__with_authenticated_user_and_not_auto_update_feed__should_return_200(
-    update_feed_data_from_source_task_mock, api_client: APIClient, user: User
+    update_feed_data_from_source_task_mock,
+    api_client: APIClient,
+    user: User,
+    django_capture_on_commit_callbacks,
 ):
     feed_instance = baker.make(Feed, auto_update_is_active=False, user=user)
     api_client.force_login(user)
 
-    response = api_client.put(
-        reverse("api:feed-force-update", kwargs={"pk": feed_instance.id})
-    )
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.put(
+            reverse("api:feed-force-update", kwargs={"pk": feed_instance.id})
+        )
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["auto_update_is_active"] is True
-    update_feed_data_from_source_task_mock.assert_called_with(feed_instance.id)
+    update_feed_data_from_source_task_mock.assert_called_with(
+        (feed_instance.id,),
+        {"fetch_lease_token": ANY, "enqueued_at": ANY},
+        queue="feeds-interactive",
+    )
 
 
 def test__feed_items_api__with_anonymous_user__should_return_403(api_client: APIClient):
@@ -343,6 +455,49 @@ def test__feed_items_api__with_authenticated_user_and_owned_feed__should_return_
     assert len(response.json()["results"]) == REST_FRAMEWORK["PAGE_SIZE"]
 
 
+def test__feed_items_api__with_cursor_pagination__should_return_next_page_of_the_feed_items(
+    api_client: APIClient, user: User
+):
+    feed_instance = baker.make(Feed, user=user)
+    item_ids = sorted(
+        (item.id for item in baker.make(Item, feed=feed_instance, _quantity=3)),
+        reverse=True,
+    )
+    baker.make(Item, feed=baker.make(Feed, user=user))
+    api_client.force_login(user)
+
+    response = api_client.get(
+        reverse("api:feed-items", kwargs={"pk": feed_instance.id}) + "?cursor=&limit=2"
+    )
+    next_response = api_client.get(response.json()["next"])
+
+    assert [item["id"] for item in response.json()["results"]] == item_ids[:2]
+    assert [item["id"] for item in next_response.json()["results"]] == item_ids[2:]
+    assert next_response.json()["next"] is None
+
+
+def test__feed_items_api__with_if_modified_since_after_last_update__should_return_304(
+    api_client: APIClient, item_instance: Item
+):
+    api_client.force_login(item_instance.feed.user)
+    feed_items_url = reverse("api:feed-items", kwargs={"pk": item_instance.feed.id})
+    response = api_client.get(feed_items_url)
+
+    not_modified_response = api_client.get(
+        feed_items_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+    )
+    new_item_response = api_client.get(
+        feed_items_url,
+        HTTP_IF_MODIFIED_SINCE=http_date(
+            (item_instance.updated_at - datetime.timedelta(minutes=1)).timestamp()
+        ),
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert not_modified_response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert new_item_response.status_code == status.HTTP_200_OK
+
+
 def test__feed_items_api__with_items_for_different_users__should_return_items_of_authenticated_user(
     api_client: APIClient, user: User
 ):
@@ -368,3 +523,61 @@ def test__feed_items_api__with_items_for_different_users__should_return_items_of
     # Assert
     assert response.status_code == status.HTTP_200_OK
     assert len(response.json()["results"]) == user_1_items_of_feed_2_count
+
+
+@mock.patch("rss_scraper.feeds.tasks.update_feed_data_from_source_task.apply_async")
+def test__force_update_api__with_update_already_queued__should_not_queue_it_again(
+    update_feed_data_from_source_task_mock,
+    api_client: APIClient,
+    user: User,
+    django_capture_on_commit_callbacks,
+):
+    feed_instance = baker.make(Feed, user=user)
+    api_client.force_login(user)
+
+    for _ in range(3):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.put(
+                reverse("api:feed-force-update", kwargs={"pk": feed_instance.id})
+            )
+        assert response.status_code == status.HTTP_200_OK
+
+    update_feed_data_from_source_task_mock.assert_called_once()
+
+
+def test__feed_items_api__with_sparse_exclude__should_return_and_read_only_the_other_fields(
+    api_client: APIClient, user: User
+):
+    feed_instance = baker.make(Feed, user=user)
+    baker.make(Item, feed=feed_instance, _quantity=2)
+    api_client.force_login(user)
+    url = (
+        reverse("api:feed-items", kwargs={"pk": feed_instance.id})
+        + "?cursor=&exclude=description"
+    )
+
+    with CaptureQueriesContext(connection) as captured_queries:
+        response = api_client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["results"]) == 2
+    assert all(
+        "description" not in item and "title" in item and "feed" not in item
+        for item in response.json()["results"]
+    )
+    assert not any(
+        '"feeds_item"."description"' in query["sql"] for query in captured_queries
+    )
+    # The feed foreign key isn't deferred, the items don't load it one by one.
+    assert any(
+        '"feeds_item"."feed_id"' in query["sql"].split(" FROM ")[0]
+        and "LIMIT" in query["sql"]
+        for query in captured_queries
+    )
+
+    baker.make(Item, feed=feed_instance, _quantity=3)
+
+    with CaptureQueriesContext(connection) as more_items_captured_queries:
+        api_client.get(url)
+
+    assert len(more_items_captured_queries) == len(captured_queries)
@@ -1,4 +1,10 @@
+import datetime
+import time
+from unittest import mock
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from model_bakery import baker
@@ -6,7 +12,10 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from config.settings.base import REST_FRAMEWORK
-from rss_scraper.feeds.api.serializers import ItemDynamicFieldsModelSerializer
+from rss_scraper.feeds.api.serializers import (
+    FeedModelSerializer,
+    ItemDynamicFieldsModelSerializer,
+)
 from rss_scraper.feeds.enums import ItemStatus
 from rss_scraper.feeds.models import Feed, Item
 from rss_scraper.users.models import User
@@ -246,3 +255,207 @@ def test__list_items_api__with_filter_on_unread_status_per_a_feed__should_return
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["results"][0]["id"] == last_updated_item.id
+
+
+def test__list_items_api__with_cursor_pagination__should_walk_all_items_newest_first_without_count(
+    api_client: APIClient, user: User
+):
+    feed_instance = baker.make(Feed, user=user)
+    now = timezone.now()
+    undated_items = baker.make(Item, feed=feed_instance, published_at=None, _quantity=2)
+    same_date_items = baker.make(
+        Item, feed=feed_instance, published_at=now, _quantity=2
+    )
+    older_item = baker.make(
+        Item, feed=feed_instance, published_at=now - datetime.timedelta(days=1)
+    )
+    expected_item_ids = [
+        *sorted((item.id for item in undated_items), reverse=True),
+        *sorted((item.id for item in same_date_items), reverse=True),
+        older_item.id,
+    ]
+    api_client.force_login(user)
+    page_url = reverse("api:item-list") + "?cursor=&limit=2"
+    pages = []
+
+    while page_url:
+        with CaptureQueriesContext(connection) as captured_queries:
+            response = api_client.get(page_url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.json()
+        # Neither the page nor the conditional response validators aggregate the items.
+        assert not any(
+            "COUNT(" in query["sql"] or "MAX(" in query["sql"]
+            for query in captured_queries
+        )
+        pages.append(response.json())
+        page_url = response.json()["next"]
+
+    assert [item["id"] for page in pages for item in page["results"]] == (
+        expected_item_ids
+    )
+    assert pages[0]["previous"] is None
+
+    response = api_client.get(pages[-1]["previous"])
+
+    assert [item["id"] for item in response.json()["results"]] == expected_item_ids[2:4]
+
+
+def test__list_items_api__with_invalid_cursor__should_return_404(
+    api_client: APIClient, user: User
+):
+    api_client.force_login(user)
+
+    response = api_client.get(reverse("api:item-list") + "?cursor=invalid")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == "Invalid cursor."
+
+
+def test__list_items_api__with_matching_if_none_match__should_return_304_till_items_change(
+    api_client: APIClient, item_instance: Item, django_capture_on_commit_callbacks
+):
+    api_client.force_login(item_instance.feed.user)
+    response = api_client.get(reverse("api:item-list"))
+
+    not_modified_response = api_client.get(
+        reverse("api:item-list"), HTTP_IF_NONE_MATCH=response["ETag"]
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert not_modified_response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert not not_modified_response.content
+
+    with django_capture_on_commit_callbacks(execute=True):
+        item_instance.mark_as_read()
+
+    modified_response = api_client.get(
+        reverse("api:item-list"), HTTP_IF_NONE_MATCH=response["ETag"]
+    )
+
+    assert modified_response.status_code == status.HTTP_200_OK
+    assert modified_response["ETag"] != response["ETag"]
+
+
+def test__list_items_api__with_if_modified_since_of_last_response__should_return_304_till_items_change(
+    api_client: APIClient, item_instance: Item, django_capture_on_commit_callbacks
+):
+    api_client.force_login(item_instance.feed.user)
+    response = api_client.get(reverse("api:item-list"))
+
+    not_modified_response = api_client.get(
+        reverse("api:item-list"), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert not_modified_response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    with mock.patch(
+        "rss_scraper.feeds.caching.time.time", return_value=time.time() + 60
+    ), django_capture_on_commit_callbacks(execute=True):
+        item_instance.mark_as_read()
+
+    modified_response = api_client.get(
+        reverse("api:item-list"), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+    )
+
+    assert modified_response.status_code == status.HTTP_200_OK
+    assert modified_response["Last-Modified"] != response["Last-Modified"]
+
+
+def test__list_items_api__with_compact_mode__should_return_feed_ids_and_sideload_each_feed_once(
+    api_client: APIClient, user: User, items_for_different_feed_instances
+):
+    feed_instance_1, feed_instance_2 = items_for_different_feed_instances
+    api_client.force_login(user)
+
+    with CaptureQueriesContext(connection) as captured_queries:
+        response = api_client.get(reverse("api:item-list") + "?compact=true&limit=100")
+
+    assert response.status_code == status.HTTP_200_OK
+    # The feeds aren't joined to the items rows, they are read once for the sideload.
+    selected_columns = [query["sql"].split(" FROM ")[0] for query in captured_queries]
+    assert not any(
+        '"feeds_item"."title"' in columns and '"feeds_feed"."title"' in columns
+        for columns in selected_columns
+    )
+    assert (
+        len(
+            [
+                columns
+                for columns in selected_columns
+                if '"feeds_feed"."title"' in columns
+            ]
+        )
+        == 1
+    )
+    assert len(response.json()["results"]) == Item.objects.count()
+    assert all("feed" not in item for item in response.json()["results"])
+    assert {item["feed_id"] for item in response.json()["results"]} == {
+        feed_instance_1.id,
+        feed_instance_2.id,
+    }
+    assert response.json()["feeds"] == {
+        str(feed_instance.id): FeedModelSerializer(feed_instance).data
+        for feed_instance in (feed_instance_1, feed_instance_2)
+    }
+
+
+def test__list_items_api__with_compact_mode_without_feed_ids__should_not_sideload_the_feeds(
+    api_client: APIClient, user: User, items_for_different_feed_instances
+):
+    api_client.force_login(user)
+
+    with CaptureQueriesContext(connection) as captured_queries:
+        response = api_client.get(
+            reverse("api:item-list") + "?compact=true&fields=id,title"
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "feeds" not in response.json()
+    assert not any('"feeds_feed"."title"' in query["sql"] for query in captured_queries)
+
+
+def test__list_items_api__with_sparse_fields__should_return_and_read_only_the_requested_fields(
+    api_client: APIClient, user: User
+):
+    baker.make(Item, feed__user=user, _quantity=2)
+    api_client.force_login(user)
+
+    with CaptureQueriesContext(connection) as captured_queries:
+        response = api_client.get(reverse("api:item-list") + "?fields=id,title")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert all(set(item) == {"id", "title"} for item in response.json()["results"])
+    assert not any(
+        '"feeds_item"."description"' in query["sql"] for query in captured_queries
+    )
+
+
+def test__retrieve_item_by_id_api__with_sparse_exclude__should_not_return_the_excluded_fields(
+    api_client: APIClient, user: User
+):
+    item_instance = baker.make(Item, feed__user=user)
+    api_client.force_login(user)
+
+    response = api_client.get(
+        reverse("api:item-detail", kwargs={"pk": item_instance.id})
+        + "?exclude=description,feed"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "description" not in response.json()
+    assert "feed" not in response.json()
+    assert response.json()["id"] == item_instance.id
+
+
+def test__list_items_api__with_unknown_sparse_field__should_return_400(
+    api_client: APIClient, user: User
+):
+    api_client.force_login(user)
+
+    response = api_client.get(reverse("api:item-list") + "?fields=id,unknown")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "fields" in response.json()
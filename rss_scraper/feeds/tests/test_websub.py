@@ -0,0 +1,316 @@
+import datetime
+import hashlib
+import hmac
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from rss_scraper.feeds.fetchers import FeedFetchResponse, build_http_client
+from rss_scraper.feeds.models import Feed
+from rss_scraper.feeds.services import FeedReaderService
+from rss_scraper.feeds.tasks import (
+    subscribe_feed_to_websub_hub_task,
+    update_feed_data_from_source_task,
+)
+from rss_scraper.feeds.tests.mock_feed_parser_data import valid_feed_xml_content
+from rss_scraper.feeds.websub import get_websub_links, subscribe_to_websub_hub
+from rss_scraper.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+HUB_URL = "https://hub.example.com/"
+TOPIC_URL = "https://example.com/rss"
+websub_feed_xml_content = valid_feed_xml_content.replace(
+    b"<channel>",
+    b'<channel xmlns:atom="http://www.w3.org/2005/Atom">'
+    b'<atom:link rel="hub" href="https://hub.example.com/"/>'
+    b'<atom:link rel="self" href="https://example.com/rss"/>',
+)
+
+
+class LocalHub:
+    """
+    Stand-in of a WebSub hub, it records the subscription requests and verifies them against the callback url
+        then pushes the feed content signed with the subscription secret.
+    """
+
+    def __init__(self, api_client: APIClient):
+        self.api_client = api_client
+        self.subscriptions = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.subscriptions.append(
+            {key: value[0] for key, value in parse_qs(request.content.decode()).items()}
+        )
+        return httpx.Response(status.HTTP_202_ACCEPTED)
+
+    def verify(
+        self, subscription: dict, mode: str = "subscribe", lease_seconds: str = "3600"
+    ):
+        callback_url = urlsplit(subscription["hub.callback"])
+        return self.api_client.get(
+            callback_url.path,
+            {
+                **{
+                    key: value[0] for key, value in parse_qs(callback_url.query).items()
+                },
+                "hub.mode": mode,
+                "hub.topic": subscription["hub.topic"],
+                "hub.challenge": "challenge-token",
+                "hub.lease_seconds": lease_seconds,
+            },
+        )
+
+    def push(self, subscription: dict, content: bytes, secret: str = None):
+        signature = hmac.new(
+            (secret or subscription["hub.secret"]).encode(), content, hashlib.sha256
+        ).hexdigest()
+        return self.api_client.post(
+            self.get_callback_path(subscription),
+            content,
+            content_type="application/rss+xml",
+            HTTP_X_HUB_SIGNATURE=f"sha256={signature}",
+        )
+
+    @staticmethod
+    def get_callback_path(subscription: dict) -> str:
+        return httpx.URL(subscription["hub.callback"]).raw_path.decode()
+
+
+@pytest.fixture
+def local_hub(api_client: APIClient, settings) -> LocalHub:
+    settings.FEED_WEBSUB_CALLBACK_BASE_URL = "https://rss.example.com"
+    hub = LocalHub(api_client)
+
+    with mock.patch(
+        "rss_scraper.feeds.websub.get_http_client",
+        return_value=build_http_client(transport=httpx.MockTransport(hub.handler)),
+    ):
+        yield hub
+
+
+@pytest.fixture
+def websub_feed_instance(user: User) -> Feed:
+    feed_instance = baker.make(Feed, url=TOPIC_URL, user=user)
+    FeedReaderService(feed_instance).update_feed_instance(
+        {"links": [{"rel": "hub", "href": HUB_URL}, {"rel": "self", "href": TOPIC_URL}]}
+    )
+    return feed_instance
+
+
+def test__get_websub_links__given_parsed_feed_links__should_return_hub_and_self_urls():
+    feed_server_data = {
+        "links": [
+            {"rel": "alternate", "href": "https://example.com"},
+            {"rel": "hub", "href": HUB_URL},
+            {"rel": "self", "href": TOPIC_URL},
+        ]
+    }
+
+    assert get_websub_links(feed_server_data) == (HUB_URL, TOPIC_URL)
+    assert get_websub_links({}) == (None, None)
+
+
+def test__subscribe_to_websub_hub__given_feed_with_hub__should_send_signed_subscription_request(
+    local_hub: LocalHub, websub_feed_instance: Feed
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+
+    assert local_hub.subscriptions == [
+        {
+            "hub.mode": "subscribe",
+            "hub.topic": TOPIC_URL,
+            "hub.callback": "https://rss.example.com"
+            + reverse("api:websub-callback", kwargs={"pk": websub_feed_instance.id})
+            + f"?token={websub_feed_instance.websub_callback_token}",
+            "hub.secret": websub_feed_instance.websub_pending_secret,
+            "hub.lease_seconds": "864000",
+        }
+    ]
+
+
+def test__update_feed_task__given_feed_advertising_hub__should_subscribe_and_stop_polling_once_verified(
+    local_hub: LocalHub, user: User, django_capture_on_commit_callbacks
+):
+    feed_instance = baker.make(Feed, url=TOPIC_URL, user=user)
+
+    with mock.patch(
+        "rss_scraper.feeds.services.fetch_feed",
+        return_value=FeedFetchResponse(
+            status_code=status.HTTP_200_OK,
+            href=TOPIC_URL,
+            headers={"content-type": "application/rss+xml"},
+            content=websub_feed_xml_content,
+        ),
+    ), mock.patch(
+        "rss_scraper.feeds.tasks.subscribe_feed_to_websub_hub_task.delay",
+        side_effect=subscribe_feed_to_websub_hub_task,
+    ), django_capture_on_commit_callbacks(
+        execute=True
+    ):
+        update_feed_data_from_source_task(feed_instance.id)
+
+    response = local_hub.verify(local_hub.subscriptions[0])
+    feed_instance.refresh_from_db()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"challenge-token"
+    assert feed_instance.is_pushed
+    assert not Feed.objects.due_for_fetch().filter(id=feed_instance.id).exists()
+
+
+def test__websub_callback__given_intent_of_another_topic__should_return_404(
+    local_hub: LocalHub, websub_feed_instance: Feed
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+    subscription = local_hub.subscriptions[0]
+
+    response = local_hub.verify({**subscription, "hub.topic": "https://other.com/rss"})
+    websub_feed_instance.refresh_from_db()
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert not websub_feed_instance.is_pushed
+
+
+def test__websub_callback__given_intent_without_callback_token__should_return_404(
+    local_hub: LocalHub, websub_feed_instance: Feed
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+    subscription = local_hub.subscriptions[0]
+    callback_path = reverse(
+        "api:websub-callback", kwargs={"pk": websub_feed_instance.id}
+    )
+
+    for mode in ("subscribe", "denied"):
+        local_hub.verify(
+            {**subscription, "hub.callback": f"https://rss.example.com{callback_path}"},
+            mode=mode,
+        )
+        response = local_hub.verify(
+            {
+                **subscription,
+                "hub.callback": f"https://rss.example.com{callback_path}?token=guessed",
+            },
+            mode=mode,
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    websub_feed_instance.refresh_from_db()
+    assert websub_feed_instance.websub_lease_expires_at is None
+
+
+def test__websub_callback__given_denied_intent_of_another_topic__should_keep_the_lease(
+    local_hub: LocalHub, websub_feed_instance: Feed
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+    subscription = local_hub.subscriptions[0]
+    local_hub.verify(subscription)
+
+    response = local_hub.verify(
+        {**subscription, "hub.topic": "https://other.com/rss"}, mode="denied"
+    )
+    websub_feed_instance.refresh_from_db()
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert websub_feed_instance.is_pushed
+
+
+@pytest.mark.parametrize("lease_seconds", ("9" * 5000, "99999999999999999999"))
+def test__websub_callback__given_huge_lease_seconds__should_cap_the_lease_at_the_asked_for_one(
+    local_hub: LocalHub, websub_feed_instance: Feed, lease_seconds: str, settings
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+
+    response = local_hub.verify(local_hub.subscriptions[0], lease_seconds=lease_seconds)
+    websub_feed_instance.refresh_from_db()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert websub_feed_instance.websub_lease_expires_at <= timezone.now() + (
+        datetime.timedelta(seconds=settings.FEED_WEBSUB_LEASE_IN_SECONDS)
+    )
+
+
+def test__websub_callback__given_pushed_content__should_save_it_through_the_feed_service(
+    local_hub: LocalHub, websub_feed_instance: Feed
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+    subscription = local_hub.subscriptions[0]
+    local_hub.verify(subscription)
+
+    response = local_hub.push(subscription, websub_feed_xml_content)
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert websub_feed_instance.items.count() == 2
+
+
+def test__websub_callback__given_pushed_content_with_wrong_signature__should_return_403(
+    local_hub: LocalHub, websub_feed_instance: Feed
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+    subscription = local_hub.subscriptions[0]
+    local_hub.verify(subscription)
+
+    response = local_hub.push(
+        subscription, websub_feed_xml_content, secret="not-the-secret"
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert websub_feed_instance.items.count() == 0
+
+
+def test__subscribe_to_websub_hub__given_renewal__should_keep_the_callback_and_the_secret_till_verified(
+    local_hub: LocalHub, websub_feed_instance: Feed
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+    subscription = local_hub.subscriptions[0]
+    local_hub.verify(subscription)
+
+    subscribe_to_websub_hub(websub_feed_instance)
+    renewal = local_hub.subscriptions[1]
+
+    assert renewal["hub.callback"] == subscription["hub.callback"]
+    assert renewal["hub.secret"] != subscription["hub.secret"]
+    assert (
+        local_hub.push(subscription, websub_feed_xml_content).status_code
+        == status.HTTP_204_NO_CONTENT
+    )
+
+    local_hub.verify(renewal)
+
+    assert (
+        local_hub.push(subscription, websub_feed_xml_content).status_code
+        == status.HTTP_403_FORBIDDEN
+    )
+    assert (
+        local_hub.push(renewal, websub_feed_xml_content).status_code
+        == status.HTTP_204_NO_CONTENT
+    )
+
+
+def test__subscribe_to_websub_hub__given_feed_moved_to_another_hub__should_use_a_new_callback(
+    local_hub: LocalHub, websub_feed_instance: Feed
+):
+    subscribe_to_websub_hub(websub_feed_instance)
+    subscription = local_hub.subscriptions[0]
+    local_hub.verify(subscription)
+
+    FeedReaderService(websub_feed_instance).update_feed_instance(
+        {
+            "links": [
+                {"rel": "hub", "href": "https://other-hub.example.com/"},
+                {"rel": "self", "href": TOPIC_URL},
+            ]
+        }
+    )
+    subscribe_to_websub_hub(websub_feed_instance)
+
+    assert local_hub.subscriptions[1]["hub.callback"] != subscription["hub.callback"]
+    assert local_hub.verify(subscription).status_code == status.HTTP_404_NOT_FOUND
@@ -1,10 +1,12 @@
 import datetime
+import hashlib
 import time
-from typing import Optional
+import uuid
+from typing import Iterator, Optional
 
 import pytz
-from django.conf import settings
 from django.core.mail import send_mail
+from django.db.models import QuerySet
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 
@@ -12,10 +14,10 @@ from rss_scraper.feeds.models import Feed
 
 
 def get_datetime_from_struct_time(
-    time_struct: Optional[time.struct_time] = None
+    time_struct: Optional[time.struct_time] = None,
 ) -> Optional[datetime.datetime]:
     """
-    Create a datetime object with respect to the django timezone settings from a time struct.
+    Create an aware datetime object from a time struct, the feedparser package parses all the dates as UTC.
     """
     if not time_struct:
         return
@@ -27,10 +29,52 @@ def get_datetime_from_struct_time(
         time_struct.tm_hour,
         time_struct.tm_min,
         time_struct.tm_sec,
-        tzinfo=pytz.timezone(settings.TIME_ZONE),
+        tzinfo=pytz.utc,
     )
 
 
+def get_content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def get_fetch_lease_token() -> str:
+    return uuid.uuid4().hex
+
+
+def iterate_fair_ids_in_chunks(
+    queryset: QuerySet, chunk_size: int, budget_per_user: int = 0
+) -> Iterator[list[int]]:
+    """
+    Iterate over the ids of a feeds queryset in chunks, in round robin order across the feeds creators,
+        stopping once every user has used up its budget of feeds.
+
+    The window ranking needs the whole queryset, so it is read by one streamed query instead of keyset chunks
+        on the primary key. The query is read through a server side cursor, so the memory stays bounded
+        by the chunk size, and it stops being read once the users budgets are used up.
+
+    :param budget_per_user: max number of feeds per user, 0 for no limit.
+    """
+    ids_chunk = []
+
+    for feed_id, user_fetch_rank in (
+        queryset.in_fair_user_order()
+        .values_list("id", "user_fetch_rank")
+        .iterator(chunk_size=chunk_size)
+    ):
+        # The feeds are ordered by their rank, all the next ones are over the budget as well.
+        if budget_per_user and user_fetch_rank > budget_per_user:
+            break
+
+        ids_chunk.append(feed_id)
+
+        if len(ids_chunk) == chunk_size:
+            yield ids_chunk
+            ids_chunk = []
+
+    if ids_chunk:
+        yield ids_chunk
+
+
 def notify_feed_creator_with_stalled_feed(feed_instance: Feed):
     """
     Send email to the feed creator in case the system failed to read/update the feed,
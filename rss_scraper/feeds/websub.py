@@ -0,0 +1,216 @@
+import datetime
+import hashlib
+import hmac
+import logging
+import secrets
+from typing import Any, Mapping, Optional
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rss_scraper.feeds.fetchers import get_http_client
+from rss_scraper.feeds.models import Feed
+
+logger = logging.getLogger(__name__)
+
+# The callback url query param carrying the subscription callback token, the hub keeps it at its requests.
+CALLBACK_TOKEN_QUERY_PARAM = "token"
+SUBSCRIBE_MODE = "subscribe"
+UNSUBSCRIBE_MODE = "unsubscribe"
+DENIED_MODE = "denied"
+# Digest methods a hub can sign the pushed content with at the `X-Hub-Signature` header.
+SIGNATURE_DIGESTS = {
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha384": hashlib.sha384,
+    "sha512": hashlib.sha512,
+}
+
+
+def is_websub_enabled() -> bool:
+    return bool(settings.FEED_WEBSUB_CALLBACK_BASE_URL)
+
+
+def get_websub_links(
+    feed_server_data: dict[str, Any]
+) -> tuple[Optional[str], Optional[str]]:
+    """
+    The WebSub hub and topic urls advertised by a parsed feed at its `rel="hub"` and `rel="self"` links.
+
+    :return: (hub url, topic url), the topic is empty if the feed has no self link.
+    """
+    links = {
+        link.get("rel"): link.get("href")
+        for link in feed_server_data.get("links", [])
+        if link.get("href")
+    }
+    return links.get("hub"), links.get("self")
+
+
+def needs_websub_subscription(feed_instance: Feed) -> bool:
+    """
+    Whether a feed advertises a hub and its subscription is missing or about to expire.
+    """
+    if not (is_websub_enabled() and feed_instance.websub_hub_url):
+        return False
+
+    return (
+        not feed_instance.websub_lease_expires_at
+        or feed_instance.websub_lease_expires_at
+        <= timezone.now()
+        + datetime.timedelta(seconds=settings.FEED_WEBSUB_RENEW_BEFORE_IN_SECONDS)
+    )
+
+
+def get_websub_callback_url(feed_instance: Feed) -> str:
+    return (
+        settings.FEED_WEBSUB_CALLBACK_BASE_URL.rstrip("/")
+        + reverse("api:websub-callback", kwargs={"pk": feed_instance.id})
+        + "?"
+        + urlencode({CALLBACK_TOKEN_QUERY_PARAM: feed_instance.websub_callback_token})
+    )
+
+
+def get_websub_topic_url(feed_instance: Feed) -> str:
+    return feed_instance.websub_topic_url or feed_instance.url
+
+
+def subscribe_to_websub_hub(feed_instance: Feed):
+    """
+    Ask the feed hub to push the feed updates to its callback url. The hub verifies the intent asynchronously
+        by calling the callback url back, the subscription is only active after that.
+
+    A new secret is shared with the hub at every subscription, it's pending till the hub verifies the intent
+        and the current secret keeps checking the pushes of the subscription being renewed meanwhile.
+        The callback url carries an unguessable token, so only the intents sent by the hub are verified.
+        It's kept across the renewals so the callback url stays the same, and it's rotated once the feed
+        advertises another hub or topic.
+
+    :raise httpx.HTTPError: if the hub is not reachable or didn't accept the subscription request.
+    """
+    feed_instance.websub_pending_secret = secrets.token_hex(32)
+
+    if not feed_instance.websub_callback_token:
+        feed_instance.websub_callback_token = secrets.token_urlsafe(32)
+
+    feed_instance.save(
+        update_fields=["websub_pending_secret", "websub_callback_token", "updated_at"]
+    )
+
+    response = get_http_client().post(
+        feed_instance.websub_hub_url,
+        data={
+            "hub.mode": SUBSCRIBE_MODE,
+            "hub.topic": get_websub_topic_url(feed_instance),
+            "hub.callback": get_websub_callback_url(feed_instance),
+            "hub.secret": feed_instance.websub_pending_secret,
+            "hub.lease_seconds": settings.FEED_WEBSUB_LEASE_IN_SECONDS,
+        },
+    )
+    response.raise_for_status()
+    logger.info(
+        f"Feed with id: {feed_instance.id} subscription has been requested from hub: {feed_instance.websub_hub_url}."
+    )
+
+
+def is_valid_websub_callback_token(feed_instance: Feed, token: str) -> bool:
+    return bool(feed_instance.websub_callback_token) and hmac.compare_digest(
+        feed_instance.websub_callback_token, token
+    )
+
+
+def get_websub_lease_seconds(lease_seconds: str) -> int:
+    """
+    The lease granted by the hub, capped at the lease asked for at `FEED_WEBSUB_LEASE_IN_SECONDS`
+        so the feed isn't left unpolled for longer. A missing or malformed lease is taken as the asked for one.
+    """
+    try:
+        return max(min(int(lease_seconds), settings.FEED_WEBSUB_LEASE_IN_SECONDS), 0)
+    except ValueError:
+        return settings.FEED_WEBSUB_LEASE_IN_SECONDS
+
+
+def verify_websub_intent(
+    feed_instance: Feed, query_params: Mapping[str, str]
+) -> Optional[str]:
+    """
+    Verify a (un)subscription intent the hub sends to the callback url and save its result.
+        Only the intents carrying the callback token and the feed topic are taken, the callback url is public
+        so any other intent is ignored.
+
+    - Subscribe: confirmed if the feed still wants to be pushed by this hub, the lease is saved
+        and the pending secret replaces the secret.
+    - Unsubscribe: confirmed if the feed doesn't want to be pushed anymore, the lease is cleared.
+    - Denied: the hub refused the subscription, the lease and the pending secret are cleared so the feed is polled.
+
+    :return: the challenge to echo back to the hub, None if the intent is not confirmed.
+    """
+    mode = query_params.get("hub.mode")
+    wants_push = feed_instance.is_followed and feed_instance.auto_update_is_active
+
+    if not is_valid_websub_callback_token(
+        feed_instance, query_params.get(CALLBACK_TOKEN_QUERY_PARAM, "")
+    ) or query_params.get("hub.topic") != get_websub_topic_url(feed_instance):
+        return None
+
+    if mode == DENIED_MODE:
+        logger.warning(
+            f"Feed with id: {feed_instance.id} subscription has been denied by its hub, "
+            f"reason: {query_params.get('hub.reason')}."
+        )
+        feed_instance.websub_lease_expires_at = None
+        feed_instance.websub_pending_secret = ""
+        feed_instance.save(
+            update_fields=[
+                "websub_lease_expires_at",
+                "websub_pending_secret",
+                "updated_at",
+            ]
+        )
+        return ""
+
+    if mode == SUBSCRIBE_MODE and wants_push and feed_instance.websub_hub_url:
+        feed_instance.websub_lease_expires_at = timezone.now() + datetime.timedelta(
+            seconds=get_websub_lease_seconds(query_params.get("hub.lease_seconds", ""))
+        )
+
+        if feed_instance.websub_pending_secret:
+            feed_instance.websub_secret = feed_instance.websub_pending_secret
+            feed_instance.websub_pending_secret = ""
+    elif mode == UNSUBSCRIBE_MODE and not wants_push:
+        feed_instance.websub_lease_expires_at = None
+    else:
+        return None
+
+    feed_instance.save(
+        update_fields=[
+            "websub_lease_expires_at",
+            "websub_secret",
+            "websub_pending_secret",
+            "updated_at",
+        ]
+    )
+    return query_params.get("hub.challenge")
+
+
+def is_valid_websub_signature(
+    feed_instance: Feed, content: bytes, signature_header: str
+) -> bool:
+    """
+    Check the `X-Hub-Signature` of a pushed content, like `sha256=<hex digest>`, against the subscription secret.
+        The pending secret is taken as well, the hub may sign with it before its verification is saved.
+    """
+    method, _, signature = signature_header.partition("=")
+
+    if not (digest := SIGNATURE_DIGESTS.get(method)):
+        return False
+
+    return any(
+        hmac.compare_digest(
+            hmac.new(secret.encode(), content, digest).hexdigest(), signature
+        )
+        for secret in (feed_instance.websub_secret, feed_instance.websub_pending_secret)
+        if secret
+    )